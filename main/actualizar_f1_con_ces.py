@@ -1,8 +1,14 @@
 import os
 from difflib import SequenceMatcher
 
+import numpy as np
 import pandas as pd
 
+from artefactos import excel_solicitado, existe_tabla, guardar_tabla, leer_tabla
+from excel_streaming import escribir_excel_paralelo, escribir_excel_streaming, resumen_escritura
+from fuzzy_indexado import construir_indice_ngramas, cotas_quick_ratio
+from registro_claves import ids_clave
+
 F1_ORIG_PATH = "data/OFERTA_ACAD_CEDEPRO_F_1_MATRICULADOS.xlsx"
 CES_PATH = "data/OFERTA_ACAD_CES_RAW.xlsx"
 
@@ -19,23 +25,13 @@ def similitud(a, b) -> float:
 
 
 def construir_clave(df: pd.DataFrame, col_ies: str, col_prog: str, nueva_col: str) -> None:
-    df[nueva_col] = (
-        df[col_ies].astype(str).str.strip()
-        + "||"
-        + df[col_prog].astype(str).str.strip()
-    )
+    """Clave entera (ID_CLAVE de registro_claves.py) en la columna nueva_col."""
+    df[nueva_col] = ids_clave(df[col_ies], df[col_prog], guardar=True)
 
 
 def eliminar_duplicados_ces(df: pd.DataFrame, col_ies: str, col_prog: str) -> pd.DataFrame:
-    df = df.copy()
-    df["CLAVE_TMP"] = (
-        df[col_ies].astype(str).str.strip()
-        + "||"
-        + df[col_prog].astype(str).str.strip()
-    )
-    df = df.drop_duplicates(subset=["CLAVE_TMP"], keep="first").copy()
-    df.drop(columns=["CLAVE_TMP"], inplace=True)
-    return df
+    claves = ids_clave(df[col_ies], df[col_prog])
+    return df[~claves.duplicated(keep="first")].copy()
 
 
 def validar_columnas(df: pd.DataFrame, columnas_necesarias, nombre_df: str) -> None:
@@ -77,69 +73,146 @@ COLUMNAS_DESDE_F1 = {
 }
 
 
-def clasificar_y_completar_fila_ces(
-    fila_ces: pd.Series,
+def _texto_similitud(x) -> str:
+    return str(x).strip().lower()
+
+
+def construir_indice_candidatos(df_f1_match: pd.DataFrame) -> dict:
+    """
+    Índice de plantillas F1 para elegir la fila más parecida:
+      - programas distintos (texto de similitud) + su índice de caracteres
+        (cota quick_ratio, ver fuzzy_indexado.py)
+      - por cada programa distinto, la posición de su PRIMERA fila en F1
+      - bloques por CÓDIGO IES: posiciones de fila y programas distintos
+    """
+    textos = df_f1_match["PROGRAMA / CARRERA"].map(_texto_similitud).tolist()
+    distintos = list(dict.fromkeys(textos))
+    id_texto = {t: i for i, t in enumerate(distintos)}
+    ids = np.array([id_texto[t] for t in textos], dtype=np.int64)
+
+    primera_pos = np.full(len(distintos), len(textos), dtype=np.int64)
+    np.minimum.at(primera_pos, ids, np.arange(len(textos)))
+
+    bloques = {}
+    for cod, pos in df_f1_match.groupby("CÓDIGO IES", sort=False).indices.items():
+        bloques[cod] = pos
+
+    return {
+        "ids": ids,
+        "distintos": distintos,
+        "primera_pos": primera_pos,
+        "indice": construir_indice_ngramas(distintos),
+        "bloques": bloques,
+    }
+
+
+def _mejor_plantilla(programa_ces: str, cand_ids: np.ndarray, cand_pos: np.ndarray, idx: dict) -> tuple:
+    """
+    Igual que recorrer los candidatos en orden con similitud() y quedarse con
+    el primero de mayor similitud, pero evaluando SequenceMatcher solo en los
+    programas distintos cuya cota quick_ratio todavía puede ganar.
+    """
+    cota = cotas_quick_ratio(idx["indice"], programa_ces)[cand_ids]
+    sm = SequenceMatcher()
+    sm.set_seq1(programa_ces)
+
+    mejor_sim, mejor_pos = -1.0, -1
+    for j in np.argsort(-cota, kind="stable"):
+        if cota[j] < mejor_sim:
+            break
+        sm.set_seq2(idx["distintos"][cand_ids[j]])
+        sim = sm.ratio()
+        pos = cand_pos[j]
+        if sim > mejor_sim or (sim == mejor_sim and pos < mejor_pos):
+            mejor_sim, mejor_pos = sim, pos
+    return mejor_pos, mejor_sim
+
+
+def elegir_plantillas(df_nuevos_ces: pd.DataFrame, idx: dict) -> tuple:
+    """
+    Para cada fila nueva de CES devuelve (posición de la plantilla en
+    df_f1_match, similitud); df_f1_match no debe estar vacío.
+    Candidatos: las filas F1 de la misma IES o, si la IES no existe en F1,
+    toda la F1. Las filas se procesan por IES para reutilizar el bloque.
+    """
+    n = len(df_nuevos_ces)
+    posiciones = np.zeros(n, dtype=np.int64)
+    sims = np.zeros(n)
+
+    # candidatos de toda la F1: programas distintos + su primera fila
+    todos_ids = np.arange(len(idx["distintos"]), dtype=np.int64)
+    todos_pos = idx["primera_pos"]
+
+    programas = df_nuevos_ces["PROGRAMA / CARRERA"].map(_texto_similitud).to_numpy()
+    grupos = df_nuevos_ces.reset_index(drop=True).groupby("CÓDIGO IES", sort=False, dropna=False).indices
+
+    for cod, filas in grupos.items():
+        bloque = idx["bloques"].get(cod) if not pd.isna(cod) else None
+        if bloque is None:
+            cand_ids, cand_pos = todos_ids, todos_pos
+        else:
+            # programas distintos del bloque con su primera fila dentro del bloque
+            ids_bloque = idx["ids"][bloque]
+            cand_ids, primeras = np.unique(ids_bloque, return_index=True)
+            cand_pos = bloque[primeras]
+
+        for f in filas:
+            posiciones[f], sims[f] = _mejor_plantilla(programas[f], cand_ids, cand_pos, idx)
+
+    return posiciones, sims
+
+
+def completar_filas_ces(
+    df_nuevos_ces: pd.DataFrame,
     df_f1_match: pd.DataFrame,
     columnas_f1: list[str],
-) -> dict:
-    codigo_ies = fila_ces["CÓDIGO IES"]
-    programa_ces = fila_ces["PROGRAMA / CARRERA"]
-
-    base = df_f1_match[df_f1_match["CÓDIGO IES"] == codigo_ies]
-    if base.empty:
-        base = df_f1_match
-
-    mejor_sim = -1.0
-    mejor_row = None
-
-    for _, r in base.iterrows():
-        sim = similitud(programa_ces, r["PROGRAMA / CARRERA"])
-        if sim > mejor_sim:
-            mejor_sim = sim
-            mejor_row = r
+) -> pd.DataFrame:
+    """
+    Construye los nuevos registros F1 alineando cada fila CES con su
+    plantilla F1 (la más parecida) y tomando cada columna según las reglas
+    COLUMNAS_DESDE_CES / COLUMNAS_DESDE_F1, columna por columna sobre el
+    frame completo (sin dicts por fila).
+    """
+    ces = df_nuevos_ces.reset_index(drop=True)
+    n = len(ces)
+
+    def vacia():
+        return pd.Series([None] * n, dtype=object)
+
+    # Sin F1 no hay plantilla: solo columnas desde CES
+    hay_plantilla = len(df_f1_match) > 0
+    if hay_plantilla:
+        posiciones, sims = elegir_plantillas(ces, construir_indice_candidatos(df_f1_match))
+        plantillas = df_f1_match.iloc[posiciones].reset_index(drop=True)
 
     nuevo = {}
-
     for col in columnas_f1:
         if col == "NRO.":
-            nuevo[col] = None
-            continue
-
-        # 1) Reglas de columnas
-        if col in COLUMNAS_DESDE_CES and col in fila_ces.index:
-            nuevo[col] = fila_ces[col]
-            continue
-
-        if mejor_row is not None and col in COLUMNAS_DESDE_F1 and col in mejor_row.index:
+            nuevo[col] = vacia()
+        elif col in COLUMNAS_DESDE_CES and col in ces.columns:
+            nuevo[col] = ces[col]
+        elif hay_plantilla and col in plantillas.columns:
             # Para AÑO DE MATRICULACIÓN y TOTAL_MATRICULADOS no copiamos nada
-            if col in ["AÑO DE MATRICULACIÓN", "TOTAL_MATRICULADOS"]:
-                nuevo[col] = None
+            if col in COLUMNAS_DESDE_F1 and col in ["AÑO DE MATRICULACIÓN", "TOTAL_MATRICULADOS"]:
+                nuevo[col] = vacia()
             else:
-                nuevo[col] = mejor_row[col]
-            continue
-
-        # 2) Intentar desde mejor_row
-        if mejor_row is not None and col in mejor_row.index:
-            nuevo[col] = mejor_row[col]
-            continue
-
-        # 3) Intentar desde fila_ces
-        if col in fila_ces.index:
-            nuevo[col] = fila_ces[col]
-            continue
-
-        # 4) Si no hay de dónde, None
-        nuevo[col] = None
-
-    nuevo["PROGRAMA_REFERENCIA_SIMILITUD"] = (
-        mejor_row["PROGRAMA / CARRERA"] if mejor_row is not None else None
-    )
-    nuevo["SIMILITUD_REFERENCIA"] = mejor_sim if mejor_row is not None else None
+                nuevo[col] = plantillas[col]
+        elif col in ces.columns:
+            nuevo[col] = ces[col]
+        else:
+            nuevo[col] = vacia()
+
+    if hay_plantilla:
+        nuevo["PROGRAMA_REFERENCIA_SIMILITUD"] = plantillas["PROGRAMA / CARRERA"]
+        nuevo["SIMILITUD_REFERENCIA"] = pd.Series(sims)
+    else:
+        nuevo["PROGRAMA_REFERENCIA_SIMILITUD"] = vacia()
+        nuevo["SIMILITUD_REFERENCIA"] = vacia()
     nuevo["CLAVE_CES_ORIGEN"] = (
-        f"{fila_ces.get('CÓDIGO IES', '')}||{fila_ces.get('PROGRAMA / CARRERA', '')}"
+        ces["CÓDIGO IES"].astype(str) + "||" + ces["PROGRAMA / CARRERA"].astype(str)
     )
 
-    return nuevo
+    return pd.DataFrame(nuevo)
 
 
 def main():
@@ -150,10 +223,10 @@ def main():
     df_f1 = pd.read_excel(F1_ORIG_PATH)
 
     print("Cargando CES RAW...")
-    if not os.path.exists(CES_PATH):
+    if not existe_tabla(CES_PATH):
         raise FileNotFoundError(f"No se encontró {CES_PATH}")
 
-    df_ces = pd.read_excel(CES_PATH)
+    df_ces = leer_tabla(CES_PATH)
 
     df_ces = df_ces.rename(
         columns={
@@ -209,36 +282,25 @@ def main():
     construir_clave(df_f1, "CÓDIGO IES", "PROGRAMA / CARRERA", "CLAVE_F1")
     construir_clave(df_ces, "CÓDIGO IES", "PROGRAMA / CARRERA", "CLAVE_CES")
 
-    claves_f1 = set(df_f1["CLAVE_F1"])
-    claves_ces = set(df_ces["CLAVE_CES"])
-
-    nuevas_claves = sorted(claves_ces - claves_f1)
+    nuevas_claves = np.setdiff1d(df_ces["CLAVE_CES"].to_numpy(), df_f1["CLAVE_F1"].to_numpy())
     print("Nuevos programas detectados:", len(nuevas_claves))
 
-    if not nuevas_claves:
+    if len(nuevas_claves) == 0:
         print("No hay programas nuevos. Se copia F1 original a F1_ACT.")
         df_f1_sin_clave = df_f1.drop(columns=["CLAVE_F1"])
-        os.makedirs("data", exist_ok=True)
-        df_f1_sin_clave.to_excel(OUT_F1_ACT, index=False)
-        pd.DataFrame(columns=df_f1_sin_clave.columns).to_excel(OUT_NUEVOS, index=False)
+        print(f"   {resumen_escritura(escribir_excel_streaming(df_f1_sin_clave, OUT_F1_ACT))}")
+        guardar_tabla(pd.DataFrame(columns=df_f1_sin_clave.columns), OUT_NUEVOS)
         print("Archivos guardados sin cambios en la estructura.")
         return
 
     df_nuevos_ces = df_ces[df_ces["CLAVE_CES"].isin(nuevas_claves)].copy()
     columnas_f1 = list(df_f1.columns)
 
-    df_f1_match = df_f1.drop_duplicates(
-        subset=["CÓDIGO IES", "PROGRAMA / CARRERA"]
-    ).copy()
+    # una plantilla por ID_CLAVE: "1001" y 1001.0, o tildes y espacios, son el mismo programa
+    df_f1_match = df_f1.drop_duplicates(subset=["CLAVE_F1"]).copy()
 
     print("Clasificando y completando nuevos registros desde CES...")
-    registros_nuevos = []
-    for _, fila in df_nuevos_ces.iterrows():
-        registros_nuevos.append(
-            clasificar_y_completar_fila_ces(fila, df_f1_match, columnas_f1)
-        )
-
-    df_nuevos = pd.DataFrame(registros_nuevos)
+    df_nuevos = completar_filas_ces(df_nuevos_ces, df_f1_match, columnas_f1)
 
     max_nro = pd.to_numeric(df_f1["NRO."], errors="coerce").max()
     max_nro = int(max_nro) if pd.notna(max_nro) else 0
@@ -255,8 +317,16 @@ def main():
 
     os.makedirs("data", exist_ok=True)
     print("Guardando resultados...")
-    df_nuevos.to_excel(OUT_NUEVOS, index=False)
-    df_f1_final.to_excel(OUT_F1_ACT, index=False)
+    # F1_ACT y (con --excel) el .xlsx de NUEVOS son independientes: cada
+    # uno en su proceso. La versión columnar de NUEVOS es la que se lee
+    # (artefactos.py); va al final para que --leer-excel no tome el .xlsx
+    # recién escrito como una corrección a mano.
+    trabajos = [(df_f1_final, OUT_F1_ACT)]
+    if excel_solicitado():
+        trabajos.append((df_nuevos, OUT_NUEVOS))
+    for stats in escribir_excel_paralelo(trabajos):
+        print(f"   {resumen_escritura(stats)}")
+    guardar_tabla(df_nuevos, OUT_NUEVOS, excel=False)
 
     print("Proceso COMPLETADO.")
     print("Nuevos guardados en:", OUT_NUEVOS)
@@ -0,0 +1,249 @@
+# almacen_sqlite.py
+# Backend SQLite opcional para la API (CEDEPRO_BACKEND=sqlite).
+#
+# Con historias de F1 de varios años, tener df_mat/df_tit en el heap de cada
+# worker de gunicorn es el límite. Con este backend load_base escribe las
+# tablas normalizadas en un archivo SQLite local y las consultas de la API
+# corren SQL parametrizado contra él; los workers comparten el archivo a
+# través del page cache del sistema (mmap) y solo guardan df_of, que es chica.
+#
+#   mat           matriculados pre-agregados por provincia/año/nivel/campo
+#   tit           titulados por provincia/año de titulación/campo
+#   oferta        df_of completa (para las rutas que la muestran tal cual)
+#   oferta_claves claves normalizadas de la oferta (conteos de los badges)
+#   meta          huella de los Excel de origen y columnas detectadas
+#
+# Los índices cubren las consultas (PROV_KEY, año, nivel, campo, valor): la
+# suma se resuelve leyendo solo el índice. El archivo se arma en un temporal
+# y se reemplaza atómicamente; la huella (tamaño + mtime de los Excel) decide
+# si un worker puede reutilizar el archivo que armó otro.
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+ESQUEMA_VERSION = 1
+
+COLUMNAS_MAT = ["PROV_KEY", "ANIO_MATRICULACION", "NIVEL_FORMACION", "CAMPO_BASE_P", "CAMPO_DETALLADO_P", "PROV_DESDE_CAMPO_P"]
+COLUMNAS_TIT = ["PROV_KEY", "ANIO_TITULADOS", "CAMPO_KEY"]
+
+# columnas que se pueden filtrar / agrupar (los nombres van al SQL)
+FILTROS_MAT = {"PROV_KEY", "ANIO_MATRICULACION", "NIVEL_FORMACION"}
+AGRUPABLES_MAT = {"CAMPO_BASE_P", "CAMPO_DETALLADO_P"}
+
+INDICES = [
+    "CREATE INDEX ix_mat_prov ON mat (PROV_KEY, ANIO_MATRICULACION, NIVEL_FORMACION, CAMPO_BASE_P, MATRICULADOS)",
+    "CREATE INDEX ix_mat_prov_det ON mat (PROV_KEY, ANIO_MATRICULACION, NIVEL_FORMACION, CAMPO_DETALLADO_P, MATRICULADOS)",
+    "CREATE INDEX ix_mat_anio ON mat (ANIO_MATRICULACION, NIVEL_FORMACION, CAMPO_BASE_P, MATRICULADOS)",
+    "CREATE INDEX ix_tit_prov ON tit (PROV_KEY, ANIO_TITULADOS, CAMPO_KEY, TITULADOS_TOTALES)",
+    "CREATE INDEX ix_tit_anio ON tit (ANIO_TITULADOS, CAMPO_KEY, TITULADOS_TOTALES)",
+    "CREATE INDEX ix_oferta_prov ON oferta_claves (PROV_KEY, CAMPO_DETALLADO)",
+]
+
+
+def huella_fuentes(paths: list, config: dict | None = None) -> str:
+    """
+    Huella de los archivos de origen (ruta, tamaño, mtime) + versión del
+    esquema + `config` (opciones que cambian el resultado de la carga).
+    """
+    partes = [f"v{ESQUEMA_VERSION}"]
+    for k, v in sorted((config or {}).items()):
+        partes.append(f"{k}={v}")
+    for p in paths:
+        try:
+            st = os.stat(p)
+            partes.append(f"{os.path.abspath(p)}|{st.st_size}|{st.st_mtime_ns}")
+        except OSError:
+            partes.append(f"{os.path.abspath(p)}|sin_archivo")
+    return hashlib.sha256("\n".join(partes).encode("utf-8")).hexdigest()
+
+
+def leer_meta(path: str) -> dict | None:
+    """Metadatos del archivo, o None si no existe o no es un almacén válido."""
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            filas = conn.execute("SELECT clave, valor FROM meta").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return {k: json.loads(v) for k, v in filas}
+
+
+def _tabla_mat(df_mat: pd.DataFrame, col_mat: str) -> pd.DataFrame:
+    if df_mat is None or df_mat.empty or col_mat not in df_mat.columns:
+        return pd.DataFrame({c: pd.Series(dtype="object") for c in COLUMNAS_MAT} | {"MATRICULADOS": pd.Series(dtype="int64")})
+    t = df_mat[COLUMNAS_MAT + [col_mat]].copy()
+    t["ANIO_MATRICULACION"] = pd.to_numeric(t["ANIO_MATRICULACION"], errors="coerce").astype("Int64")
+    return (
+        t.groupby(COLUMNAS_MAT, dropna=False)[col_mat]
+        .sum()
+        .reset_index()
+        .rename(columns={col_mat: "MATRICULADOS"})
+    )
+
+
+def _tabla_tit(df_tit: pd.DataFrame) -> pd.DataFrame:
+    if df_tit is None or df_tit.empty:
+        return pd.DataFrame({c: pd.Series(dtype="object") for c in COLUMNAS_TIT} | {"TITULADOS_TOTALES": pd.Series(dtype="int64")})
+    t = df_tit[COLUMNAS_TIT + ["TITULADOS_TOTALES"]].copy()
+    t["ANIO_TITULADOS"] = pd.to_numeric(t["ANIO_TITULADOS"], errors="coerce").astype("Int64")
+    return t.groupby(COLUMNAS_TIT, dropna=False)["TITULADOS_TOTALES"].sum().reset_index()
+
+
+def escribir(path: str, df_of: pd.DataFrame, claves_oferta: pd.DataFrame, df_mat: pd.DataFrame,
+             df_tit: pd.DataFrame, col_mat: str, huella: str, columnas: dict) -> dict:
+    """Arma el archivo en un temporal y lo reemplaza atómicamente. Devuelve filas por tabla."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    tablas = {
+        "mat": _tabla_mat(df_mat, col_mat),
+        "tit": _tabla_tit(df_tit),
+        "oferta": df_of,
+        "oferta_claves": claves_oferta,
+    }
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        for nombre, df in tablas.items():
+            df.to_sql(nombre, conn, index=False, chunksize=50_000)
+        for sql in INDICES:
+            conn.execute(sql)
+        filas = {n: int(len(df)) for n, df in tablas.items()}
+        meta = {
+            "huella": huella,
+            "esquema": ESQUEMA_VERSION,
+            "columnas": columnas,
+            "filas": filas,
+            "escrito": datetime.now().isoformat(timespec="seconds"),
+        }
+        conn.execute("CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v, ensure_ascii=False)) for k, v in meta.items()])
+        conn.execute("ANALYZE")
+        conn.commit()
+    except Exception:
+        conn.close()
+        os.remove(tmp)
+        raise
+    conn.close()
+    os.replace(tmp, path)
+    return filas
+
+
+class AlmacenSQLite:
+    """Consultas de la API sobre el archivo (solo lectura, una conexión por hilo)."""
+
+    def __init__(self, path: str, mmap_mb: int = 256):
+        self.path = path
+        self.mmap_bytes = mmap_mb * 1024 * 1024
+        self.meta = leer_meta(path)
+        if self.meta is None:
+            raise FileNotFoundError(f"No hay almacén SQLite válido en: {path}")
+        self._local = threading.local()
+
+    def conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+            self._local.conn = conn
+        return conn
+
+    def _filas(self, sql: str, params=()) -> list:
+        return self.conexion().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _where(filtros: dict, permitidas: set) -> tuple:
+        partes, params = [], []
+        for col, valor in filtros.items():
+            if col not in permitidas:
+                raise ValueError(f"Filtro no permitido: {col}")
+            if valor is None:
+                continue
+            partes.append(f"{col} = ?")
+            params.append(valor)
+        return (" WHERE " + " AND ".join(partes)) if partes else "", params
+
+    # ── matriculados ──
+
+    def sumar_mat(self, por: str, filtros: dict) -> pd.DataFrame:
+        """[por, MATRICULADOS] agrupado y ordenado por `por` (como groupby)."""
+        if por not in AGRUPABLES_MAT:
+            raise ValueError(f"Agrupación no permitida: {por}")
+        where, params = self._where(filtros, FILTROS_MAT)
+        filas = self._filas(f"SELECT {por}, SUM(MATRICULADOS) FROM mat{where} GROUP BY {por} ORDER BY {por}", params)
+        return pd.DataFrame(filas, columns=[por, "MATRICULADOS"])
+
+    def total_mat(self, filtros: dict) -> int:
+        where, params = self._where(filtros, FILTROS_MAT)
+        return int(self._filas(f"SELECT COALESCE(SUM(MATRICULADOS), 0) FROM mat{where}", params)[0][0])
+
+    def provincias(self) -> list:
+        return [r[0] for r in self._filas(
+            "SELECT DISTINCT PROV_DESDE_CAMPO_P FROM mat WHERE COALESCE(PROV_DESDE_CAMPO_P, '') <> '' ORDER BY 1"
+        )]
+
+    def anios(self) -> list:
+        return [int(r[0]) for r in self._filas(
+            "SELECT DISTINCT ANIO_MATRICULACION FROM mat WHERE ANIO_MATRICULACION IS NOT NULL ORDER BY 1 DESC"
+        )]
+
+    def niveles(self) -> list:
+        return [r[0] for r in self._filas(
+            "SELECT DISTINCT NIVEL_FORMACION FROM mat WHERE COALESCE(NIVEL_FORMACION, '') <> '' ORDER BY 1"
+        )]
+
+    # ── titulados ──
+
+    def sumar_tit(self, prov_key, anio_titulacion: int) -> pd.DataFrame:
+        where, params = self._where({"PROV_KEY": prov_key, "ANIO_TITULADOS": anio_titulacion}, {"PROV_KEY", "ANIO_TITULADOS"})
+        filas = self._filas(
+            f"SELECT CAMPO_KEY, SUM(TITULADOS_TOTALES) FROM tit{where} GROUP BY CAMPO_KEY ORDER BY CAMPO_KEY", params
+        )
+        return pd.DataFrame(filas, columns=["CAMPO_KEY", "TOTAL_TITULADOS"])
+
+    def total_tit(self, prov_key, anio_titulacion: int) -> int:
+        where, params = self._where({"PROV_KEY": prov_key, "ANIO_TITULADOS": anio_titulacion}, {"PROV_KEY", "ANIO_TITULADOS"})
+        return int(self._filas(f"SELECT COALESCE(SUM(TITULADOS_TOTALES), 0) FROM tit{where}", params)[0][0])
+
+    # ── oferta ──
+
+    def leer_oferta(self) -> pd.DataFrame:
+        return pd.read_sql_query("SELECT * FROM oferta", self.conexion())
+
+    def oferta_por_campo(self, prov_key) -> pd.DataFrame:
+        where, params = self._where({"PROV_KEY": prov_key}, {"PROV_KEY"})
+        filas = self._filas(
+            f"SELECT CAMPO_DETALLADO, COUNT(*) FROM oferta_claves{where} GROUP BY CAMPO_DETALLADO ORDER BY CAMPO_DETALLADO",
+            params,
+        )
+        return pd.DataFrame(filas, columns=["CAMPO_DETALLADO", "NUM_PROGRAMAS"])
+
+    def conteos_oferta(self, prov_key) -> dict:
+        """Programas, nombres no vacíos y distintos por cada clave que usan los badges."""
+        where, params = self._where({"PROV_KEY": prov_key}, {"PROV_KEY"})
+        fila = self._filas(
+            "SELECT COUNT(*), COALESCE(SUM(PROG_NAME <> ''), 0), COUNT(DISTINCT PROG_KEY),"
+            " COUNT(DISTINCT CAMPO_KEY || '||' || IES_KEY), COUNT(DISTINCT CAMPO_KEY)"
+            f" FROM oferta_claves{where}",
+            params,
+        )[0]
+        return {
+            "programas": int(fila[0]),
+            "con_nombre": int(fila[1]),
+            "nombres": int(fila[2]),
+            "campo_ies": int(fila[3]),
+            "campos": int(fila[4]),
+        }
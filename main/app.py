@@ -9,10 +9,17 @@ import os
 import re
 import io
 import csv
+import sys
+import hmac
 import unicodedata
 import logging
+import functools
 import subprocess
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from urllib.parse import urlencode
 from urllib.request import urlopen, Request
 
 import pandas as pd
@@ -25,6 +32,21 @@ from flask import (
     current_app,
 )
 
+# módulos hermanos de main/ (también con gunicorn main.app:app desde la raíz)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from excel_streaming import columnas_excel, leer_columnas  # noqa: E402
+from perfilador import PERFILADOR, HEADER as HEADER_PERFIL  # noqa: E402
+import tiempos  # noqa: E402
+from informe_carga import InformeCarga, fases_mas_lentas  # noqa: E402
+from kernel_agregacion import IndiceAgregacion  # noqa: E402
+import almacen_sqlite  # noqa: E402
+from almacen_sqlite import AlmacenSQLite  # noqa: E402
+from bloqueo import Bloqueo  # noqa: E402
+from cache_respuestas import CacheDisco  # noqa: E402
+from vuelo_unico import VueloUnico  # noqa: E402
+from calentador import Calentador, HEADER as HEADER_CALENTADOR  # noqa: E402
+from tiempos import con_fase  # noqa: E402
+
 # ───────────────────────────── Config ─────────────────────────────
 
 logging.basicConfig(level=logging.INFO)
@@ -36,6 +58,7 @@ TEMPLATES_DIR = os.path.join(ROOT_DIR, "templates")
 STATIC_DIR = os.path.join(ROOT_DIR, "static")
 
 app = Flask(__name__, template_folder=TEMPLATES_DIR, static_folder=STATIC_DIR)
+app.json = tiempos.ProveedorJSONMedido(app)  # la codificación JSON cuenta en Server-Timing
 
 # Data local dentro del repo (solo existe si lo subes al repo)
 DATA_DIR = os.path.join(ROOT_DIR, "data")
@@ -71,6 +94,43 @@ F1_TMP_PATH = os.path.join(TMP_DIR, DEFAULT_F1_FILENAME)
 # Pipeline (solo local; en Render normalmente NO conviene correr Selenium aquí)
 PIPELINE_SCRIPT = os.path.join(BASE_DIR, "pipeline_update.py")
 
+# Carga de F1 por bloques (map-reduce): filas por bloque; 0 = carga completa
+# en memoria. Con bloques, df_mat/df_tit quedan agregados (sin filas de F1).
+F1_BLOQUE_FILAS = int(os.environ.get("CEDEPRO_F1_BLOQUE_FILAS", "0") or 0)
+F1_PROCESOS = int(os.environ.get("CEDEPRO_F1_PROCESOS", "0") or 0) or min(4, os.cpu_count() or 1)
+
+# Sumas agrupadas con el kernel numpy (kernel_agregacion.py); 0 = groupby de pandas
+USAR_KERNEL = os.environ.get("CEDEPRO_KERNEL", "1") != "0"
+
+# Backend de consultas: "memoria" (DataFrames en cada worker) o "sqlite"
+# (tablas en un archivo compartido por los workers; ver almacen_sqlite.py)
+BACKEND = os.environ.get("CEDEPRO_BACKEND", "memoria").strip().lower()
+SQLITE_PATH = os.environ.get("CEDEPRO_SQLITE_PATH") or os.path.join(TMP_DIR, "cedepro_api.sqlite")
+
+# Caché de respuestas en disco compartida por los workers (cache_respuestas.py)
+CACHE_ACTIVA = os.environ.get("CEDEPRO_CACHE", "1") != "0"
+CACHE_DIR = os.environ.get("CEDEPRO_CACHE_DIR") or os.path.join(TMP_DIR, "cedepro_cache")
+CACHE_MB = float(os.environ.get("CEDEPRO_CACHE_MB", "64") or 64)
+# Código del que dependen los cuerpos cacheados (entra en la versión de datos)
+MODULOS_RESPUESTA = ["app.py", "kernel_agregacion.py", "almacen_sqlite.py", "excel_streaming.py", "tiempos.py"]
+
+# Requests idénticos concurrentes comparten un solo cálculo (vuelo_unico.py)
+VUELO_UNICO_ACTIVO = os.environ.get("CEDEPRO_VUELO_UNICO", "1") != "0"
+
+# Calentador de la caché tras cada carga (calentador.py); requiere la caché.
+# Presupuesto: segundos de pared y tope de RSS total del worker (el plan free
+# de Render da 512 MB y los datos cargados ya ocupan 150-240 MB).
+CALENTADOR_ACTIVO = os.environ.get("CEDEPRO_CALENTADOR", "1") != "0"
+CALENTADOR_HILOS = int(os.environ.get("CEDEPRO_CALENTADOR_HILOS", "1") or 1)
+CALENTADOR_SEGUNDOS = float(os.environ.get("CEDEPRO_CALENTADOR_SEGUNDOS", "300") or 300)
+CALENTADOR_RSS_MB = float(os.environ.get("CEDEPRO_CALENTADOR_RSS_MB", "384") or 384)
+CALENTADOR_PAUSA_MS = float(os.environ.get("CEDEPRO_CALENTADOR_PAUSA_MS", "10") or 0)
+
+# Endpoints /api/admin/*: token solo en el header X-Admin-Token (en la URL
+# quedaría en logs de acceso, proxies e historial). Sin token configurado
+# solo responden a localhost.
+ADMIN_TOKEN = os.environ.get("CEDEPRO_ADMIN_TOKEN", "")
+
 # ───────────────────────────── Utils ─────────────────────────────
 
 def clean_str(x) -> str:
@@ -92,14 +152,27 @@ def norm_search(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
+# "1.234", "1,234", "1 234": en F1 los conteos en texto traen separador de miles
+_MILES_RE = re.compile(r"-?\d{1,3}(?:([.,\s])\d{3})(?:\1\d{3})*")
+
 def to_int_safe(x) -> int:
+    """
+    Conteo de una celda de F1 (matriculados, titulados) tal como la entrega
+    openpyxl: número, texto o vacío. Es la única conversión de la carga
+    completa y de la carga por bloques; ambas le pasan la celda cruda (sin
+    la inferencia de read_excel, que leería "1.009" como 1,009).
+    Texto con separador de miles -> entero sin separadores; otro texto
+    numérico (coma o punto decimal) -> parte entera; lo demás -> 0.
+    """
     try:
         if pd.isna(x):
             return 0
         if isinstance(x, (int, float)):
             return int(x)
-        s = re.sub(r"[^\d\-]", "", str(x))
-        return int(s) if s not in ("", "-", None) else 0
+        s = clean_str(x).replace("\xa0", " ")
+        if _MILES_RE.fullmatch(s):
+            return int(re.sub(r"[.,\s]", "", s))
+        return int(float(s.replace(",", ".")))
     except Exception:
         return 0
 
@@ -251,6 +324,36 @@ df_mat_raw = None
 df_mat = None
 df_tit = None
 
+# Informe por fases de la última carga (ver informe_carga.py)
+INFORME_CARGA = None
+
+# Índices numpy de df_mat / df_tit (se rearman en cada carga)
+IDX_MAT = None
+IDX_TIT = None
+
+# Almacén SQLite abierto (solo con CEDEPRO_BACKEND=sqlite)
+ALMACEN = None
+
+# Versión de los datos cargados (clave de la caché de respuestas)
+VERSION_DATOS = None
+CACHE = CacheDisco(CACHE_DIR, CACHE_MB) if CACHE_ACTIVA else None
+VUELOS = VueloUnico() if VUELO_UNICO_ACTIVO else None
+CALENTADOR = None
+if CALENTADOR_ACTIVO and CACHE is not None:
+    CALENTADOR = Calentador(
+        app,
+        hilos=CALENTADOR_HILOS,
+        segundos=CALENTADOR_SEGUNDOS,
+        rss_mb=CALENTADOR_RSS_MB,
+        pausa_ms=CALENTADOR_PAUSA_MS,
+        limite_cache_bytes=CACHE.limite,
+    )
+    # gunicorn --preload: el hilo no sobrevive al fork; lo retoma un worker
+    os.register_at_fork(before=CALENTADOR.antes_de_fork, after_in_child=CALENTADOR.en_hijo)
+
+# El calentador pide rutas con test_client: espera a que estén registradas
+_RUTAS_LISTAS = False
+
 COL_PROV_OF = None
 COL_CAMPO_OF = None
 COL_IES_OF = None
@@ -291,65 +394,411 @@ candidates_map = {
     "titulados_totales": ["TITULADOS_TOTALES", "TOTAL_TITULADOS", "TOTAL DE TITULADOS", "TITULADOS TOTALES"],
 }
 
+# ─────────────────── Carga F1 por bloques (map-reduce) ───────────────────
+#
+# Para F1 que no caben en memoria (década de años + posgrado). La F1 se lee
+# en streaming solo con las columnas que usan los endpoints; cada bloque de
+# filas se normaliza (en un pool de procesos) y se reduce a sumas por
+# grupo; los parciales se pliegan en el acumulado y el bloque se descarta.
+#
+# El resultado tiene las mismas columnas que df_mat / df_tit de la carga
+# completa, pero una fila por combinación (año, nivel, campo, provincia):
+# los filtros y groupby().sum() de los endpoints dan los mismos totales.
+#
+# La decisión "CAMPO_DETALLADO_P ya trae provincia" es sobre TODA la F1, así
+# que el map agrupa por campo y provincia normalizados por separado y la
+# clave final se arma al terminar.
+
+MAT_CLAVES_BLOQUE = ["CAMPO_SRC", "PROV_SRC", "ANIO_MATRICULACION", "NIVEL_FORMACION"]
+MAT_CLAVES = [
+    "ANIO_MATRICULACION", "NIVEL_FORMACION",
+    "CAMPO_DETALLADO_P", "CAMPO_BASE_P", "PROV_DESDE_CAMPO_P",
+    "PROV_KEY", "CAMPO_KEY",
+]
+TIT_CLAVES_BLOQUE = ["TITULADOS_P", "ANIO_TITULADOS"]
+
+
+def _mapear_bloque_f1(bloque: pd.DataFrame) -> dict:
+    """
+    MAP: normaliza un bloque de F1 (columnas por rol: anio, nivel, campo,
+    prov, mat, tit_p, tit_anio, tit_total) con las mismas reglas de
+    load_base y lo reduce a sumas por grupo.
+    """
+    n = len(bloque)
+    vacio = pd.Series([""] * n, index=bloque.index)
+
+    campo_src = bloque["campo"].fillna("").map(clean_str) if "campo" in bloque else vacio
+    campo_src = campo_src.map(normalize_campo_p)
+    prov_src = bloque["prov"].fillna("").map(clean_str).map(normalize_prov_token) if "prov" in bloque else vacio
+
+    mat = pd.DataFrame({
+        "CAMPO_SRC": campo_src,
+        "PROV_SRC": prov_src,
+        "ANIO_MATRICULACION": bloque["anio"].map(parse_year) if "anio" in bloque else None,
+        "NIVEL_FORMACION": bloque["nivel"].fillna("").map(clean_str) if "nivel" in bloque else "",
+        "MAT": bloque["mat"].map(to_int_safe) if "mat" in bloque else 0,
+    })
+    salida = {
+        "filas": n,
+        "con_guion": bool(campo_src.astype(str).str.contains("_", regex=False).any()),
+        "mat": mat.groupby(MAT_CLAVES_BLOQUE, dropna=False, sort=False)["MAT"].sum().reset_index(),
+        "tit": None,
+    }
+
+    if {"tit_p", "tit_anio", "tit_total"} <= set(bloque.columns):
+        tit = pd.DataFrame({
+            "TITULADOS_P": bloque["tit_p"].fillna("").map(clean_str).map(normalize_campo_p),
+            "ANIO_TITULADOS": bloque["tit_anio"].map(parse_year),
+            "TITULADOS_TOTALES": bloque["tit_total"].map(to_int_safe),
+        })
+        salida["tit"] = (
+            tit.groupby(TIT_CLAVES_BLOQUE, dropna=False, sort=False)["TITULADOS_TOTALES"]
+            .sum()
+            .reset_index()
+        )
+    return salida
+
+
+def _plegar(acumulado, parcial, claves, valor):
+    """REDUCE: suma un parcial al acumulado por claves."""
+    if parcial is None:
+        return acumulado
+    if acumulado is None:
+        return parcial
+    return (
+        pd.concat([acumulado, parcial], ignore_index=True)
+        .groupby(claves, dropna=False, sort=False)[valor]
+        .sum()
+        .reset_index()
+    )
+
+
+def _bloques_f1(path: str, roles: dict, filas_por_bloque: int):
+    """Bloques de F1 (DataFrame con columnas por rol) leídos en streaming."""
+    nombres = list(roles)
+    columnas = [roles[r] for r in nombres]
+    filas = []
+    for valores in leer_columnas(path, columnas, omitir_vacias=False):
+        filas.append(valores)
+        if len(filas) >= filas_por_bloque:
+            yield pd.DataFrame(filas, columns=nombres)
+            filas = []
+    if filas:
+        yield pd.DataFrame(filas, columns=nombres)
+
+
+def cargar_f1_por_bloques(path: str, filas_por_bloque: int = 50_000, procesos: int | None = None) -> dict:
+    """
+    Carga F1 en modo map-reduce. Devuelve {"df_mat", "df_tit", "encabezado",
+    "columnas", "col_mat", "filas", "bloques"}; "columnas" son las columnas
+    de F1 detectadas por rol (None si no está). df_tit es None si F1 no
+    trae las tres columnas de titulados.
+    """
+    encabezado = columnas_excel(path)
+    cols = {
+        "anio": find_column(encabezado, candidates_map["anio_mat"]),
+        "nivel": find_column(encabezado, candidates_map["nivel_mat"]),
+        "campo": find_column(encabezado, candidates_map["campo_p"]),
+        "prov": find_column(encabezado, candidates_map["prov_mat"]),
+        "mat": find_column(encabezado, candidates_map["matriculados"]),
+        "tit_p": find_column(encabezado, candidates_map["titulados_p"]),
+        "tit_anio": find_column(encabezado, candidates_map["anio_titulados"]),
+        "tit_total": find_column(encabezado, candidates_map["titulados_totales"]),
+    }
+    roles = {r: c for r, c in cols.items() if c}
+
+    procesos = procesos or F1_PROCESOS
+    pool = None
+    if procesos > 1 and "fork" in multiprocessing.get_all_start_methods():
+        # fork: los workers no vuelven a importar app (ni a correr load_base)
+        pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("fork"))
+
+    acumulado = {"filas": 0, "bloques": 0, "con_guion": False, "mat": None, "tit": None}
+
+    def plegar(parcial):
+        acumulado["filas"] += parcial["filas"]
+        acumulado["bloques"] += 1
+        acumulado["con_guion"] = acumulado["con_guion"] or parcial["con_guion"]
+        acumulado["mat"] = _plegar(acumulado["mat"], parcial["mat"], MAT_CLAVES_BLOQUE, "MAT")
+        acumulado["tit"] = _plegar(acumulado["tit"], parcial["tit"], TIT_CLAVES_BLOQUE, "TITULADOS_TOTALES")
+
+    try:
+        if pool is None:
+            for bloque in _bloques_f1(path, roles, filas_por_bloque):
+                plegar(_mapear_bloque_f1(bloque))
+        else:
+            # como mucho 2 bloques por proceso en vuelo: memoria acotada
+            en_vuelo = deque()
+            for bloque in _bloques_f1(path, roles, filas_por_bloque):
+                en_vuelo.append(pool.submit(_mapear_bloque_f1, bloque))
+                if len(en_vuelo) >= 2 * procesos:
+                    plegar(en_vuelo.popleft().result())
+            while en_vuelo:
+                plegar(en_vuelo.popleft().result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    col_mat = cols["mat"] or "TOTAL_MATRICULADOS"
+
+    # Matriculados: clave final CAMPO_DETALLADO_P (con o sin provincia)
+    mat = acumulado["mat"]
+    if mat is None:
+        df_mat = pd.DataFrame(columns=MAT_CLAVES + [col_mat])
+    else:
+        if acumulado["con_guion"]:
+            mat["CAMPO_DETALLADO_P"] = mat["CAMPO_SRC"]
+        else:
+            mat["CAMPO_DETALLADO_P"] = (mat["CAMPO_SRC"] + "_" + mat["PROV_SRC"]).map(normalize_campo_p)
+        partes = [split_campo_p(v) for v in mat["CAMPO_DETALLADO_P"].astype(str)]
+        mat["CAMPO_BASE_P"] = [b for b, _ in partes]
+        mat["PROV_DESDE_CAMPO_P"] = [p for _, p in partes]
+        mat["PROV_KEY"] = mat["PROV_DESDE_CAMPO_P"].map(norm_search)
+        mat["CAMPO_KEY"] = mat["CAMPO_BASE_P"].map(norm_search)
+        df_mat = (
+            mat.groupby(MAT_CLAVES, dropna=False)["MAT"]
+            .sum()
+            .reset_index()
+            .rename(columns={"MAT": col_mat})
+        )
+
+    # Titulados
+    tit = acumulado["tit"]
+    if tit is None:
+        df_tit = None
+    else:
+        partes = [split_campo_p(v) for v in tit["TITULADOS_P"].astype(str)]
+        tit["CAMPO_BASE_T"] = [b for b, _ in partes]
+        tit["PROV_T"] = [p for _, p in partes]
+        tit["PROV_KEY"] = tit["PROV_T"].map(norm_search)
+        tit["CAMPO_KEY"] = tit["CAMPO_BASE_T"].map(norm_search)
+        df_tit = tit[tit["CAMPO_KEY"].astype(str).str.len() > 0].reset_index(drop=True)
+
+    return {
+        "df_mat": df_mat,
+        "df_tit": df_tit,
+        "encabezado": encabezado,
+        "columnas": cols,
+        "col_mat": col_mat,
+        "filas": acumulado["filas"],
+        "bloques": acumulado["bloques"],
+    }
+
 # ───────────────────────────── Loaders ─────────────────────────────
 
 def load_base():
-    global df_of_raw, df_of, df_mat_raw, df_mat, df_tit
-    global COL_PROV_OF, COL_CAMPO_OF, COL_IES_OF, COL_TIPO_PROG_OF, COL_PROG_NAME
-    global COL_MAT_ANIO, COL_MAT_NIVEL, COL_MAT_CAMPO_P, COL_MAT_PROV, COL_MAT_MAT
-    global COL_TIT_P, COL_TIT_ANIO, COL_TIT_TOTAL
+    """Carga oferta y F1 en los globals y deja el informe por fases en INFORME_CARGA."""
+    global INFORME_CARGA, VERSION_DATOS
+
+    if CALENTADOR is not None:
+        # el calentamiento anterior es de datos viejos (y la carga hace fork)
+        CALENTADOR.cancelar()
+
+    informe = InformeCarga()
+    try:
+        _resolver_rutas(informe)
+        if BACKEND == "sqlite":
+            _load_sqlite(informe)
+        else:
+            _load_base(informe)
+        with informe.fase("indices", "kernel") as f:
+            _construir_indices()
+            f.resultado(filas=0 if IDX_MAT is None else IDX_MAT.n)
+        # misma versión en todos los workers con los mismos archivos, código y modo de carga
+        VERSION_DATOS = almacen_sqlite.huella_fuentes(
+            [OFERTA_VIGENTE_PATH, F1_PATH] + [os.path.join(BASE_DIR, m) for m in MODULOS_RESPUESTA],
+            config={
+                "backend": "sqlite" if ALMACEN is not None else "memoria",
+                "f1_por_bloques": F1_BLOQUE_FILAS > 0,
+                "kernel": USAR_KERNEL,
+            },
+        )
+        if CACHE is not None:
+            try:
+                CACHE.activar_version(VERSION_DATOS)
+            except OSError as e:
+                logging.warning("⚠️ Caché de respuestas no disponible: %s", str(e))
+        _calentar()
+    finally:
+        INFORME_CARGA = informe.cerrar(
+            oferta_path=OFERTA_VIGENTE_PATH,
+            f1_path=F1_PATH,
+            f1_por_bloques=F1_BLOQUE_FILAS > 0,
+            backend="sqlite" if ALMACEN is not None else "memoria",
+            filas={
+                "df_of": None if df_of is None else len(df_of),
+                "df_mat": None if df_mat is None else len(df_mat),
+                "df_tit": None if df_tit is None else len(df_tit),
+            },
+        )
+        lentas = ", ".join(f"{f['dataset']}.{f['fase']} {f['segundos']:.2f}s" for f in fases_mas_lentas(INFORME_CARGA, 3))
+        logging.info("⏱️ load_base: %.2f s | fases más lentas: %s", INFORME_CARGA["segundos"], lentas)
+
+def _construir_indices():
+    global IDX_MAT, IDX_TIT
+    IDX_MAT = IDX_TIT = None
+    if ALMACEN is not None:
+        return
+    try:
+        if df_mat is not None and not df_mat.empty and COL_MAT_MAT in df_mat.columns:
+            IDX_MAT = IndiceAgregacion(
+                df_mat,
+                ["PROV_KEY", "ANIO_MATRICULACION", "NIVEL_FORMACION", "CAMPO_BASE_P", "CAMPO_DETALLADO_P"],
+                [COL_MAT_MAT],
+                orden="PROV_KEY",
+            )
+        if df_tit is not None and not df_tit.empty:
+            IDX_TIT = IndiceAgregacion(df_tit, ["PROV_KEY", "ANIO_TITULADOS", "CAMPO_KEY"], ["TITULADOS_TOTALES"], orden="PROV_KEY")
+    except Exception as e:
+        # sin índices las funciones usan el camino de pandas
+        logging.warning("⚠️ No se pudieron armar los índices del kernel: %s", str(e))
+        IDX_MAT = IDX_TIT = None
+
+def _resolver_rutas(informe):
     global OFERTA_VIGENTE_PATH, F1_PATH
 
     ensure_dir(DATA_DIR)
 
-    oferta_path_resolved = resolve_data_path(OFERTA_VIGENTE_PATH, ENV_OFERTA_URL, OFERTA_TMP_PATH)
-    f1_path_resolved = resolve_data_path(F1_PATH, ENV_F1_URL, F1_TMP_PATH)
+    # resolución de rutas (incluye la descarga desde URL si hace falta)
+    with informe.fase("rutas", "resolucion"):
+        oferta_path_resolved = resolve_data_path(OFERTA_VIGENTE_PATH, ENV_OFERTA_URL, OFERTA_TMP_PATH)
+        f1_path_resolved = resolve_data_path(F1_PATH, ENV_F1_URL, F1_TMP_PATH)
 
-    oferta_path_resolved = try_autofind_in_data_dir(
-        oferta_path_resolved,
-        fallback_keywords=["vigente", "f_1_vigente", "f1_vigente", "oferta"]
-    )
-    f1_path_resolved = try_autofind_in_data_dir(
-        f1_path_resolved,
-        fallback_keywords=["matriculados", "f_1_matriculados", "f1_matriculados", "f1"]
-    )
+        oferta_path_resolved = try_autofind_in_data_dir(
+            oferta_path_resolved,
+            fallback_keywords=["vigente", "f_1_vigente", "f1_vigente", "oferta"]
+        )
+        f1_path_resolved = try_autofind_in_data_dir(
+            f1_path_resolved,
+            fallback_keywords=["matriculados", "f_1_matriculados", "f1_matriculados", "f1"]
+        )
 
     OFERTA_VIGENTE_PATH = oferta_path_resolved
     F1_PATH = f1_path_resolved
 
+COLUMNAS_DETECTADAS = [
+    "COL_PROV_OF", "COL_CAMPO_OF", "COL_IES_OF", "COL_TIPO_PROG_OF", "COL_PROG_NAME",
+    "COL_MAT_ANIO", "COL_MAT_NIVEL", "COL_MAT_CAMPO_P", "COL_MAT_PROV", "COL_MAT_MAT",
+    "COL_TIT_P", "COL_TIT_ANIO", "COL_TIT_TOTAL",
+]
+
+def _claves_oferta(df):
+    """Claves normalizadas de la oferta para los conteos de badges en SQL."""
+    claves = pd.DataFrame({
+        "PROV_KEY": df["PROV_KEY"],
+        "CAMPO_DETALLADO": df["CAMPO_DETALLADO"],
+        "CAMPO_KEY": df["CAMPO_DETALLADO"].astype(str).map(norm_search),
+        "PROG_NAME": df["PROG_NAME"].astype(str),
+        "PROG_KEY": df["PROG_NAME"].astype(str).map(norm_search),
+    })
+    claves["IES_KEY"] = df[COL_IES_OF].astype(str).map(norm_search) if (COL_IES_OF and COL_IES_OF in df.columns) else None
+    return claves
+
+def _load_sqlite(informe):
+    """
+    Backend SQLite: si el archivo corresponde a los Excel actuales se reutiliza
+    (solo se lee la oferta); si no, carga normal y se escribe. Un bloqueo evita
+    que varios workers lo armen a la vez. Si algo falla, queda el backend en memoria.
+    """
+    global ALMACEN, df_of_raw, df_of, df_mat_raw, df_mat, df_tit
+
+    # las tablas dependen también del código de carga y de cómo se leyó F1
+    huella = almacen_sqlite.huella_fuentes(
+        [OFERTA_VIGENTE_PATH, F1_PATH] + [os.path.join(BASE_DIR, m) for m in ("app.py", "excel_streaming.py")],
+        config={"f1_por_bloques": F1_BLOQUE_FILAS > 0},
+    )
+    cargado = False
+    try:
+        with Bloqueo(SQLITE_PATH + ".lock", espera=900):
+            meta = almacen_sqlite.leer_meta(SQLITE_PATH)
+            if meta is None or meta.get("huella") != huella:
+                _load_base(informe)
+                cargado = True
+                with informe.fase("sqlite", "escritura") as f:
+                    filas = almacen_sqlite.escribir(
+                        SQLITE_PATH, df_of, _claves_oferta(df_of), df_mat, df_tit, COL_MAT_MAT,
+                        huella, {c: globals()[c] for c in COLUMNAS_DETECTADAS},
+                    )
+                    f.resultado(filas=sum(filas.values()))
+
+        with informe.fase("sqlite", "apertura") as f:
+            almacen = AlmacenSQLite(SQLITE_PATH)
+            if not cargado:
+                globals().update(almacen.meta["columnas"])
+                df_of = almacen.leer_oferta()
+            f.resultado(df_of)
+    except Exception as e:
+        logging.error("❌ Backend SQLite no disponible (%s); se usan los DataFrames en memoria.", str(e))
+        ALMACEN = None
+        if not cargado:
+            _load_base(informe)
+        return
+
+    # las consultas van al archivo: fuera del heap lo que no usa ninguna ruta
+    ALMACEN = almacen
+    df_of_raw = pd.DataFrame()
+    df_mat_raw = pd.DataFrame()
+    df_mat = pd.DataFrame(columns=MAT_CLAVES + [COL_MAT_MAT])
+    df_tit = pd.DataFrame(columns=[
+        "TITULADOS_P", "ANIO_TITULADOS", "TITULADOS_TOTALES",
+        "PROV_KEY", "CAMPO_KEY", "CAMPO_BASE_T"
+    ])
+    logging.info(
+        "✅ Backend SQLite %s: %s | filas %s", "armado" if cargado else "reutilizado",
+        SQLITE_PATH, almacen.meta.get("filas"),
+    )
+
+def _load_base(informe):
+    global df_of_raw, df_of, df_mat_raw, df_mat, df_tit
+    global COL_PROV_OF, COL_CAMPO_OF, COL_IES_OF, COL_TIPO_PROG_OF, COL_PROG_NAME
+    global COL_MAT_ANIO, COL_MAT_NIVEL, COL_MAT_CAMPO_P, COL_MAT_PROV, COL_MAT_MAT
+    global COL_TIT_P, COL_TIT_ANIO, COL_TIT_TOTAL
+
     # ── OFERTA VIGENTE ──────────────────────────────
     try:
         if not os.path.exists(OFERTA_VIGENTE_PATH):
             raise FileNotFoundError(f"No existe OFERTA VIGENTE en: {OFERTA_VIGENTE_PATH}")
 
-        df_of_raw_local = pd.read_excel(OFERTA_VIGENTE_PATH)
-
-        COL_PROV_OF = find_column(df_of_raw_local.columns, candidates_map["provincia_of"])
-        COL_CAMPO_OF = find_column(df_of_raw_local.columns, candidates_map["campo_of"])
-        COL_IES_OF = find_column(df_of_raw_local.columns, candidates_map["ies_of"])
-        COL_TIPO_PROG_OF = find_column(df_of_raw_local.columns, candidates_map["tipo_prog_of"])
-        COL_PROG_NAME = find_column(df_of_raw_local.columns, candidates_map["prog_name"])
-
-        df_of_local = df_of_raw_local.copy()
-
-        if COL_PROV_OF and COL_PROV_OF in df_of_local.columns:
-            df_of_local["PROV_DISPLAY"] = df_of_local[COL_PROV_OF].fillna("").map(clean_str).map(normalize_prov_token)
-        else:
-            df_of_local["PROV_DISPLAY"] = ""
-
-        if COL_CAMPO_OF and COL_CAMPO_OF in df_of_local.columns:
-            df_of_local["CAMPO_DETALLADO"] = df_of_local[COL_CAMPO_OF].fillna("").map(clean_str)
-        else:
-            df_of_local["CAMPO_DETALLADO"] = ""
-
-        df_of_local["PROV_KEY"] = df_of_local["PROV_DISPLAY"].map(norm_search)
-        df_of_local["CAMPO_KEY"] = df_of_local["CAMPO_DETALLADO"].map(norm_search)
+        with informe.fase("oferta", "read_excel") as f:
+            df_of_raw_local = pd.read_excel(OFERTA_VIGENTE_PATH)
+            f.resultado(df_of_raw_local)
+
+        with informe.fase("oferta", "columnas"):
+            COL_PROV_OF = find_column(df_of_raw_local.columns, candidates_map["provincia_of"])
+            COL_CAMPO_OF = find_column(df_of_raw_local.columns, candidates_map["campo_of"])
+            COL_IES_OF = find_column(df_of_raw_local.columns, candidates_map["ies_of"])
+            COL_TIPO_PROG_OF = find_column(df_of_raw_local.columns, candidates_map["tipo_prog_of"])
+            COL_PROG_NAME = find_column(df_of_raw_local.columns, candidates_map["prog_name"])
+
+        with informe.fase("oferta", "copia"):
+            df_of_local = df_of_raw_local.copy()
+
+        with informe.fase("oferta", "PROV_DISPLAY") as f:
+            if COL_PROV_OF and COL_PROV_OF in df_of_local.columns:
+                df_of_local["PROV_DISPLAY"] = df_of_local[COL_PROV_OF].fillna("").map(clean_str).map(normalize_prov_token)
+            else:
+                df_of_local["PROV_DISPLAY"] = ""
+            f.resultado(df_of_local, ["PROV_DISPLAY"])
+
+        with informe.fase("oferta", "CAMPO_DETALLADO") as f:
+            if COL_CAMPO_OF and COL_CAMPO_OF in df_of_local.columns:
+                df_of_local["CAMPO_DETALLADO"] = df_of_local[COL_CAMPO_OF].fillna("").map(clean_str)
+            else:
+                df_of_local["CAMPO_DETALLADO"] = ""
+            f.resultado(df_of_local, ["CAMPO_DETALLADO"])
+
+        with informe.fase("oferta", "PROV_KEY/CAMPO_KEY") as f:
+            df_of_local["PROV_KEY"] = df_of_local["PROV_DISPLAY"].map(norm_search)
+            df_of_local["CAMPO_KEY"] = df_of_local["CAMPO_DETALLADO"].map(norm_search)
+            f.resultado(df_of_local, ["PROV_KEY", "CAMPO_KEY"])
 
         # nombre programa/carrera (para total_carreras)
-        if COL_PROG_NAME and COL_PROG_NAME in df_of_local.columns:
-            df_of_local["PROG_NAME"] = df_of_local[COL_PROG_NAME].fillna("").map(clean_str)
-        else:
-            df_of_local["PROG_NAME"] = ""
+        with informe.fase("oferta", "PROG_NAME") as f:
+            if COL_PROG_NAME and COL_PROG_NAME in df_of_local.columns:
+                df_of_local["PROG_NAME"] = df_of_local[COL_PROG_NAME].fillna("").map(clean_str)
+            else:
+                df_of_local["PROG_NAME"] = ""
+            f.resultado(df_of_local, ["PROG_NAME"])
 
         df_of_raw = df_of_raw_local
         df_of = df_of_local
@@ -360,58 +809,132 @@ def load_base():
         df_of_raw = pd.DataFrame()
         df_of = pd.DataFrame(columns=["PROV_DISPLAY", "CAMPO_DETALLADO", "PROV_KEY", "CAMPO_KEY", "PROG_NAME"])
 
+    # ── F1 POR BLOQUES (map-reduce, sin filas de F1 en memoria) ──────
+    if F1_BLOQUE_FILAS > 0:
+        try:
+            if not os.path.exists(F1_PATH):
+                raise FileNotFoundError(f"No existe F1 en: {F1_PATH}")
+
+            with informe.fase("f1", "por_bloques") as f:
+                carga = cargar_f1_por_bloques(F1_PATH, F1_BLOQUE_FILAS)
+                f.resultado(filas=carga["filas"])
+            cols = carga["columnas"]
+            COL_MAT_ANIO, COL_MAT_NIVEL = cols["anio"], cols["nivel"]
+            COL_MAT_CAMPO_P, COL_MAT_PROV = cols["campo"], cols["prov"]
+            COL_MAT_MAT = carga["col_mat"]
+            COL_TIT_P, COL_TIT_ANIO, COL_TIT_TOTAL = cols["tit_p"], cols["tit_anio"], cols["tit_total"]
+
+            df_mat_raw = pd.DataFrame(columns=carga["encabezado"])
+            df_mat = carga["df_mat"]
+            with informe.fase("f1", "matriculados_agregados") as f:
+                f.resultado(df_mat)
+            logging.info(
+                "✅ Matriculados cargados por bloques: %s filas de F1 en %s bloques -> %s grupos | archivo: %s",
+                carga["filas"], carga["bloques"], len(df_mat), F1_PATH,
+            )
+        except Exception as e:
+            logging.error("❌ No se pudo cargar F1 MATRICULADOS: %s", str(e))
+            carga = None
+            df_mat_raw = pd.DataFrame()
+            df_mat = pd.DataFrame(columns=[
+                "ANIO_MATRICULACION", "NIVEL_FORMACION",
+                "CAMPO_DETALLADO_P", "CAMPO_BASE_P", "PROV_DESDE_CAMPO_P",
+                "PROV_KEY", "CAMPO_KEY", "TOTAL_MATRICULADOS"
+            ])
+            COL_MAT_MAT = "TOTAL_MATRICULADOS"
+
+        if carga is not None and carga["df_tit"] is not None:
+            df_tit = carga["df_tit"]
+            with informe.fase("titulados", "agregados") as f:
+                f.resultado(df_tit)
+            logging.info("✅ Titulados cargados por bloques: %s grupos", len(df_tit))
+        else:
+            if carga is not None:
+                logging.warning("⚠️ No se detectaron columnas completas de TITULADOS.")
+            df_tit = pd.DataFrame(columns=[
+                "TITULADOS_P", "ANIO_TITULADOS", "TITULADOS_TOTALES",
+                "PROV_KEY", "CAMPO_KEY", "CAMPO_BASE_T"
+            ])
+        return
+
     # ── F1 (MATRICULADOS + TITULADOS) ──────────────────────────────
     try:
         if not os.path.exists(F1_PATH):
             raise FileNotFoundError(f"No existe F1 en: {F1_PATH}")
 
-        df_mat_raw_local = pd.read_excel(F1_PATH)
-
-        COL_MAT_ANIO = find_column(df_mat_raw_local.columns, candidates_map["anio_mat"])
-        COL_MAT_NIVEL = find_column(df_mat_raw_local.columns, candidates_map["nivel_mat"])
-        COL_MAT_CAMPO_P = find_column(df_mat_raw_local.columns, candidates_map["campo_p"])
-        COL_MAT_PROV = find_column(df_mat_raw_local.columns, candidates_map["prov_mat"])
-        COL_MAT_MAT = find_column(df_mat_raw_local.columns, candidates_map["matriculados"])
-
-        df_mat_local = df_mat_raw_local.copy()
-
-        df_mat_local["ANIO_MATRICULACION"] = (
-            df_mat_local[COL_MAT_ANIO].map(parse_year) if COL_MAT_ANIO else None
-        )
-        df_mat_local["NIVEL_FORMACION"] = (
-            df_mat_local[COL_MAT_NIVEL].fillna("").map(clean_str) if COL_MAT_NIVEL else ""
-        )
-
-        campo_src = df_mat_local[COL_MAT_CAMPO_P].fillna("").map(clean_str) if COL_MAT_CAMPO_P else pd.Series([""] * len(df_mat_local))
-        campo_src = campo_src.map(normalize_campo_p)
-        has_underscore = campo_src.astype(str).str.contains("_", regex=False)
-
-        if has_underscore.any():
-            campo_p_final = campo_src
-        else:
-            prov_src = df_mat_local[COL_MAT_PROV].fillna("").map(clean_str) if (COL_MAT_PROV and COL_MAT_PROV in df_mat_local.columns) else pd.Series([""] * len(df_mat_local))
-            prov_src = prov_src.map(normalize_prov_token)
-            campo_p_final = (campo_src + "_" + prov_src).map(normalize_campo_p)
+        with informe.fase("f1", "read_excel") as f:
+            # conteos como objeto: la celda cruda va a to_int_safe, igual que por bloques
+            encabezado = pd.read_excel(F1_PATH, nrows=0).columns
+            conteos = [
+                find_column(encabezado, candidates_map["matriculados"]),
+                find_column(encabezado, candidates_map["titulados_totales"]),
+            ]
+            df_mat_raw_local = pd.read_excel(F1_PATH, dtype={c: object for c in conteos if c})
+            f.resultado(df_mat_raw_local)
+
+        with informe.fase("f1", "columnas"):
+            COL_MAT_ANIO = find_column(df_mat_raw_local.columns, candidates_map["anio_mat"])
+            COL_MAT_NIVEL = find_column(df_mat_raw_local.columns, candidates_map["nivel_mat"])
+            COL_MAT_CAMPO_P = find_column(df_mat_raw_local.columns, candidates_map["campo_p"])
+            COL_MAT_PROV = find_column(df_mat_raw_local.columns, candidates_map["prov_mat"])
+            COL_MAT_MAT = find_column(df_mat_raw_local.columns, candidates_map["matriculados"])
+
+        with informe.fase("f1", "copia"):
+            df_mat_local = df_mat_raw_local.copy()
+
+        with informe.fase("f1", "ANIO_MATRICULACION") as f:
+            df_mat_local["ANIO_MATRICULACION"] = (
+                df_mat_local[COL_MAT_ANIO].map(parse_year) if COL_MAT_ANIO else None
+            )
+            f.resultado(df_mat_local, ["ANIO_MATRICULACION"])
+
+        with informe.fase("f1", "NIVEL_FORMACION") as f:
+            df_mat_local["NIVEL_FORMACION"] = (
+                df_mat_local[COL_MAT_NIVEL].fillna("").map(clean_str) if COL_MAT_NIVEL else ""
+            )
+            f.resultado(df_mat_local, ["NIVEL_FORMACION"])
+
+        with informe.fase("f1", "CAMPO_DETALLADO_P") as f:
+            campo_src = df_mat_local[COL_MAT_CAMPO_P].fillna("").map(clean_str) if COL_MAT_CAMPO_P else pd.Series([""] * len(df_mat_local))
+            campo_src = campo_src.map(normalize_campo_p)
+            has_underscore = campo_src.astype(str).str.contains("_", regex=False)
+
+            if has_underscore.any():
+                campo_p_final = campo_src
+            else:
+                prov_src = df_mat_local[COL_MAT_PROV].fillna("").map(clean_str) if (COL_MAT_PROV and COL_MAT_PROV in df_mat_local.columns) else pd.Series([""] * len(df_mat_local))
+                prov_src = prov_src.map(normalize_prov_token)
+                campo_p_final = (campo_src + "_" + prov_src).map(normalize_campo_p)
+
+            df_mat_local["CAMPO_DETALLADO_P"] = campo_p_final
+            f.resultado(df_mat_local, ["CAMPO_DETALLADO_P"])
+
+        with informe.fase("f1", "split_campo_p") as f:
+            bases, provs = [], []
+            for v in df_mat_local["CAMPO_DETALLADO_P"].astype(str):
+                b, p = split_campo_p(v)
+                bases.append(b)
+                provs.append(p)
 
-        df_mat_local["CAMPO_DETALLADO_P"] = campo_p_final
+            df_mat_local["CAMPO_BASE_P"] = bases
+            df_mat_local["PROV_DESDE_CAMPO_P"] = provs
+            f.resultado(df_mat_local, ["CAMPO_BASE_P", "PROV_DESDE_CAMPO_P"])
 
-        bases, provs = [], []
-        for v in df_mat_local["CAMPO_DETALLADO_P"].astype(str):
-            b, p = split_campo_p(v)
-            bases.append(b)
-            provs.append(p)
+        with informe.fase("f1", "PROV_KEY/CAMPO_KEY") as f:
+            df_mat_local["PROV_KEY"] = df_mat_local["PROV_DESDE_CAMPO_P"].map(norm_search)
+            df_mat_local["CAMPO_KEY"] = df_mat_local["CAMPO_BASE_P"].map(norm_search)
+            f.resultado(df_mat_local, ["PROV_KEY", "CAMPO_KEY"])
 
-        df_mat_local["CAMPO_BASE_P"] = bases
-        df_mat_local["PROV_DESDE_CAMPO_P"] = provs
+        with informe.fase("f1", "MATRICULADOS") as f:
+            if COL_MAT_MAT and COL_MAT_MAT in df_mat_local.columns:
+                df_mat_local[COL_MAT_MAT] = df_mat_local[COL_MAT_MAT].map(to_int_safe)
+            else:
+                COL_MAT_MAT = "TOTAL_MATRICULADOS"
+                df_mat_local[COL_MAT_MAT] = 0
+            f.resultado(df_mat_local, [COL_MAT_MAT])
 
-        df_mat_local["PROV_KEY"] = df_mat_local["PROV_DESDE_CAMPO_P"].map(norm_search)
-        df_mat_local["CAMPO_KEY"] = df_mat_local["CAMPO_BASE_P"].map(norm_search)
-
-        if COL_MAT_MAT and COL_MAT_MAT in df_mat_local.columns:
-            df_mat_local[COL_MAT_MAT] = df_mat_local[COL_MAT_MAT].map(to_int_safe)
-        else:
-            COL_MAT_MAT = "TOTAL_MATRICULADOS"
-            df_mat_local[COL_MAT_MAT] = 0
+        with informe.fase("f1", "df_mat") as f:
+            f.resultado(df_mat_local)
 
         df_mat_raw = df_mat_raw_local
         df_mat = df_mat_local
@@ -432,29 +955,41 @@ def load_base():
         if df_mat_raw is None or df_mat_raw.empty:
             raise ValueError("F1 no cargado; titulados no disponible.")
 
-        COL_TIT_P = find_column(df_mat_raw.columns, candidates_map["titulados_p"])
-        COL_TIT_ANIO = find_column(df_mat_raw.columns, candidates_map["anio_titulados"])
-        COL_TIT_TOTAL = find_column(df_mat_raw.columns, candidates_map["titulados_totales"])
+        with informe.fase("titulados", "columnas"):
+            COL_TIT_P = find_column(df_mat_raw.columns, candidates_map["titulados_p"])
+            COL_TIT_ANIO = find_column(df_mat_raw.columns, candidates_map["anio_titulados"])
+            COL_TIT_TOTAL = find_column(df_mat_raw.columns, candidates_map["titulados_totales"])
 
         if COL_TIT_P and COL_TIT_ANIO and COL_TIT_TOTAL:
-            df_tit_local = df_mat_raw[[COL_TIT_P, COL_TIT_ANIO, COL_TIT_TOTAL]].copy()
-
-            df_tit_local["TITULADOS_P"] = df_tit_local[COL_TIT_P].fillna("").map(clean_str).map(normalize_campo_p)
-            df_tit_local["ANIO_TITULADOS"] = df_tit_local[COL_TIT_ANIO].map(parse_year)
-            df_tit_local["TITULADOS_TOTALES"] = df_tit_local[COL_TIT_TOTAL].map(to_int_safe)
-
-            bases_t, provs_t = [], []
-            for v in df_tit_local["TITULADOS_P"].astype(str):
-                b, p = split_campo_p(v)
-                bases_t.append(b)
-                provs_t.append(p)
-
-            df_tit_local["CAMPO_BASE_T"] = bases_t
-            df_tit_local["PROV_T"] = provs_t
-            df_tit_local["PROV_KEY"] = df_tit_local["PROV_T"].map(norm_search)
-            df_tit_local["CAMPO_KEY"] = df_tit_local["CAMPO_BASE_T"].map(norm_search)
-
-            df_tit_local = df_tit_local[df_tit_local["CAMPO_KEY"].astype(str).str.len() > 0].copy()
+            with informe.fase("titulados", "recorte") as f:
+                df_tit_local = df_mat_raw[[COL_TIT_P, COL_TIT_ANIO, COL_TIT_TOTAL]].copy()
+                f.resultado(df_tit_local)
+
+            with informe.fase("titulados", "TITULADOS_P/ANIO/TOTALES") as f:
+                df_tit_local["TITULADOS_P"] = df_tit_local[COL_TIT_P].fillna("").map(clean_str).map(normalize_campo_p)
+                df_tit_local["ANIO_TITULADOS"] = df_tit_local[COL_TIT_ANIO].map(parse_year)
+                df_tit_local["TITULADOS_TOTALES"] = df_tit_local[COL_TIT_TOTAL].map(to_int_safe)
+                f.resultado(df_tit_local, ["TITULADOS_P", "ANIO_TITULADOS", "TITULADOS_TOTALES"])
+
+            with informe.fase("titulados", "split_campo_p") as f:
+                bases_t, provs_t = [], []
+                for v in df_tit_local["TITULADOS_P"].astype(str):
+                    b, p = split_campo_p(v)
+                    bases_t.append(b)
+                    provs_t.append(p)
+
+                df_tit_local["CAMPO_BASE_T"] = bases_t
+                df_tit_local["PROV_T"] = provs_t
+                f.resultado(df_tit_local, ["CAMPO_BASE_T", "PROV_T"])
+
+            with informe.fase("titulados", "PROV_KEY/CAMPO_KEY") as f:
+                df_tit_local["PROV_KEY"] = df_tit_local["PROV_T"].map(norm_search)
+                df_tit_local["CAMPO_KEY"] = df_tit_local["CAMPO_BASE_T"].map(norm_search)
+                f.resultado(df_tit_local, ["PROV_KEY", "CAMPO_KEY"])
+
+            with informe.fase("titulados", "filtro_campo") as f:
+                df_tit_local = df_tit_local[df_tit_local["CAMPO_KEY"].astype(str).str.len() > 0].copy()
+                f.resultado(df_tit_local)
 
             df_tit = df_tit_local
             logging.info("✅ Titulados cargados: %s filas", len(df_tit))
@@ -471,18 +1006,69 @@ def load_base():
             "PROV_KEY", "CAMPO_KEY", "CAMPO_BASE_T"
         ])
 
-# Carga inicial
+def _urls_calentar() -> list:
+    """
+    URLs de compare, badges y campos para provincias × años × niveles, con las
+    variantes nacional (sin provincia), ALL y sin nivel. Primero las más
+    generales: la portada y los clics más comunes quedan calientes antes.
+    """
+    provincias = [None] + provincias_list()
+    anios = ["ALL"] + [str(a) for a in years_list()]
+    niveles = [None] + levels_list()
+    combos = sorted(
+        ((p, a, n) for p in provincias for a in anios for n in niveles),
+        key=lambda c: (c[0] is not None) + (c[1] != "ALL") + (c[2] is not None),
+    )
+
+    def url(ruta, **params):
+        qs = urlencode({k: v for k, v in params.items() if v is not None})
+        return f"{ruta}?{qs}" if qs else ruta
+
+    urls = []
+    for p, a, n in combos:
+        urls.append(url("/api/compare", provincia=p, anio=a, nivel=n))
+        urls.append(url("/api/total_matriculados_provincia", provincia=p, anio=a, nivel=n))
+        if n is None and a != "ALL":
+            urls.append(url("/api/total_titulados_provincia", provincia=p, anio=a))
+        if n is None and a == "ALL":
+            urls.append(url("/api/total_oferta_provincia", provincia=p))
+            urls.append(url("/api/total_carreras_provincia", provincia=p))
+            urls.append(url("/api/oferta_campo", provincia=p))
+        if p is None:
+            urls.append(url("/api/matriculas_campo_base_nacional", anio=a, nivel=n))
+        else:
+            urls.append(url("/api/matriculas_campo_base_provincia", provincia=p, anio=a, nivel=n))
+            urls.append(url("/api/matriculas_campo_full_provincia", provincia=p, anio=a, nivel=n))
+    return urls
+
+def _calentar():
+    """Arranca el calentador para la versión activa (después de load_base)."""
+    if CALENTADOR is None or not _RUTAS_LISTAS or CACHE.version is None:
+        return
+    try:
+        urls = _urls_calentar()
+    except Exception as e:
+        logging.warning("⚠️ Calentador: no se pudieron armar las URLs: %s", str(e))
+        return
+    CALENTADOR.iniciar(CACHE.version, os.path.join(CACHE.directorio, CACHE.version), urls)
+    logging.info("🔥 Calentador: %d URLs para la versión %s", len(urls), CACHE.version)
+
+# Carga inicial (el calentador arranca al final del módulo, con las rutas listas)
 load_base()
 
 # ──────────────────────── LISTAS FILTROS ────────────────────────
 
 def provincias_list():
+    if ALMACEN is not None:
+        return ALMACEN.provincias()
     if df_mat is None or df_mat.empty:
         return []
     provs = [p for p in df_mat["PROV_DESDE_CAMPO_P"].dropna().unique().tolist() if p]
     return sorted(provs)
 
 def years_list():
+    if ALMACEN is not None:
+        return ALMACEN.anios()
     if df_mat is None or df_mat.empty:
         return []
     years = pd.Series(df_mat["ANIO_MATRICULACION"]).dropna()
@@ -493,6 +1079,8 @@ def years_list():
     return sorted(years.unique().tolist(), reverse=True)
 
 def levels_list():
+    if ALMACEN is not None:
+        return ALMACEN.niveles()
     if df_mat is None or df_mat.empty:
         return []
     return sorted([l for l in df_mat["NIVEL_FORMACION"].dropna().unique().tolist() if l])
@@ -525,7 +1113,14 @@ def oferta_tipo_programa_table():
     )
     return g
 
+@con_fase("aggregate")
 def oferta_por_campo(provincia=None):
+    if ALMACEN is not None:
+        g = ALMACEN.oferta_por_campo(_prov_key(provincia))
+        if g.empty:
+            return pd.DataFrame(columns=["CAMPO_DETALLADO", "NUM_PROGRAMAS"])
+        return g.sort_values("NUM_PROGRAMAS", ascending=False)
+
     if df_of is None or df_of.empty:
         return pd.DataFrame(columns=["CAMPO_DETALLADO", "NUM_PROGRAMAS"])
 
@@ -547,6 +1142,7 @@ def oferta_por_campo(provincia=None):
 
 # ─────────────────────── MATRICULADOS (F1) ───────────────────────
 
+@con_fase("filter")
 def _filtrar_mat(provincia=None, anio=None, nivel=None):
     tmp = df_mat
     if tmp is None or tmp.empty:
@@ -568,56 +1164,87 @@ def _filtrar_mat(provincia=None, anio=None, nivel=None):
 
     return tmp
 
-def matriculas_base_nacional(anio=None, nivel=None):
-    tmp = _filtrar_mat(None, anio, nivel).copy()
+def _prov_key(provincia):
+    return norm_search(normalize_prov_token(provincia)) if provincia else None
+
+def _filtros_mat(provincia=None, anio=None, nivel=None) -> dict:
+    """Los filtros de _filtrar_mat como dimensión=valor del índice IDX_MAT."""
+    filtros = {}
+    if provincia:
+        filtros["PROV_KEY"] = _prov_key(provincia)
+    if anio and str(anio).upper() != "ALL":
+        try:
+            filtros["ANIO_MATRICULACION"] = int(anio)
+        except Exception:
+            pass
+    if nivel:
+        filtros["NIVEL_FORMACION"] = clean_str(nivel)
+    return filtros
+
+def _agrupar_mat(por, provincia=None, anio=None, nivel=None):
+    """Suma de matriculados por `por` con los filtros: SQLite, kernel numpy o groupby de pandas."""
+    if ALMACEN is not None:
+        with tiempos.fase("filter"):
+            g = ALMACEN.sumar_mat(por, _filtros_mat(provincia, anio, nivel))
+        return g.rename(columns={"MATRICULADOS": COL_MAT_MAT})
+
+    if USAR_KERNEL and IDX_MAT is not None:
+        with tiempos.fase("filter"):
+            sel = IDX_MAT.seleccionar(**_filtros_mat(provincia, anio, nivel))
+        claves, sumas = IDX_MAT.sumar_por(por, COL_MAT_MAT, sel)
+        tiempos.contar_filas("kernel_mat", len(claves))
+        return pd.DataFrame({por: claves, COL_MAT_MAT: sumas})
+
+    tmp = _filtrar_mat(provincia, anio, nivel)
     if tmp.empty:
+        return pd.DataFrame(columns=[por, COL_MAT_MAT])
+    return tmp.groupby(por)[COL_MAT_MAT].sum().reset_index()
+
+@con_fase("aggregate")
+def matriculas_base_nacional(anio=None, nivel=None):
+    g = _agrupar_mat("CAMPO_BASE_P", None, anio, nivel)
+    if g.empty:
         return pd.DataFrame(columns=["CAMPO_BASE", "TOTAL_MATRICULADOS"])
 
     g = (
-        tmp.groupby("CAMPO_BASE_P")[COL_MAT_MAT]
-        .sum()
-        .reset_index()
-        .rename(columns={"CAMPO_BASE_P": "CAMPO_BASE", COL_MAT_MAT: "TOTAL_MATRICULADOS"})
+        g.rename(columns={"CAMPO_BASE_P": "CAMPO_BASE", COL_MAT_MAT: "TOTAL_MATRICULADOS"})
         .sort_values("TOTAL_MATRICULADOS", ascending=False)
     )
     return g
 
+@con_fase("aggregate")
 def matriculas_base_provincia(provincia, anio=None, nivel=None):
     if not provincia:
         return pd.DataFrame(columns=["CAMPO_BASE", "TOTAL_MATRICULADOS"])
 
-    tmp = _filtrar_mat(provincia, anio, nivel).copy()
-    if tmp.empty:
+    g = _agrupar_mat("CAMPO_BASE_P", provincia, anio, nivel)
+    if g.empty:
         return pd.DataFrame(columns=["CAMPO_BASE", "TOTAL_MATRICULADOS"])
 
     g = (
-        tmp.groupby("CAMPO_BASE_P")[COL_MAT_MAT]
-        .sum()
-        .reset_index()
-        .rename(columns={"CAMPO_BASE_P": "CAMPO_BASE", COL_MAT_MAT: "TOTAL_MATRICULADOS"})
+        g.rename(columns={"CAMPO_BASE_P": "CAMPO_BASE", COL_MAT_MAT: "TOTAL_MATRICULADOS"})
         .sort_values("TOTAL_MATRICULADOS", ascending=False)
     )
     return g
 
+@con_fase("aggregate")
 def matriculas_full_provincia(provincia, anio=None, nivel=None):
     if not provincia:
         return pd.DataFrame(columns=["CAMPO_DETALLADO_P", "TOTAL_MATRICULADOS"])
 
-    tmp = _filtrar_mat(provincia, anio, nivel).copy()
-    if tmp.empty:
+    g = _agrupar_mat("CAMPO_DETALLADO_P", provincia, anio, nivel)
+    if g.empty:
         return pd.DataFrame(columns=["CAMPO_DETALLADO_P", "TOTAL_MATRICULADOS"])
 
     g = (
-        tmp.groupby("CAMPO_DETALLADO_P")[COL_MAT_MAT]
-        .sum()
-        .reset_index()
-        .rename(columns={COL_MAT_MAT: "TOTAL_MATRICULADOS"})
+        g.rename(columns={COL_MAT_MAT: "TOTAL_MATRICULADOS"})
         .sort_values("TOTAL_MATRICULADOS", ascending=False)
     )
     return g
 
 # ─────────────────────── TITULADOS (F1) ───────────────────────
 
+@con_fase("filter")
 def _filtrar_tit(provincia=None, anio_titulacion=None):
     tmp = df_tit
     if tmp is None or tmp.empty:
@@ -636,6 +1263,7 @@ def _filtrar_tit(provincia=None, anio_titulacion=None):
 
     return tmp
 
+@con_fase("aggregate")
 def titulados_por_cohorte(provincia=None, anio_cohorte=None):
     if not anio_cohorte or str(anio_cohorte).upper() == "ALL":
         return pd.DataFrame(columns=["CAMPO_KEY", "TOTAL_TITULADOS"])
@@ -646,6 +1274,16 @@ def titulados_por_cohorte(provincia=None, anio_cohorte=None):
         return pd.DataFrame(columns=["CAMPO_KEY", "TOTAL_TITULADOS"])
 
     anio_tit = coh + 4
+    if ALMACEN is not None:
+        with tiempos.fase("filter"):
+            return ALMACEN.sumar_tit(_prov_key(provincia), anio_tit)
+
+    if USAR_KERNEL and IDX_TIT is not None:
+        with tiempos.fase("filter"):
+            sel = IDX_TIT.seleccionar(PROV_KEY=_prov_key(provincia), ANIO_TITULADOS=anio_tit)
+        claves, sumas = IDX_TIT.sumar_por("CAMPO_KEY", "TITULADOS_TOTALES", sel)
+        return pd.DataFrame({"CAMPO_KEY": claves, "TOTAL_TITULADOS": sumas})
+
     tmp = _filtrar_tit(provincia, anio_tit)
     if tmp.empty:
         return pd.DataFrame(columns=["CAMPO_KEY", "TOTAL_TITULADOS"])
@@ -659,6 +1297,7 @@ def titulados_por_cohorte(provincia=None, anio_cohorte=None):
 
 # ─────────────────────── COMPARACIÓN ───────────────────────
 
+@con_fase("merge")
 def compare_oferta_vs_matriculas(provincia=None, anio=None, nivel=None):
     # Oferta siempre vigente
     oferta_df = oferta_por_campo(provincia)
@@ -728,6 +1367,61 @@ def compare_oferta_vs_matriculas(provincia=None, anio=None, nivel=None):
         reverse=True
     )
 
+# ───────────────────────── CACHÉ DE RESPUESTAS ─────────────────────────
+
+def _con_cache(*params):
+    """
+    Sirve la ruta desde la caché compartida. Clave: ruta + `params` normalizados
+    (anio=ALL cuenta como sin año) + versión de datos. Solo se guardan los 200.
+    En un fallo, los requests concurrentes con la misma clave comparten un solo
+    cálculo (VUELOS); solo su espera cuenta en la fase cache de Server-Timing.
+    """
+    def deco(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            usar_cache = CACHE is not None and CACHE.version is not None
+            if not usar_cache and VUELOS is None:
+                return vista(*args, **kwargs)
+            filtros = _filtros_normalizados()
+            clave_params = {
+                k: filtros[k] for k in params
+                if k in filtros and not (k == "anio" and filtros[k] == "ALL")
+            }
+            if usar_cache:
+                clave = CACHE.clave(request.path, clave_params)
+                with tiempos.fase("cache"):
+                    guardada = CACHE.leer(clave)
+                if guardada is not None:
+                    status, mimetype, cuerpo = guardada
+                    resp = current_app.response_class(cuerpo, status=status, mimetype=mimetype)
+                    resp.headers["X-Cache"] = "HIT"
+                    return resp
+            else:
+                clave = (request.path, tuple(sorted(clave_params.items())))
+
+            def calcular():
+                resp = current_app.make_response(vista(*args, **kwargs))
+                cuerpo = resp.get_data()
+                if usar_cache and resp.status_code == 200:
+                    with tiempos.fase("cache"):
+                        CACHE.guardar(clave, resp.status_code, resp.mimetype, cuerpo)
+                return resp.status_code, resp.mimetype, cuerpo
+
+            if VUELOS is None:
+                (status, mimetype, cuerpo), compartido = calcular(), False
+            else:
+                # la versión en la clave: tras una recarga no se espera un cálculo viejo.
+                # Solo la espera de los que comparten cuenta como cache; el cálculo
+                # del líder queda en sus propias fases
+                (status, mimetype, cuerpo), compartido = VUELOS.hacer(
+                    (VERSION_DATOS, clave), calcular, medir_espera=lambda: tiempos.fase("cache")
+                )
+            resp = current_app.response_class(cuerpo, status=status, mimetype=mimetype)
+            resp.headers["X-Cache"] = "COALESCED" if compartido else "MISS"
+            return resp
+        return envoltura
+    return deco
+
 # ───────────────────────── RUTAS UI ─────────────────────────
 
 @app.route("/")
@@ -758,12 +1452,14 @@ def api_oferta_tipo():
     return jsonify(data.to_dict(orient="records"))
 
 @app.route("/api/oferta_campo")
+@_con_cache("provincia")
 def api_oferta_campo():
     prov = request.args.get("provincia")
     data = oferta_por_campo(prov)
     return jsonify(data.to_dict(orient="records"))
 
 @app.route("/api/matriculas_campo_base_nacional")
+@_con_cache("anio", "nivel")
 def api_mat_base_nac():
     anio = request.args.get("anio")
     nivel = request.args.get("nivel")
@@ -771,6 +1467,7 @@ def api_mat_base_nac():
     return jsonify(data.to_dict(orient="records"))
 
 @app.route("/api/matriculas_campo_base_provincia")
+@_con_cache("provincia", "anio", "nivel")
 def api_mat_base_prov():
     prov = request.args.get("provincia")
     if not prov:
@@ -781,6 +1478,7 @@ def api_mat_base_prov():
     return jsonify(data.to_dict(orient="records"))
 
 @app.route("/api/matriculas_campo_full_provincia")
+@_con_cache("provincia", "anio", "nivel")
 def api_mat_full_prov():
     prov = request.args.get("provincia")
     if not prov:
@@ -791,6 +1489,7 @@ def api_mat_full_prov():
     return jsonify(data.to_dict(orient="records"))
 
 @app.route("/api/compare")
+@_con_cache("provincia", "anio", "nivel")
 def api_compare():
     prov = request.args.get("provincia")
     anio = request.args.get("anio")
@@ -829,8 +1528,12 @@ def api_export_compare_csv():
 # ───────────────────────── TOTALES PARA BADGES ─────────────────────────
 
 @app.route("/api/total_oferta_provincia")
+@_con_cache("provincia")
 def api_total_oferta_provincia():
     provincia = request.args.get("provincia", None)
+    if ALMACEN is not None:
+        return jsonify({"total_oferta": ALMACEN.conteos_oferta(_prov_key(provincia))["programas"]})
+
     tmp = df_of
     if tmp is None or tmp.empty:
         return jsonify({"total_oferta": 0})
@@ -844,8 +1547,22 @@ def api_total_oferta_provincia():
     return jsonify({"total_oferta": total})
 
 @app.route("/api/total_carreras_provincia")
+@_con_cache("provincia")
 def api_total_carreras_provincia():
     provincia = request.args.get("provincia", None)
+    if ALMACEN is not None:
+        # misma cascada que abajo: nombres de programa, campo+ies, campo
+        c = ALMACEN.conteos_oferta(_prov_key(provincia))
+        if c["programas"] == 0:
+            total = 0
+        elif c["con_nombre"] > 0:
+            total = c["nombres"]
+        elif COL_IES_OF:
+            total = c["campo_ies"]
+        else:
+            total = c["campos"]
+        return jsonify({"total_carreras": total})
+
     tmp = df_of
     if tmp is None or tmp.empty:
         return jsonify({"total_carreras": 0})
@@ -879,11 +1596,22 @@ def api_total_carreras_provincia():
     return jsonify({"total_carreras": int(len(tmp))})
 
 @app.route("/api/total_matriculados_provincia")
+@_con_cache("provincia", "anio", "nivel")
 def api_total_matriculados_provincia():
     provincia = request.args.get("provincia", None)
     anio = request.args.get("anio", None)
     nivel = request.args.get("nivel", None)
 
+    if ALMACEN is not None:
+        return jsonify({"total_matriculados": ALMACEN.total_mat(_filtros_mat(provincia, anio, nivel))})
+
+    if USAR_KERNEL and IDX_MAT is not None:
+        with tiempos.fase("filter"):
+            sel = IDX_MAT.seleccionar(**_filtros_mat(provincia, anio, nivel))
+        with tiempos.fase("aggregate"):
+            total = IDX_MAT.total(COL_MAT_MAT, sel)
+        return jsonify({"total_matriculados": total})
+
     tmp = _filtrar_mat(provincia, anio, nivel)
     if tmp is None or tmp.empty:
         return jsonify({"total_matriculados": 0})
@@ -892,6 +1620,7 @@ def api_total_matriculados_provincia():
     return jsonify({"total_matriculados": total})
 
 @app.route("/api/total_titulados_provincia")
+@_con_cache("provincia", "anio")
 def api_total_titulados_provincia():
     provincia = request.args.get("provincia", None)
     anio = request.args.get("anio", None)
@@ -905,6 +1634,14 @@ def api_total_titulados_provincia():
         return jsonify({"total_titulados": 0, "anio_titulacion": None})
 
     anio_tit = coh + 4
+    if ALMACEN is not None:
+        return jsonify({"total_titulados": ALMACEN.total_tit(_prov_key(provincia), anio_tit), "anio_titulacion": anio_tit})
+
+    if USAR_KERNEL and IDX_TIT is not None:
+        with tiempos.fase("filter"):
+            sel = IDX_TIT.seleccionar(PROV_KEY=_prov_key(provincia), ANIO_TITULADOS=anio_tit)
+        return jsonify({"total_titulados": IDX_TIT.total("TITULADOS_TOTALES", sel), "anio_titulacion": anio_tit})
+
     tmp = _filtrar_tit(provincia, anio_tit)
     total = int(tmp["TITULADOS_TOTALES"].sum()) if (tmp is not None and not tmp.empty and "TITULADOS_TOTALES" in tmp.columns) else 0
     return jsonify({"total_titulados": total, "anio_titulacion": anio_tit})
@@ -1004,6 +1741,118 @@ def api_oferta_programas():
 
     return jsonify(tmp2.to_dict(orient="records"))
 
+# ───────────────────────── INSTRUMENTACIÓN / ADMIN ─────────────────────────
+
+def _filtros_normalizados() -> dict:
+    """Filtros del query string como los usan los helpers (para el log de lentos)."""
+    args = request.args
+    filtros = {}
+    if args.get("provincia"):
+        filtros["provincia"] = norm_search(normalize_prov_token(args["provincia"]))
+    if args.get("anio"):
+        anio = str(args["anio"]).strip().upper()
+        filtros["anio"] = int(anio) if anio.isdigit() else anio
+    if args.get("nivel"):
+        filtros["nivel"] = clean_str(args["nivel"])
+    for k in ("tipo", "ies"):
+        if args.get(k):
+            filtros[k] = clean_str(args[k])
+    return filtros
+
+@app.before_request
+def _medir_inicio():
+    if request.path.startswith("/api/"):
+        tiempos.iniciar_request()
+        with tiempos.fase("params"):
+            tiempos.registrar_filtros(_filtros_normalizados())
+
+@app.after_request
+def _medir_fin(response):
+    return tiempos.cerrar_request(
+        response,
+        request.url_rule.rule if request.url_rule else request.path,
+        origen="calentador" if request.headers.get(HEADER_CALENTADOR) else None,
+    )
+
+
+def _es_admin() -> bool:
+    if ADMIN_TOKEN:
+        enviado = request.headers.get("X-Admin-Token", "")
+        return hmac.compare_digest(enviado.encode(), ADMIN_TOKEN.encode())
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+@app.before_request
+def _perfilar_inicio():
+    # apagado: solo la comparación de fracción y la búsqueda del header
+    forzado = bool(ADMIN_TOKEN) and request.headers.get(HEADER_PERFIL) == ADMIN_TOKEN
+    if PERFILADOR.debe_perfilar(forzado) and request.path.startswith("/api/") and not request.path.startswith("/api/admin/"):
+        PERFILADOR.iniciar(request.url_rule.rule if request.url_rule else request.path)
+
+@app.teardown_request
+def _perfilar_fin(exc=None):
+    if PERFILADOR.activos:
+        PERFILADOR.terminar()
+
+@app.route("/api/admin/perfil")
+def api_admin_perfil():
+    """
+    Muestras del perfilador de este worker.
+    formato=collapsed (default, para flamegraph.pl / speedscope) | json; ruta=/api/compare filtra.
+    """
+    if not _es_admin():
+        return jsonify({"error": "no autorizado"}), 403
+    ruta = request.args.get("ruta") or None
+    if request.args.get("formato", "collapsed") == "json":
+        return jsonify(PERFILADOR.resumen())
+    return current_app.response_class(PERFILADOR.colapsado(ruta), mimetype="text/plain")
+
+@app.route("/api/admin/perfil/reiniciar", methods=["POST"])
+def api_admin_perfil_reiniciar():
+    if not _es_admin():
+        return jsonify({"error": "no autorizado"}), 403
+    PERFILADOR.reiniciar()
+    return jsonify({"ok": True})
+
+@app.route("/api/admin/carga")
+def api_admin_carga():
+    """Informe por fases de la última load_base() de este worker (tiempo, filas, memoria)."""
+    if not _es_admin():
+        return jsonify({"error": "no autorizado"}), 403
+    if INFORME_CARGA is None:
+        return jsonify({"error": "sin carga"}), 404
+    return jsonify(INFORME_CARGA)
+
+@app.route("/api/admin/cache")
+def api_admin_cache():
+    """Aciertos/fallos de este worker, tamaño de la caché compartida y cálculos ahorrados por coalescencia."""
+    if not _es_admin():
+        return jsonify({"error": "no autorizado"}), 403
+    vuelo_unico = VUELOS.estadisticas() if VUELOS is not None else None
+    if CACHE is None:
+        return jsonify({"activa": False, "vuelo_unico": vuelo_unico})
+    return jsonify({"activa": True, **CACHE.estadisticas(), "vuelo_unico": vuelo_unico})
+
+@app.route("/api/admin/calentador")
+def api_admin_calentador():
+    """Cobertura del último calentamiento de este worker (URLs calentadas / total, por ruta)."""
+    if not _es_admin():
+        return jsonify({"error": "no autorizado"}), 403
+    if CALENTADOR is None:
+        return jsonify({"activo": False})
+    return jsonify({"activo": True, **CALENTADOR.estadisticas()})
+
+@app.route("/api/admin/cache/limpiar", methods=["POST"])
+def api_admin_cache_limpiar():
+    if not _es_admin():
+        return jsonify({"error": "no autorizado"}), 403
+    if CACHE is not None:
+        CACHE.limpiar()
+    return jsonify({"ok": True})
+
+# Con todas las rutas registradas ya se puede calentar la carga inicial
+_RUTAS_LISTAS = True
+_calentar()
+
 # ───────────────────────── Main ─────────────────────────
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+# artefactos.py
+# Lectura/escritura de tablas intermedias del pipeline.
+#
+# Los intermedios (CES_RAW, CES_CLASIFICADA, DICCIONARIO_MAESTRO_AUTO,
+# NUEVOS_DESDE_CES, PROGRAMAS_SOLO_EN_CES) se guardan en un formato
+# columnar con tipos (Parquet si está pyarrow; si no, pickle de pandas)
+# junto a la ruta .xlsx de siempre:
+#
+#   data/OFERTA_ACAD_CES_RAW.xlsx  ->  data/OFERTA_ACAD_CES_RAW.parquet
+#
+# El Excel solo se escribe si se pide (excel=True o CEDEPRO_EXCEL=1, p. ej.
+# con --excel en el pipeline) para revisión humana. leer_tabla lee la
+# versión columnar; el .xlsx solo cuando no hay columnar o cuando se pide:
+#  - excel=True: el .xlsx, siempre;
+#  - CEDEPRO_LEER_EXCEL=1 (--leer-excel en el pipeline, p. ej. tras corregir
+#    a mano el Excel de revisión): el .xlsx solo si es más nuevo que la
+#    versión columnar. La variable vale para todas las tablas, y un .xlsx
+#    viejo (de antes del formato columnar) no debe tapar los datos actuales.
+
+import os
+import importlib.util
+
+import pandas as pd
+
+from excel_streaming import escribir_excel_streaming, valor_texto
+
+FORMATO_COLUMNAR = "parquet" if importlib.util.find_spec("pyarrow") is not None else "pickle"
+
+EXTENSIONES = {"parquet": ".parquet", "pickle": ".pkl"}
+VARIABLE_EXCEL = "CEDEPRO_EXCEL"
+VARIABLE_LEER_EXCEL = "CEDEPRO_LEER_EXCEL"
+
+
+def como_texto(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Versión texto de un DataFrame con tipos nativos, equivalente a leer el
+    Excel con dtype=str (1001.0 -> "1001", vacío -> NaN).
+    """
+    out = df.copy()
+    for c in out.columns:
+        out[c] = out[c].map(valor_texto).astype(object)
+    return out
+
+
+def excel_solicitado() -> bool:
+    return os.environ.get(VARIABLE_EXCEL, "") not in ("", "0")
+
+
+def leer_excel_solicitado() -> bool:
+    return os.environ.get(VARIABLE_LEER_EXCEL, "") not in ("", "0")
+
+
+def _candidatas(path: str) -> list:
+    base, _ = os.path.splitext(path)
+    return [base + ext for ext in EXTENSIONES.values()] + [base + ".xlsx"]
+
+
+def ruta_existente(path: str, excel: bool | None = None) -> str | None:
+    """
+    Archivo que leería leer_tabla: el columnar si existe, si no el .xlsx.
+    Con excel=True el .xlsx tiene prioridad; con CEDEPRO_LEER_EXCEL=1, solo
+    si es más nuevo que el columnar.
+    """
+    existentes = [p for p in _candidatas(path) if os.path.exists(p)]
+    if not existentes:
+        return None
+    primera = existentes[0]
+    xlsx = existentes[-1] if existentes[-1].endswith(".xlsx") else None
+    if xlsx is None or xlsx == primera or excel is False:
+        return primera
+    if excel or (leer_excel_solicitado() and os.path.getmtime(xlsx) > os.path.getmtime(primera)):
+        return xlsx
+    return primera
+
+
+def existe_tabla(path: str) -> bool:
+    return ruta_existente(path) is not None
+
+
+def leer_tabla(path: str, texto: bool = False, excel: bool | None = None) -> pd.DataFrame:
+    """
+    Lee una tabla desde su versión columnar o, si no hay (o con excel=True),
+    desde el .xlsx. texto=True equivale a pd.read_excel(dtype=str).
+    """
+    real = ruta_existente(path, excel)
+    if real is None:
+        raise FileNotFoundError(f"No se encontró {path}")
+
+    if real.endswith(".xlsx"):
+        return pd.read_excel(real, dtype=str if texto else None)
+    if real.endswith(".parquet"):
+        df = pd.read_parquet(real)
+    else:
+        df = pd.read_pickle(real)
+    return como_texto(df) if texto else df
+
+
+def guardar_tabla(df: pd.DataFrame, path: str, excel: bool | None = None) -> str:
+    """
+    Guarda la tabla en formato columnar (escritura atómica) y, si se pide,
+    también en Excel para revisión. Devuelve la ruta columnar.
+    """
+    base, _ = os.path.splitext(path)
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+
+    # El Excel va primero: si falla, la versión columnar anterior queda
+    # intacta, y la nueva queda más reciente que el Excel (CEDEPRO_LEER_EXCEL
+    # solo toma un Excel tocado después)
+    if excel if excel is not None else excel_solicitado():
+        escribir_excel_streaming(df, base + ".xlsx")
+
+    destino = base + EXTENSIONES[FORMATO_COLUMNAR]
+    tmp = destino + ".tmp"
+    try:
+        if FORMATO_COLUMNAR == "parquet":
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+    except (TypeError, ValueError):
+        # columnas object con tipos mezclados que Parquet no acepta
+        destino = base + EXTENSIONES["pickle"]
+        tmp = destino + ".tmp"
+        df.to_pickle(tmp)
+    os.replace(tmp, destino)
+
+    # No dejar la otra variante columnar desactualizada al lado
+    for otra in _candidatas(path)[:-1]:
+        if otra != destino and os.path.exists(otra):
+            os.remove(otra)
+    return destino
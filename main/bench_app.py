@@ -0,0 +1,390 @@
+# bench_app.py
+# Benchmark de app.py (load_base y todas las rutas /api/*) con datos
+# sintéticos (datos_sinteticos.py).
+#
+# Para cada escala genera OFERTA VIGENTE y F1 (si no están ya generadas) y
+# mide en un proceso nuevo, para que la carga y la memoria sean las de un
+# worker recién levantado:
+#   - load_base: import de app (carga inicial) y una recarga; las fases
+#     (lectura, detección de columnas, cada pasada de normalización) y su
+#     memoria salen del informe de carga de app (INFORME_CARGA);
+#   - cada ruta GET /api/* con el test client de Flask, con combinaciones
+#     de provincia / año / nivel como las que pide matriculas.js:
+#     p50/p95/p99, media, req/s y errores;
+#   - funciones de agregación con groupby de pandas vs kernel numpy
+#     (kernel_agregacion.py), verificando que den lo mismo;
+#   - RSS máximo del proceso.
+#
+# Con --bloques N (carga de F1 por bloques) mide además una carga completa
+# y compara la huella de cada respuesta: las dos cargas deben dar lo mismo
+# y si no, el comando termina con código 1 y lista las consultas distintas.
+#
+# Los resultados van a JSON (con el commit) para comparar entre versiones:
+#
+#   python bench_app.py --escala 1 10 --salida data/bench_app.json
+#   python bench_app.py --escala 1 10 --comparar data/bench_app.json
+
+import os
+import sys
+import json
+import hashlib
+import time
+import random
+import argparse
+import resource
+import itertools
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+from datos_sinteticos import F1_FILENAME, OFERTA_FILENAME, _anios, generar
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATOS_DIR = os.path.join(os.environ.get("TMPDIR", "/tmp"), "cedepro_bench")
+
+# Rutas que no se miden (corre el pipeline completo); /api/admin/* tampoco
+RUTAS_EXCLUIDAS = {"/api/actualizar_oferta"}
+
+# Parámetros que lee cada ruta (las que no están aquí se piden sin parámetros)
+PARAMETROS = {
+    "/api/oferta_campo": ["provincia"],
+    "/api/matriculas_campo_base_nacional": ["anio", "nivel"],
+    "/api/matriculas_campo_base_provincia": ["provincia", "anio", "nivel"],
+    "/api/matriculas_campo_full_provincia": ["provincia", "anio", "nivel"],
+    "/api/compare": ["provincia", "anio", "nivel"],
+    "/api/export_compare_csv": ["provincia", "anio", "nivel"],
+    "/api/total_oferta_provincia": ["provincia"],
+    "/api/total_carreras_provincia": ["provincia"],
+    "/api/total_matriculados_provincia": ["provincia", "anio", "nivel"],
+    "/api/total_titulados_provincia": ["provincia", "anio"],
+    "/api/oferta_programas": ["provincia", "tipo"],
+}
+
+
+def percentiles(latencias_ms: list) -> dict:
+    if not latencias_ms:
+        return {"n": 0}
+    x = np.asarray(latencias_ms)
+    return {
+        "n": len(x),
+        "p50_ms": round(float(np.percentile(x, 50)), 3),
+        "p95_ms": round(float(np.percentile(x, 95)), 3),
+        "p99_ms": round(float(np.percentile(x, 99)), 3),
+        "media_ms": round(float(x.mean()), 3),
+        "max_ms": round(float(x.max()), 3),
+    }
+
+
+def _commit() -> str | None:
+    try:
+        r = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, timeout=10,
+        )
+        return r.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ─────────────────────────────
+#  Medición (en el proceso hijo)
+# ─────────────────────────────
+
+def _consultas(app_mod, ruta: str, maximo: int, rng) -> list:
+    """Query strings para la ruta, con valores tomados de los datos cargados."""
+    nombres = PARAMETROS.get(ruta, [])
+    if not nombres:
+        return [""]
+    provs = app_mod.provincias_list()
+    valores = {
+        "provincia": [None] + provs[:4] + ["SE", "ELORO", "_GUAYAS"],
+        "anio": [None, "ALL"] + [str(a) for a in app_mod.years_list()[:4]],
+        "nivel": [None] + app_mod.levels_list()[:3],
+        "tipo": [None, "GRADO", "MAESTRÍA"],
+    }
+    combos = list(itertools.product(*(valores[n] for n in nombres)))
+    rng.shuffle(combos)
+    consultas = []
+    for combo in combos[:maximo]:
+        partes = [f"{n}={v}" for n, v in zip(nombres, combo) if v is not None]
+        consultas.append("?" + "&".join(partes) if partes else "")
+    return consultas
+
+
+def _medir_kernel(app_mod, repeticiones: int, rng) -> dict:
+    """p50 de las funciones de agregación con groupby de pandas vs kernel numpy (mismo resultado)."""
+    provincias = app_mod.provincias_list()
+    anios = [str(a) for a in app_mod.years_list()]
+    niveles = app_mod.levels_list()
+    combos = list(itertools.product([None] + provincias, ["ALL"] + anios, [None] + niveles))
+    combos = rng.sample(combos, min(len(combos), 40))
+    funciones = {
+        "matriculas_base_nacional": lambda p, a, n: app_mod.matriculas_base_nacional(a, n),
+        "matriculas_base_provincia": lambda p, a, n: app_mod.matriculas_base_provincia(p or provincias[0], a, n),
+        "matriculas_full_provincia": lambda p, a, n: app_mod.matriculas_full_provincia(p or provincias[0], a, n),
+        "titulados_por_cohorte": lambda p, a, n: app_mod.titulados_por_cohorte(p, a),
+    }
+    original = app_mod.USAR_KERNEL
+    out = {}
+    try:
+        for nombre, f in funciones.items():
+            latencias, resultados = {}, {}
+            for modo, kernel in (("pandas", False), ("kernel", True)):
+                app_mod.USAR_KERNEL = kernel
+                tiempos = []
+                for _ in range(repeticiones):
+                    for combo in combos:
+                        t0 = time.perf_counter()
+                        f(*combo)
+                        tiempos.append((time.perf_counter() - t0) * 1000)
+                latencias[modo] = percentiles(tiempos)
+                resultados[modo] = [f(*combo).to_dict("records") for combo in combos]
+            p, k = latencias["pandas"]["p50_ms"], latencias["kernel"]["p50_ms"]
+            out[nombre] = {
+                "pandas_p50_ms": p,
+                "kernel_p50_ms": k,
+                "pandas_p95_ms": latencias["pandas"]["p95_ms"],
+                "kernel_p95_ms": latencias["kernel"]["p95_ms"],
+                "aceleracion": round(p / k, 1) if k else None,
+                "iguales": resultados["pandas"] == resultados["kernel"],
+            }
+    finally:
+        app_mod.USAR_KERNEL = original
+    return out
+
+
+def medir(datos: str, repeticiones: int = 20, consultas_por_ruta: int = 12, bloques: int = 0) -> dict:
+    """Mide carga y rutas en ESTE proceso (se llama en un proceso nuevo)."""
+    os.environ["CEDEPRO_OFERTA_VIGENTE_PATH"] = os.path.join(datos, OFERTA_FILENAME)
+    os.environ["CEDEPRO_F1_PATH"] = os.path.join(datos, F1_FILENAME)
+    os.environ["CEDEPRO_F1_BLOQUE_FILAS"] = str(bloques)
+
+    import logging
+
+    t0 = time.perf_counter()
+    import app as app_mod
+    import_s = time.perf_counter() - t0
+    logging.getLogger().setLevel(logging.WARNING)
+    rss_carga_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    # Recarga: las fases salen del informe de load_base (informe_carga.py)
+    t0 = time.perf_counter()
+    app_mod.load_base()
+    recarga_s = time.perf_counter() - t0
+    informe = app_mod.INFORME_CARGA
+    fases = {f"{f['dataset']}.{f['fase']}": f["segundos"] or 0.0 for f in informe["fases"]}
+    memoria_mb = {f"{f['dataset']}.{f['fase']}": f["memoria_mb"] for f in informe["fases"] if f["memoria_mb"] is not None}
+
+    cliente = app_mod.app.test_client()
+    rng = random.Random(7)
+    rutas = sorted(
+        r.rule for r in app_mod.app.url_map.iter_rules()
+        if r.rule.startswith("/api/") and "GET" in r.methods and r.rule not in RUTAS_EXCLUIDAS
+        and not r.rule.startswith("/api/admin/")
+    )
+
+    resultados = {}
+    todas = []
+    huellas = {}  # url -> sha1 de la respuesta (para comparar completa vs bloques)
+    t_total = time.perf_counter()
+    for ruta in rutas:
+        consultas = _consultas(app_mod, ruta, consultas_por_ruta, rng)
+        latencias, errores = [], 0
+        t_ruta = time.perf_counter()
+        for _ in range(repeticiones):
+            for q in consultas:
+                t0 = time.perf_counter()
+                resp = cliente.get(ruta + q)
+                cuerpo = resp.get_data()
+                latencias.append((time.perf_counter() - t0) * 1000)
+                errores += resp.status_code >= 400
+                huellas.setdefault(ruta + q, f"{resp.status_code}:{hashlib.sha1(cuerpo).hexdigest()[:16]}")
+        segundos = time.perf_counter() - t_ruta
+        resultados[ruta] = {
+            **percentiles(latencias),
+            "consultas_distintas": len(consultas),
+            "req_s": round(len(latencias) / segundos, 1) if segundos else None,
+            "errores": errores,
+        }
+        todas.extend(latencias)
+    segundos_total = time.perf_counter() - t_total
+
+    return {
+        "filas_oferta": int(len(app_mod.df_of)),
+        "filas_mat": int(len(app_mod.df_mat)),
+        "filas_tit": int(len(app_mod.df_tit)),
+        "carga": {
+            "import_app_s": round(import_s, 3),
+            "recarga_s": round(recarga_s, 3),
+            "fases_s": {k: round(v, 3) for k, v in fases.items()},
+            "memoria_fases_mb": memoria_mb,
+            "rss_tras_carga_mb": round(rss_carga_mb, 1),
+        },
+        "rutas": resultados,
+        "total": {
+            **percentiles(todas),
+            "req_s": round(len(todas) / segundos_total, 1) if segundos_total else None,
+        },
+        "kernel": _medir_kernel(app_mod, max(1, repeticiones // 4), rng) if app_mod.IDX_MAT is not None else {},
+        "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "huellas": huellas,
+    }
+
+
+# ─────────────────────────────
+#  Orquestación
+# ─────────────────────────────
+
+def preparar_datos(escala: float, anios: list, semilla: int, provincia_aparte: bool) -> dict:
+    """Genera los Excel de la escala si no existen (se reutilizan entre corridas)."""
+    nombre = f"x{escala:g}_{anios[0]}-{anios[-1]}_{len(anios)}a_s{semilla}" + ("_prov" if provincia_aparte else "")
+    destino = os.path.join(DATOS_DIR, nombre)
+    info = {"destino": destino, "escala": escala, "anios": anios}
+    if all(os.path.exists(os.path.join(destino, f)) for f in (OFERTA_FILENAME, F1_FILENAME)):
+        print(f"Datos sintéticos existentes: {destino}")
+        return info
+    print(f"Generando datos sintéticos x{escala:g} en {destino} ...")
+    generar(destino, escala=escala, anios=anios, semilla=semilla, provincia_en_campo=not provincia_aparte)
+    return info
+
+
+def medir_en_proceso(destino: str, repeticiones: int, consultas: int, bloques: int) -> dict:
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--_medir", destino,
+        "--repeticiones", str(repeticiones), "--consultas", str(consultas), "--bloques", str(bloques),
+    ]
+    r = subprocess.run(cmd, cwd=BASE_DIR, capture_output=True, text=True)
+    if r.returncode != 0:
+        raise RuntimeError(f"Falló la medición:\n{r.stderr[-3000:]}")
+    return json.loads(r.stdout.strip().splitlines()[-1])
+
+
+def comparar_respuestas(completa: dict, bloques: dict) -> list:
+    """URLs cuya respuesta difiere entre la carga completa y la carga por bloques."""
+    return sorted(url for url in completa.keys() | bloques.keys() if completa.get(url) != bloques.get(url))
+
+
+def imprimir(resultado: dict) -> None:
+    c = resultado["carga"]
+    print(
+        f"  carga: import {c['import_app_s']} s | recarga {c['recarga_s']} s | "
+        f"RSS tras carga {c['rss_tras_carga_mb']} MB | RSS máx {resultado['rss_max_mb']} MB"
+    )
+    memoria = c.get("memoria_fases_mb", {})
+    for fase, s in c["fases_s"].items():
+        mb = f"{memoria[fase]:9.1f} MB" if fase in memoria else ""
+        print(f"     {fase:<36} {s:8.3f} s {mb}")
+    print(f"  {'ruta':<40} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'err':>4}")
+    for ruta, r in resultado["rutas"].items():
+        print(f"  {ruta:<40} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} {r['req_s']:8.1f} {r['errores']:4d}")
+    t = resultado["total"]
+    print(f"  {'TOTAL':<40} {t['p50_ms']:8.2f} {t['p95_ms']:8.2f} {t['p99_ms']:8.2f} {t['req_s']:8.1f}")
+    if resultado.get("kernel"):
+        print(f"  {'agregación (p50 ms)':<40} {'pandas':>8} {'kernel':>8} {'x':>6}")
+        for nombre, k in resultado["kernel"].items():
+            igual = "" if k["iguales"] else "  ⚠ resultados distintos"
+            print(f"  {nombre:<40} {k['pandas_p50_ms']:8.3f} {k['kernel_p50_ms']:8.3f} {k['aceleracion']:6.1f}{igual}")
+
+
+def comparar(anteriores: list, actuales: list) -> None:
+    """Diferencias de p50/p95 por ruta y de carga contra una corrida guardada."""
+    previos = {(r["escala"], r["bloques"]): r for r in anteriores}
+    for r in actuales:
+        a = previos.get((r["escala"], r["bloques"]))
+        if a is None:
+            continue
+        print(f"\n== x{r['escala']:g} (bloques={r['bloques']}): {a.get('commit')} -> {r.get('commit')} ==")
+
+        def linea(nombre, antes, ahora, unidad):
+            cambio = (ahora - antes) / antes * 100 if antes else 0.0
+            print(f"  {nombre:<40} {antes:9.2f} -> {ahora:9.2f} {unidad}  ({cambio:+6.1f}%)")
+
+        linea("recarga load_base", a["carga"]["recarga_s"], r["carga"]["recarga_s"], "s")
+        linea("RSS máx", a["rss_max_mb"], r["rss_max_mb"], "MB")
+        for fase, seg in r["carga"]["fases_s"].items():
+            antes = a["carga"]["fases_s"].get(fase)
+            if antes is not None and max(antes, seg) >= 0.05:
+                linea(f"load_base {fase}", antes, seg, "s")
+        for ruta, x in r["rutas"].items():
+            y = a["rutas"].get(ruta)
+            if y and y.get("n") and x.get("n"):
+                linea(f"{ruta} p50", y["p50_ms"], x["p50_ms"], "ms")
+                linea(f"{ruta} p95", y["p95_ms"], x["p95_ms"], "ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de load_base y rutas /api/* con datos sintéticos.")
+    parser.add_argument("--escala", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--anios", default="2015-2024", help='"2015-2024" o "2018,2020,2022"')
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--provincia-aparte", action="store_true", help="F1 con la provincia solo en PROVINCIA")
+    parser.add_argument("--repeticiones", type=int, default=20, help="veces que se repite cada consulta")
+    parser.add_argument("--consultas", type=int, default=12, help="combinaciones de filtros por ruta")
+    parser.add_argument("--bloques", type=int, default=0, help="CEDEPRO_F1_BLOQUE_FILAS (0 = carga completa)")
+    parser.add_argument("--cache", action="store_true", help="con la caché de respuestas (por defecto se mide sin caché)")
+    parser.add_argument("--salida", help="ruta JSON para guardar resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--_medir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._medir:
+        r = medir(args._medir, args.repeticiones, args.consultas, args.bloques)
+        print(json.dumps(r, ensure_ascii=False))
+        return 0
+
+    # el proceso de medición hereda el entorno; la caché se aísla en un directorio propio
+    os.environ["CEDEPRO_CACHE"] = "1" if args.cache else "0"
+    os.environ["CEDEPRO_CACHE_DIR"] = os.path.join(DATOS_DIR, "cache")
+    commit = _commit()
+    resultados = []
+    distintas_total = 0
+    for escala in args.escala:
+        datos = preparar_datos(escala, _anios(args.anios), args.semilla, args.provincia_aparte)
+        print(f"\n== app.py con datos x{escala:g} ==")
+        r = medir_en_proceso(datos["destino"], args.repeticiones, args.consultas, args.bloques)
+        huellas = r.pop("huellas")
+        equivalencia = None
+        if args.bloques:
+            # misma semilla => mismas consultas; una repetición alcanza para las huellas
+            completa = medir_en_proceso(datos["destino"], 1, args.consultas, 0)
+            distintas = comparar_respuestas(completa["huellas"], huellas)
+            distintas_total += len(distintas)
+            equivalencia = {"consultas": len(huellas), "distintas": len(distintas), "ejemplos": distintas[:10]}
+        r = {
+            "commit": commit,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "escala": escala,
+            "anios": datos["anios"],
+            "bloques": args.bloques,
+            "repeticiones": args.repeticiones,
+            "cache": args.cache,
+            **r,
+        }
+        if equivalencia is not None:
+            r["equivalencia_completa"] = equivalencia
+        imprimir(r)
+        if equivalencia is not None:
+            if equivalencia["distintas"]:
+                print(f"  ⚠ carga por bloques vs completa: {equivalencia['distintas']} de "
+                      f"{equivalencia['consultas']} respuestas distintas")
+                for url in equivalencia["ejemplos"]:
+                    print(f"     {url}")
+            else:
+                print(f"  carga por bloques vs completa: {equivalencia['consultas']} respuestas iguales")
+        resultados.append(r)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(json.load(f), resultados)
+
+    if args.salida:
+        os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+        print(f"\nResultados guardados en: {args.salida}")
+    return 1 if distintas_total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
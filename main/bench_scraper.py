@@ -0,0 +1,109 @@
+# bench_scraper.py
+# Benchmark del scraper (_scrapear_tabla_oferta) contra servidor_ces_local.py.
+#
+# Para cada número de filas levanta el servidor local, ejecuta el scraper
+# y reporta:
+#   - filas/s
+#   - llamadas WebDriver por fila (comandos enviados a chromedriver)
+#   - pico de memoria Python (tracemalloc) y RSS máximo del proceso
+#
+# Uso:
+#   python bench_scraper.py --filas 9000 50000 --salida data/bench_scraper.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tracemalloc
+from collections import Counter
+
+import update_oferta_selenium as scraper
+from servidor_ces_local import iniciar_servidor
+
+
+def _build_driver_contado(contador: Counter):
+    """Envuelve _build_driver para contar cada comando WebDriver enviado."""
+    build_original = scraper._build_driver
+
+    def build(headless: bool = True, timeout: int = 60):
+        driver = build_original(headless=headless, timeout=timeout)
+        execute_original = driver.execute
+
+        def execute(driver_command, params=None):
+            contador[driver_command] += 1
+            return execute_original(driver_command, params)
+
+        # WebElement también pasa por driver.execute (via _parent)
+        driver.execute = execute
+        return driver
+
+    return build
+
+
+def medir(n_filas: int, headless: bool = True, timeout: int = 10, latencia_ms: int = 0) -> dict:
+    server, url = iniciar_servidor(n_filas, latencia_ms=latencia_ms)
+    contador = Counter()
+    build_original = scraper._build_driver
+    scraper._build_driver = _build_driver_contado(contador)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        df, log = scraper._scrapear_tabla_oferta(headless=headless, timeout=timeout, url=url)
+    finally:
+        segundos = time.perf_counter() - t0
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        scraper._build_driver = build_original
+        server.shutdown()
+
+    filas = len(df)
+    llamadas = sum(contador.values())
+    return {
+        "filas_servidas": n_filas,
+        "filas_capturadas": filas,
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(filas / segundos, 2) if segundos else None,
+        "llamadas_webdriver": llamadas,
+        "llamadas_por_fila": round(llamadas / filas, 3) if filas else None,
+        "llamadas_por_comando": dict(contador.most_common()),
+        "pico_memoria_python_mb": round(pico / 1024 ** 2, 2),
+        "rss_max_proceso_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "ultimas_lineas_log": log[-3:],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del scraper CES contra el servidor local.")
+    parser.add_argument("--filas", type=int, nargs="+", default=[9000, 50000])
+    parser.add_argument("--timeout", type=int, default=10, help="timeout WebDriverWait (s)")
+    parser.add_argument("--latencia-ms", type=int, default=0)
+    parser.add_argument("--con-ventana", action="store_true", help="Chrome no headless")
+    parser.add_argument("--salida", help="ruta JSON para guardar resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    for n in args.filas:
+        print(f"\n== Scraper contra servidor local: {n} filas ==")
+        r = medir(n, headless=not args.con_ventana, timeout=args.timeout, latencia_ms=args.latencia_ms)
+        resultados.append(r)
+        print(
+            f"  capturadas={r['filas_capturadas']} | {r['segundos']} s | "
+            f"{r['filas_por_segundo']} filas/s | {r['llamadas_por_fila']} llamadas WebDriver/fila | "
+            f"pico Python {r['pico_memoria_python_mb']} MB | RSS máx {r['rss_max_proceso_mb']} MB"
+        )
+        if r["filas_capturadas"] != n:
+            print(f"  ⚠ Se esperaban {n} filas y se capturaron {r['filas_capturadas']}")
+
+    if args.salida:
+        os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+        print(f"\nResultados guardados en: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
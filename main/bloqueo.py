@@ -0,0 +1,66 @@
+# bloqueo.py
+# Bloqueo exclusivo entre procesos sobre un archivo.
+#
+# Lo usan el manifiesto de snapshots y el registro de claves (pasos del
+# pipeline en paralelo) y el archivo SQLite de la API (un solo worker de
+# gunicorn lo arma).
+#
+# El bloqueo es del sistema operativo (flock; en Windows msvcrt.locking):
+# si el proceso que lo tiene muere se libera solo, así que nunca hace falta
+# "robarlo". Si la espera se agota se levanta TimeoutError y el que tiene
+# el bloqueo sigue siendo el único.
+#
+# El archivo .lock no se borra al salir: borrarlo dejaría a otro proceso
+# bloqueando un archivo que ya no es el que ven los demás.
+
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class Bloqueo:
+    """with Bloqueo(path, espera=30): ... — exclusivo entre procesos."""
+
+    def __init__(self, path: str, espera: float = 30.0):
+        self.path = path
+        self.espera = espera
+        self._fd = None
+
+    def _intentar(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        limite = time.monotonic() + self.espera
+        while not self._intentar():
+            if time.monotonic() > limite:
+                os.close(self._fd)
+                self._fd = None
+                raise TimeoutError(f"No se obtuvo el bloqueo {self.path} en {self.espera:.0f} s")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        return False
@@ -0,0 +1,88 @@
+# cache_clasificacion.py
+# Caché persistente de decisiones PROGRAMA -> CAMPO DETALLADO.
+#
+# Cada mes el CES publica casi los mismos nombres de programa; la decisión
+# que tomó clasificar_oferta_nueva.py (coincidencia exacta, fuzzy o forzada)
+# se guarda por PROG_NORM junto con la versión del diccionario usado:
+#
+#   {
+#     "version_diccionario": "maestro:<huella>" | "auto:<huella F1_ACT>",
+#     "entradas": {
+#        prog_norm: {"campo": ..., "clave": ..., "score": ..., "corte": ...}
+#     },
+#     "diccionario_auto": {...} | null   # solo si se usa el AUTO desde F1_ACT
+#   }
+#
+# "corte" es 0.9 ... 0.5 (fuzzy), "exacto", "forzado" o "sin_texto".
+# La versión es la del diccionario que de verdad se usa: el maestro si tiene
+# datos; si no existe o está vacío, F1_ACT (de donde sale el AUTO). Si ese
+# archivo cambia, la caché se descarta completa. La huella ignora docProps/
+# del .xlsx (snapshots.huella_archivo): reescribir F1_ACT con el mismo
+# contenido no invalida nada.
+
+import os
+import json
+
+import pandas as pd
+
+from snapshots import huella_archivo
+
+DATA_DIR = "data"
+CACHE_PATH = os.path.join(DATA_DIR, "CACHE_CLASIFICACION.json")
+
+
+def hash_archivo(path: str) -> str:
+    return huella_archivo(path)[:20]
+
+
+def maestro_con_datos(path_maestro: str) -> bool:
+    """Misma regla que obtener_diccionario_maestro: el maestro se usa si tiene filas."""
+    if not os.path.exists(path_maestro):
+        return False
+    try:
+        return not pd.read_excel(path_maestro, dtype=str, nrows=1).empty
+    except Exception:
+        return True  # ilegible: que falle (y se informe) al cargarlo
+
+
+def version_diccionario(path_maestro: str, path_f1: str) -> str:
+    """
+    Versión del diccionario con el que se clasifica:
+      - DICCIONARIO_MAESTRO.xlsx si existe y tiene datos
+      - si no, F1_ACT (de donde se construye el AUTO)
+    """
+    if maestro_con_datos(path_maestro):
+        return "maestro:" + hash_archivo(path_maestro)
+    if os.path.exists(path_f1):
+        return "auto:" + hash_archivo(path_f1)
+    return "sin_diccionario"
+
+
+def cargar_cache(version: str, path: str = CACHE_PATH) -> dict:
+    """Devuelve la caché de esa versión (vacía si no existe o si cambió la versión)."""
+    vacia = {"version_diccionario": version, "entradas": {}, "diccionario_auto": None}
+    if not os.path.exists(path):
+        return vacia
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"   Caché de clasificación ilegible ({e}); se descarta.")
+        return vacia
+
+    if cache.get("version_diccionario") != version:
+        print("   El diccionario cambió desde la última corrida; se invalida la caché de clasificación.")
+        return vacia
+
+    cache.setdefault("entradas", {})
+    cache.setdefault("diccionario_auto", None)
+    return cache
+
+
+def guardar_cache(cache: dict, path: str = CACHE_PATH) -> None:
+    """Escritura atómica (tmp + replace) para no dejar la caché a medias."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp, path)
@@ -0,0 +1,175 @@
+# cache_respuestas.py
+# Caché de respuestas de la API en disco local, compartida por los workers.
+#
+# Una caché en memoria se calienta por separado en cada worker de gunicorn:
+# con N workers el costo del primer request se paga N veces tras cada carga.
+# Aquí cada respuesta va a un archivo:
+#
+#   <CEDEPRO_CACHE_DIR>/<versión de datos>/<ab>/<clave>.resp
+#
+# - clave = sha256(ruta + parámetros normalizados); la versión de datos la
+#   fija app.py en cada load_base (huella de los Excel y del código), así
+#   una recarga no sirve respuestas viejas;
+# - escritura atómica (temporal + os.replace): un lector ve el archivo
+#   completo o no lo ve, y dos workers que escriben la misma clave escriben
+#   lo mismo;
+# - LRU por mtime: cada acierto toca el archivo; cuando lo escrito desde el
+#   último barrido pasa un 10% del límite se borran los más viejos hasta
+#   quedar en el 80% (CEDEPRO_CACHE_MB, 64 MB por defecto). Barridos en
+#   paralelo solo borran de más, nunca dejan archivos a medias.
+#
+# Formato: una línea JSON de encabezado (status, mimetype) y el cuerpo.
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+PROPORCION_BARRIDO = 0.10
+PROPORCION_OBJETIVO = 0.80
+EXTENSION = ".resp"
+
+
+class CacheDisco:
+    def __init__(self, directorio: str, limite_mb: float = 64):
+        self.directorio = directorio
+        self.limite = int(limite_mb * 1024 * 1024)
+        self.version = None
+        self._escrito_desde_barrido = 0
+        self._lock = threading.Lock()
+        self.stats = {"aciertos": 0, "fallos": 0, "escrituras": 0, "desalojos": 0, "errores": 0}
+
+    # ── versión de datos ──
+
+    def activar_version(self, version: str) -> None:
+        """Usa `version` y borra los directorios de otras versiones (ya no se pueden servir)."""
+        self.version = version[:16]
+        os.makedirs(os.path.join(self.directorio, self.version), exist_ok=True)
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if nombre != self.version and os.path.isdir(ruta):
+                shutil.rmtree(ruta, ignore_errors=True)
+
+    def clave(self, ruta: str, params: dict) -> str:
+        texto = ruta + "?" + json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def _path(self, clave: str) -> str:
+        return os.path.join(self.directorio, self.version, clave[:2], clave + EXTENSION)
+
+    def _contar(self, stat: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += n
+
+    # ── lectura / escritura ──
+
+    def leer(self, clave: str):
+        """(status, mimetype, cuerpo) o None."""
+        if self.version is None:
+            return None
+        path = self._path(clave)
+        try:
+            with open(path, "rb") as f:
+                encabezado = json.loads(f.readline())
+                cuerpo = f.read()
+        except FileNotFoundError:
+            self._contar("fallos")
+            return None
+        except (OSError, ValueError):
+            self._contar("errores")
+            return None
+        try:
+            os.utime(path)  # LRU
+        except OSError:
+            pass
+        self._contar("aciertos")
+        return encabezado["status"], encabezado["mimetype"], cuerpo
+
+    def guardar(self, clave: str, status: int, mimetype: str, cuerpo: bytes) -> None:
+        if self.version is None:
+            return
+        path = self._path(clave)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(json.dumps({"status": status, "mimetype": mimetype}).encode("utf-8") + b"\n")
+                f.write(cuerpo)
+            os.replace(tmp, path)
+        except OSError:
+            self._contar("errores")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._contar("escrituras")
+        with self._lock:
+            self._escrito_desde_barrido += max(len(cuerpo), 4096)
+            barrer = self._escrito_desde_barrido >= self.limite * PROPORCION_BARRIDO
+            if barrer:
+                self._escrito_desde_barrido = 0
+        if barrer:
+            self.barrer()
+
+    # ── tamaño ──
+
+    def _entradas(self) -> list:
+        entradas = []
+        for raiz, _, archivos in os.walk(self.directorio):
+            for nombre in archivos:
+                path = os.path.join(raiz, nombre)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                # bloques asignados: en disco una respuesta de 300 B ocupa 4 KB
+                tamano = st.st_blocks * 512 if hasattr(st, "st_blocks") else st.st_size
+                entradas.append((st.st_mtime, tamano, path))
+        return entradas
+
+    def barrer(self) -> int:
+        """Desaloja por LRU hasta el 80% del límite. Devuelve archivos borrados."""
+        entradas = self._entradas()
+        total = sum(e[1] for e in entradas)
+        if total <= self.limite:
+            return 0
+        objetivo = self.limite * PROPORCION_OBJETIVO
+        borrados = 0
+        ahora = time.time()
+        for mtime, tamano, path in sorted(entradas):
+            if total <= objetivo:
+                break
+            # un .tmp reciente es la escritura en curso de otro worker
+            if path.endswith(".tmp") and ahora - mtime < 60:
+                continue
+            try:
+                os.remove(path)
+                borrados += 1
+            except FileNotFoundError:
+                pass
+            total -= tamano
+        self._contar("desalojos", borrados)
+        return borrados
+
+    def limpiar(self) -> None:
+        if self.version is not None:
+            shutil.rmtree(os.path.join(self.directorio, self.version), ignore_errors=True)
+            os.makedirs(os.path.join(self.directorio, self.version), exist_ok=True)
+
+    def estadisticas(self) -> dict:
+        entradas = self._entradas()
+        with self._lock:
+            stats = dict(self.stats)
+        consultas = stats["aciertos"] + stats["fallos"]
+        return {
+            **stats,
+            "tasa_aciertos": round(stats["aciertos"] / consultas, 4) if consultas else None,
+            "version": self.version,
+            "archivos": len(entradas),
+            "mb": round(sum(e[1] for e in entradas) / 1024 / 1024, 3),
+            "limite_mb": round(self.limite / 1024 / 1024, 3),
+            "pid": os.getpid(),
+        }
@@ -0,0 +1,225 @@
+# calentador.py
+# Precalienta la caché de respuestas después de cada load_base().
+#
+# Tras una carga la caché en disco (cache_respuestas.py) arranca vacía para
+# la versión nueva y el primer usuario de cada provincia/año/nivel paga el
+# cálculo completo. El Calentador recorre en segundo plano una lista de URLs
+# (app.py la arma con provincias_list × years_list × levels_list, más las
+# variantes nacional y ALL) y las pide con app.test_client(): cada respuesta
+# pasa por _con_cache, así queda en la caché compartida y se coalesce con un
+# usuario que pida lo mismo al mismo tiempo.
+#
+# - baja prioridad: pocos hilos, nice 19 por hilo (Linux) y una pausa entre
+#   requests para soltar el GIL a los hilos que atienden usuarios;
+# - presupuesto: se detiene al pasar CEDEPRO_CALENTADOR_SEGUNDOS, cuando el
+#   RSS total del proceso llega a CEDEPRO_CALENTADOR_RSS_MB (tope absoluto,
+#   no crecimiento: los datos cargados ya cuentan; si al empezar ya está
+#   arriba no calienta) o al escribir más del 80% del límite de la caché
+#   (seguir solo desalojaría lo recién calentado);
+# - un solo worker por versión: un archivo marca en el directorio de la
+#   versión; los demás workers ven la marca y no repiten el trabajo;
+# - fork: con gunicorn --preload la carga corre en el master; antes de cada
+#   fork el hilo se detiene y el primer worker hijo retoma lo pendiente.
+#
+# estadisticas() reporta la cobertura: URLs calentadas (200) / total, por ruta.
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MARCA = ".calentador"
+HEADER = "X-Cedepro-Calentador"
+PROPORCION_CACHE = 0.80
+
+
+def _rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _baja_prioridad() -> None:
+    # en Linux cada hilo es una tarea con su propio nice
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class Calentador:
+    def __init__(self, app, hilos: int = 1, segundos: float = 300, rss_mb: float = 384,
+                 pausa_ms: float = 10, limite_cache_bytes: int | None = None):
+        self.app = app
+        self.hilos = max(1, hilos)
+        self.segundos = segundos
+        self.limite_rss = int(rss_mb * 1024 * 1024)
+        self.pausa = pausa_ms / 1000
+        self.limite_cache = None if limite_cache_bytes is None else int(limite_cache_bytes * PROPORCION_CACHE)
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._pendiente = None   # (version, directorio, urls) interrumpido por un fork
+        self._estado = {"estado": "inactivo"}
+
+    # ── ciclo de vida ──
+
+    def iniciar(self, version: str, directorio: str, urls: list) -> None:
+        """Calienta `urls` para `version` en un hilo aparte (detiene un calentamiento anterior)."""
+        self.detener()
+        self._detener = threading.Event()
+        self._pendiente = (version, directorio, list(urls))
+        self._estado = {"estado": "calentando", "version": version, "total": len(urls)}
+        self._hilo = threading.Thread(
+            target=self._correr, args=self._pendiente + (self._detener,), name="calentador", daemon=True
+        )
+        self._hilo.start()
+
+    def detener(self, espera: float = 10.0) -> None:
+        self._detener.set()
+        hilo = self._hilo
+        if hilo is not None and hilo.is_alive() and hilo is not threading.current_thread():
+            hilo.join(espera)
+
+    def cancelar(self) -> None:
+        """Detiene y descarta lo pendiente (load_base, antes de leer datos nuevos)."""
+        self.detener()
+        self._pendiente = None
+
+    def antes_de_fork(self) -> None:
+        self.detener()
+
+    def en_hijo(self) -> None:
+        """Tras el fork: retoma lo que el master no terminó (los ya calentados son HIT)."""
+        self._lock = threading.Lock()
+        self._hilo = None
+        if self._pendiente is not None and self._estado.get("estado") == "interrumpido":
+            self.iniciar(*self._pendiente)
+
+    # ── marca por versión ──
+
+    def _tomar_marca(self, directorio: str) -> str | None:
+        path = os.path.join(directorio, MARCA)
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            if os.path.exists(path) and time.time() - os.path.getmtime(path) > self.segundos + 60:
+                os.remove(path)  # marca huérfana de un worker que murió
+            with open(path, "x") as f:
+                f.write(str(os.getpid()))
+            return path
+        except FileExistsError:
+            return None
+        except OSError:
+            return ""  # sin directorio usable: calienta igual, sin coordinar
+
+    # ── trabajo ──
+
+    def _correr(self, version: str, directorio: str, urls: list, detener: threading.Event) -> None:
+        marca = self._tomar_marca(directorio)
+        if marca is None:
+            self._estado = {"estado": "otro_worker", "version": version, "total": len(urls)}
+            return
+        try:
+            self._calentar(version, urls, detener)
+        finally:
+            if marca:
+                try:
+                    os.remove(marca)
+                except OSError:
+                    pass
+
+    def _calentar(self, version: str, urls: list, detener: threading.Event) -> None:
+        t0 = time.perf_counter()
+        estado = {
+            "estado": "calentando",
+            "version": version,
+            "pid": os.getpid(),
+            "total": len(urls),
+            "hechas": 0,
+            "calentadas": 0,
+            "HIT": 0, "MISS": 0, "COALESCED": 0,
+            "errores": 0,
+            "bytes": 0,
+            "por_ruta": {},
+            "motivo_fin": None,
+        }
+        for url in urls:
+            r = estado["por_ruta"].setdefault(url.split("?", 1)[0], {"total": 0, "calentadas": 0})
+            r["total"] += 1
+        self._estado = estado
+        iterador = iter(urls)
+
+        def presupuesto_agotado() -> str | None:
+            if detener.is_set():
+                return "interrumpido"
+            if time.perf_counter() - t0 > self.segundos:
+                return "tiempo"
+            rss = _rss_bytes()
+            if rss is not None and rss >= self.limite_rss:
+                return "memoria"
+            if self.limite_cache is not None and estado["bytes"] > self.limite_cache:
+                return "cache_llena"
+            return None
+
+        def trabajar():
+            _baja_prioridad()
+            cliente = self.app.test_client()
+            while True:
+                motivo = presupuesto_agotado()
+                if motivo:
+                    return motivo
+                with self._lock:
+                    url = next(iterador, None)
+                if url is None:
+                    return "completo"
+                try:
+                    resp = cliente.get(url, headers={HEADER: "1"})
+                    ok = resp.status_code == 200
+                    cache = resp.headers.get("X-Cache")
+                    tamano = max(len(resp.get_data()), 4096)  # como cuenta la caché
+                except Exception:
+                    ok, cache, tamano = False, None, 0
+                with self._lock:
+                    estado["hechas"] += 1
+                    if ok:
+                        estado["calentadas"] += 1
+                        estado["por_ruta"][url.split("?", 1)[0]]["calentadas"] += 1
+                    else:
+                        estado["errores"] += 1
+                    if cache in ("HIT", "MISS", "COALESCED"):
+                        estado[cache] += 1
+                    if cache != "HIT":
+                        estado["bytes"] += tamano
+                if self.pausa:
+                    time.sleep(self.pausa)
+
+        with ThreadPoolExecutor(self.hilos, thread_name_prefix="calentador") as pool:
+            motivos = [f.result() for f in [pool.submit(trabajar) for _ in range(self.hilos)]]
+        motivo = next((m for m in motivos if m != "completo"), "completo")
+        with self._lock:
+            estado["motivo_fin"] = motivo
+            estado["estado"] = "interrumpido" if motivo == "interrumpido" else "terminado"
+            estado["segundos"] = round(time.perf_counter() - t0, 3)
+            if motivo != "interrumpido":
+                self._pendiente = None
+
+    # ── reporte ──
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            e = dict(self._estado)
+            e["por_ruta"] = {k: dict(v) for k, v in e.get("por_ruta", {}).items()}
+        if "calentadas" in e:
+            e["cobertura"] = round(e["calentadas"] / e["total"], 4) if e["total"] else 1.0
+            for r in e["por_ruta"].values():
+                r["cobertura"] = round(r["calentadas"] / r["total"], 4) if r["total"] else 1.0
+            e["mb"] = round(e.pop("bytes") / 1024 / 1024, 3)
+        e["presupuesto"] = {
+            "hilos": self.hilos,
+            "segundos": self.segundos,
+            "rss_mb": round(self.limite_rss / 1024 / 1024, 1),
+            "mb_cache": None if self.limite_cache is None else round(self.limite_cache / 1024 / 1024, 1),
+        }
+        return e
@@ -7,14 +7,37 @@
 #  - Copia PROVINCIA (y CANTON si existe) desde F1_ACT,
 #    emparejando por (Código IES + PROGRAMA / CARRERA).
 #
+# Si hay delta CES (delta_ces.py), solo se clasifican las filas agregadas
+# o modificadas; el resto se reutiliza de la clasificación previa, siempre
+# que el diccionario y F1_ACT (PROVINCIA/CANTON) sean los mismos con los que
+# se clasificó (contexto guardado junto a la foto de huellas). Si cambiaron,
+# se reclasifica todo. Usar --completo para forzarlo.
+#
+# Las decisiones programa -> CAMPO DETALLADO se guardan en una caché
+# persistente (cache_clasificacion.py) que se invalida si cambia el diccionario.
+#
 # REGLA: NUNCA deja "SIN CLASIFICAR", ni vacíos, ni "OTROS PROGRAMAS"
 # en CAMPO DETALLADO. En el peor caso, asigna el CAMPO DETALLADO del
 # programa más parecido (nearest neighbour por similitud de texto).
+# El fuzzy matching usa un índice de n-gramas (fuzzy_indexado.py) que da el
+# mismo resultado que la cascada de difflib.get_close_matches.
 
 import pandas as pd
 import unicodedata
-import difflib
 import os
+import sys
+
+from fuzzy_indexado import construir_indice_ngramas, mejores_coincidencias, nivel_corte
+from cache_clasificacion import cargar_cache, guardar_cache, hash_archivo, version_diccionario
+from artefactos import existe_tabla, guardar_tabla, leer_tabla
+from registro_claves import ids_clave
+from delta_ces import (
+    calcular_huellas,
+    cargar_contexto_huellas,
+    cargar_delta,
+    guardar_huellas,
+    resumen_delta,
+)
 
 DATA_DIR = "data"
 
@@ -70,15 +93,6 @@ def encontrar_columna(df: pd.DataFrame, keywords) -> str:
     raise Exception(f"No se encontró ninguna columna que coincida con: {keywords}")
 
 
-def construir_clave_ies_prog(cod_ies: pd.Series, programa: pd.Series) -> pd.Series:
-    """
-    Construye una clave de emparejamiento por IES + PROGRAMA:
-      CLAVE_IES_PROG = normalizar_texto(cod_ies) + '||' + normalizar_texto(programa)
-    """
-    return cod_ies.fillna("").astype(str).map(normalizar_texto) + "||" + \
-           programa.fillna("").astype(str).map(normalizar_texto)
-
-
 # ─────────────────────────────
 #  Construir o cargar diccionario maestro (solo campo)
 # ─────────────────────────────
@@ -116,17 +130,25 @@ def cargar_diccionario_desde_excel(path: str) -> dict:
     return dicc
 
 
-def construir_diccionario_maestro_auto() -> dict:
-    """
-    Construye un diccionario maestro a partir de F1_ACT:
-      PROG_NORM -> CAMPO DETALLADO más frecuente.
-    """
+def cargar_f1_act() -> pd.DataFrame:
+    """F1_ACT como texto (dtype=str), con nombres de columna limpios."""
     print("Cargando base clasificada (F_1_MATRICULADOS_ACT)...")
     if not os.path.exists(F1_PATH):
         raise FileNotFoundError(f"No se encontró {F1_PATH}")
 
-    df_old = pd.read_excel(F1_PATH, dtype=str)
-    df_old.columns = df_old.columns.astype(str).str.strip()
+    df_f1 = pd.read_excel(F1_PATH, dtype=str)
+    df_f1.columns = df_f1.columns.astype(str).str.strip()
+    return df_f1
+
+
+def construir_diccionario_maestro_auto(df_old: pd.DataFrame | None = None) -> dict:
+    """
+    Construye un diccionario maestro a partir de F1_ACT:
+      PROG_NORM -> CAMPO DETALLADO más frecuente.
+    df_old: F1_ACT ya cargada como texto (si es None se lee del Excel).
+    """
+    if df_old is None:
+        df_old = cargar_f1_act()
 
     col_prog_old = encontrar_columna(
         df_old,
@@ -165,18 +187,18 @@ def construir_diccionario_maestro_auto() -> dict:
             col_campo_old: "CAMPO_DETALLADO"
         }
     )
-    os.makedirs(DATA_DIR, exist_ok=True)
-    dicc_df.to_excel(OUT_DICC_AUTO, index=False)
-    print(f"DICCIONARIO_MAESTRO_AUTO guardado en: {OUT_DICC_AUTO}")
+    ruta = guardar_tabla(dicc_df, OUT_DICC_AUTO)
+    print(f"DICCIONARIO_MAESTRO_AUTO guardado en: {ruta}")
 
     return dicc
 
 
-def obtener_diccionario_maestro() -> dict:
+def obtener_diccionario_maestro(cache: dict | None = None, df_f1: pd.DataFrame | None = None) -> dict:
     """
     Prioridad:
       1) Si existe DICCIONARIO_MAESTRO.xlsx y tiene datos, usarlo.
-      2) Si no, construir DICCIONARIO_MAESTRO_AUTO desde F1_ACT.
+      2) Si no, construir DICCIONARIO_MAESTRO_AUTO desde F1_ACT
+         (o reutilizarlo desde la caché si F1_ACT no cambió).
     """
     if os.path.exists(OUT_DICC_MAESTRO):
         dicc = cargar_diccionario_desde_excel(OUT_DICC_MAESTRO)
@@ -186,8 +208,14 @@ def obtener_diccionario_maestro() -> dict:
         else:
             print("DICCIONARIO_MAESTRO.xlsx está vacío. Se intentará construir AUTO.")
 
-    dicc_auto = construir_diccionario_maestro_auto()
+    if cache is not None and cache.get("diccionario_auto"):
+        print("Usando DICCIONARIO_MAESTRO_AUTO desde caché (F1_ACT sin cambios).")
+        return cache["diccionario_auto"]
+
+    dicc_auto = construir_diccionario_maestro_auto(df_f1)
     if dicc_auto:
+        if cache is not None:
+            cache["diccionario_auto"] = dicc_auto
         return dicc_auto
 
     raise RuntimeError(
@@ -200,66 +228,87 @@ def obtener_diccionario_maestro() -> dict:
 #  Clasificar la nueva oferta CES RAW
 # ─────────────────────────────
 
-def clasificar_nueva_oferta():
-    print("Cargando base CES RAW...")
-    if not os.path.exists(RAW_PATH):
-        raise FileNotFoundError(f"No se encontró {RAW_PATH}")
-
-    df_new = pd.read_excel(RAW_PATH, dtype=str)
-    df_new.columns = df_new.columns.astype(str).str.strip()
-
-    # Columnas básicas en CES_RAW
-    col_prog_new = encontrar_columna(
-        df_new,
-        ["PROGRAMA / CARRERA", "PROGRAMA/CARRERA", "PROGRAMA", "CARRERA"]
-    )
-    col_ies_new = encontrar_columna(
-        df_new,
-        ["Código IES", "CÓDIGO IES", "Codigo IES", "CODIGO IES"]
-    )
-
-    print(f"   Columna programa base nueva (CES_RAW): {col_prog_new}")
-    print(f"   Columna Código IES base nueva (CES_RAW): {col_ies_new}")
-
-    dicc = obtener_diccionario_maestro()
+def clasificar_filas(
+    df_new: pd.DataFrame,
+    col_prog_new: str,
+    col_ies_new: str,
+    df_f1: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Asigna CAMPO DETALLADO y copia PROVINCIA/CANTON desde F1_ACT
+    a las filas de df_new (todas o solo las nuevas/modificadas del delta).
+    Los programas ya resueltos en corridas anteriores (misma versión del
+    diccionario) salen de la caché sin fuzzy matching.
+    F1_ACT se lee una sola vez (o llega ya cargada como texto en df_f1).
+    """
+    if df_f1 is None:
+        df_f1 = cargar_f1_act()
+    else:
+        df_f1 = df_f1.rename(columns=lambda c: str(c).strip())
 
     # Normalizar programa en CES (para CAMPO DETALLADO)
     df_new["PROG_NORM"] = df_new[col_prog_new].apply(normalizar_texto)
 
+    # 0) Decisiones ya tomadas en corridas anteriores
+    cache = cargar_cache(version_diccionario(OUT_DICC_MAESTRO, F1_PATH))
+    decisiones = cache["entradas"]
+    mask_cache = df_new["PROG_NORM"].isin(decisiones.keys())
+    df_new["CAMPO DETALLADO"] = df_new["PROG_NORM"].map(
+        {p: d["campo"] for p, d in decisiones.items()}
+    ).astype(object)
+    print(f"   Programas resueltos desde caché: {int(mask_cache.sum())} de {len(df_new)}")
+
+    # Solo se necesita el diccionario si hay programas sin decisión previa
+    dicc = obtener_diccionario_maestro(cache, df_f1) if (~mask_cache).any() else {}
+
     # Asignación directa mediante diccionario
-    df_new["CAMPO DETALLADO"] = df_new["PROG_NORM"].map(dicc)
+    df_new.loc[~mask_cache, "CAMPO DETALLADO"] = df_new.loc[~mask_cache, "PROG_NORM"].map(dicc)
 
-    sin_clasif = df_new["CAMPO DETALLADO"].isna().sum()
+    sin_clasif = (df_new["CAMPO DETALLADO"].isna() & ~mask_cache).sum()
     print(f"   Programas sin coincidencia exacta: {sin_clasif}")
 
     base_keys = list(dicc.keys())
 
+    # Índice de n-gramas (se construye una vez) y mejor candidato por programa:
+    # una sola consulta por programa distinto reemplaza la cascada de
+    # difflib.get_close_matches (ver fuzzy_indexado.py)
+    indice = None
+    mejor_por_prog = {}
+
+    def resolver_mejores(progs) -> None:
+        nonlocal indice
+        pendientes = sorted({p for p in progs if p and p not in mejor_por_prog})
+        if not pendientes:
+            return
+        if indice is None:
+            indice = construir_indice_ngramas(base_keys)
+        for p, res in zip(pendientes, mejores_coincidencias(indice, pendientes)):
+            mejor_por_prog[p] = res
+
     # 1) Fuzzy matching con cortes "rigurosos"
     if sin_clasif > 0:
         print("Aplicando fuzzy matching (cortes 0.9 → 0.5)...")
 
+        mask_nan = df_new["CAMPO DETALLADO"].isna() & ~mask_cache
+        resolver_mejores(df_new.loc[mask_nan, "PROG_NORM"])
+
         def asignar_por_fuzzy(prog_norm: str) -> str | None:
             if not prog_norm:
                 return None
-            for cutoff in [0.9, 0.8, 0.7, 0.6, 0.5]:
-                matches = difflib.get_close_matches(
-                    prog_norm, base_keys, n=1, cutoff=cutoff
-                )
-                if matches:
-                    elegido = matches[0]
-                    return dicc[elegido]
+            elegido, score = mejor_por_prog.get(prog_norm, (None, 0.0))
+            if elegido is not None and nivel_corte(score) is not None:
+                return dicc[elegido]
             return None
 
-        mask_nan = df_new["CAMPO DETALLADO"].isna()
         df_new["CAMPO DETALLADO"] = df_new["CAMPO DETALLADO"].astype(object)
         df_new.loc[mask_nan, "CAMPO DETALLADO"] = df_new.loc[
             mask_nan, "PROG_NORM"
         ].apply(asignar_por_fuzzy)
 
     # 2) Fuzzy "forzado": si aún queda algo vacío, se asigna al más parecido SIN cutoff
-    mask_restante = df_new["CAMPO DETALLADO"].isna() | (
+    mask_restante = (df_new["CAMPO DETALLADO"].isna() | (
         df_new["CAMPO DETALLADO"].astype(str).str.strip() == ""
-    )
+    )) & ~mask_cache
     restantes = mask_restante.sum()
     print(f"   Programas aún sin campo después del fuzzy normal: {restantes}")
 
@@ -273,15 +322,14 @@ def clasificar_nueva_oferta():
         else:
             campo_mas_frecuente = "CAMPO NO ESPECIFICADO"
 
+        resolver_mejores(df_new.loc[mask_restante, "PROG_NORM"])
+
         def asignar_por_fuzzy_forzado(prog_norm: str) -> str:
             if not prog_norm:
                 # si ni siquiera hay texto, usa el campo más frecuente
                 return campo_mas_frecuente
-            matches = difflib.get_close_matches(
-                prog_norm, base_keys, n=1, cutoff=0.0
-            )
-            if matches:
-                elegido = matches[0]
+            elegido, _ = mejor_por_prog.get(prog_norm, (None, 0.0))
+            if elegido is not None:
                 return dicc[elegido]
             else:
                 # caso ultra extremo: sin keys en diccionario
@@ -291,6 +339,27 @@ def clasificar_nueva_oferta():
             mask_restante, "PROG_NORM"
         ].apply(asignar_por_fuzzy_forzado)
 
+    # Registrar en la caché las decisiones nuevas (antes de la limpieza final,
+    # que depende del conjunto de filas de cada corrida)
+    nuevas = df_new.loc[~mask_cache, ["PROG_NORM", "CAMPO DETALLADO"]].drop_duplicates("PROG_NORM")
+    for p, campo in zip(nuevas["PROG_NORM"], nuevas["CAMPO DETALLADO"]):
+        if not p:
+            decisiones[p] = {"campo": campo, "clave": None, "score": None, "corte": "sin_texto"}
+        elif p in dicc and str(dicc[p]).strip():
+            decisiones[p] = {"campo": campo, "clave": p, "score": 1.0, "corte": "exacto"}
+        else:
+            elegido, score = mejor_por_prog.get(p, (None, 0.0))
+            corte = nivel_corte(score) if elegido is not None else None
+            decisiones[p] = {
+                "campo": campo,
+                "clave": elegido,
+                "score": round(float(score), 6),
+                "corte": corte if corte is not None else "forzado",
+            }
+    if len(nuevas):
+        guardar_cache(cache)
+        print(f"   Decisiones nuevas guardadas en caché: {len(nuevas)}")
+
     # 3) Limpieza final: CAMPO DETALLADO sin vacíos ni "OTROS"
     df_new["CAMPO DETALLADO"] = df_new["CAMPO DETALLADO"].astype(str).str.strip()
 
@@ -328,12 +397,6 @@ def clasificar_nueva_oferta():
     # ──────────────────────────────────────────────
     print("Inyectando PROVINCIA (y CANTON si existe) desde F1_ACT...")
 
-    if not os.path.exists(F1_PATH):
-        raise FileNotFoundError(f"No se encontró {F1_PATH} para copiar PROVINCIA/CANTON")
-
-    df_f1 = pd.read_excel(F1_PATH, dtype=str)
-    df_f1.columns = df_f1.columns.astype(str).str.strip()
-
     col_ies_f1 = encontrar_columna(
         df_f1,
         ["CÓDIGO IES", "Codigo IES", "Código IES", "CODIGO IES"]
@@ -358,28 +421,22 @@ def clasificar_nueva_oferta():
     except Exception:
         col_cant_f1 = None
 
-    # Clave IES+PROG en ambos dataframes
-    df_f1["CLAVE_IES_PROG"] = construir_clave_ies_prog(
-        df_f1[col_ies_f1], df_f1[col_prog_f1]
-    )
-    df_new["CLAVE_IES_PROG"] = construir_clave_ies_prog(
-        df_new[col_ies_new], df_new[col_prog_new]
-    )
+    # Clave entera IES+PROG en ambos dataframes (registro_claves.py)
+    df_new["ID_CLAVE"] = ids_clave(df_new[col_ies_new], df_new[col_prog_new], guardar=True)
 
-    # Diccionario territorial desde F1_ACT
-    cols_terr = ["CLAVE_IES_PROG", col_prov_f1]
+    # Diccionario territorial desde F1_ACT (primera fila por clave)
+    cols_terr = [col_prov_f1]
     if col_cant_f1 is not None:
         cols_terr.append(col_cant_f1)
 
-    df_terr = df_f1[cols_terr].dropna(subset=["CLAVE_IES_PROG"])
-    df_terr = df_terr.drop_duplicates(subset=["CLAVE_IES_PROG"], keep="first")
+    ids_f1 = ids_clave(df_f1[col_ies_f1], df_f1[col_prog_f1], guardar=True)
+    df_terr = df_f1[cols_terr].assign(ID_CLAVE=ids_f1)
+    df_terr = df_terr.drop_duplicates(subset=["ID_CLAVE"], keep="first").set_index("ID_CLAVE")
 
-    dicc_prov = dict(zip(df_terr["CLAVE_IES_PROG"], df_terr[col_prov_f1]))
-    df_new["Provincia"] = df_new["CLAVE_IES_PROG"].map(dicc_prov)
+    df_new["Provincia"] = df_new["ID_CLAVE"].map(df_terr[col_prov_f1])
 
     if col_cant_f1 is not None:
-        dicc_cant = dict(zip(df_terr["CLAVE_IES_PROG"], df_terr[col_cant_f1]))
-        df_new["Cantón"] = df_new["CLAVE_IES_PROG"].map(dicc_cant)
+        df_new["Cantón"] = df_new["ID_CLAVE"].map(df_terr[col_cant_f1])
 
     # ── Normalizar nombres territoriales (Provincia / Cantón) ──
     if "Provincia" in df_new.columns and "PROVINCIA" not in df_new.columns:
@@ -388,21 +445,132 @@ def clasificar_nueva_oferta():
     if "Cantón" in df_new.columns and "CANTON" not in df_new.columns:
         df_new = df_new.rename(columns={"Cantón": "CANTON"})
 
-    # (CLAVE_IES_PROG y PROG_NORM se pueden dejar como columnas técnicas o quitarlas si quieres)
-    # df_new = df_new.drop(columns=["CLAVE_IES_PROG", "PROG_NORM"], errors="ignore")
+    # (ID_CLAVE y PROG_NORM se pueden dejar como columnas técnicas o quitarlas si quieres)
+    # df_new = df_new.drop(columns=["ID_CLAVE", "PROG_NORM"], errors="ignore")
+
+    return df_new
+
+
+def contexto_clasificacion() -> dict:
+    """
+    Con qué se clasifica: versión del diccionario (cache_clasificacion.py) y
+    huella de F1_ACT, de donde salen PROVINCIA/CANTON aunque se use el maestro.
+    """
+    return {
+        "version_diccionario": version_diccionario(OUT_DICC_MAESTRO, F1_PATH),
+        "f1_act": hash_archivo(F1_PATH) if os.path.exists(F1_PATH) else None,
+    }
+
+
+def clasificar_oferta_df(
+    df_new: pd.DataFrame,
+    df_f1: pd.DataFrame | None = None,
+    completo: bool = False,
+):
+    """
+    Clasifica CES_RAW ya cargada (texto, como pd.read_excel(dtype=str)).
+    Si existe un delta (delta_ces.py) contra la última oferta clasificada,
+    solo clasifica las filas agregadas o modificadas y reutiliza el resto
+    desde OFERTA_ACAD_CES_CLASIFICADA. Con completo=True se reclasifica todo.
+
+    Devuelve (df_clasificada, huellas); no escribe nada (ver guardar_clasificacion).
+    """
+    df_new = df_new.rename(columns=lambda c: str(c).strip())
+
+    # Columnas básicas en CES_RAW
+    col_prog_new = encontrar_columna(
+        df_new,
+        ["PROGRAMA / CARRERA", "PROGRAMA/CARRERA", "PROGRAMA", "CARRERA"]
+    )
+    col_ies_new = encontrar_columna(
+        df_new,
+        ["Código IES", "CÓDIGO IES", "Codigo IES", "CODIGO IES"]
+    )
+
+    print(f"   Columna programa base nueva (CES_RAW): {col_prog_new}")
+    print(f"   Columna Código IES base nueva (CES_RAW): {col_ies_new}")
+
+    huellas = calcular_huellas(df_new)
+    delta = None if completo else cargar_delta()
+    claves_raw = set(huellas["CLAVE"])
+    # El delta debe corresponder a este CES_RAW y existir una clasificación previa
+    incremental = (
+        delta is not None
+        and delta.get("con_foto_previa")
+        and delta.get("total_filas") == len(huellas)
+        and set(delta["agregados"]) | set(delta["modificados"]) <= claves_raw
+        and existe_tabla(OUT_CLASIF)
+    )
+    # Las filas previas se clasificaron con otro diccionario / otra F1_ACT
+    if incremental and cargar_contexto_huellas() != contexto_clasificacion():
+        print("El diccionario o F1_ACT cambiaron desde la clasificación previa; se reclasifica todo.")
+        incremental = False
+
+    if incremental:
+        print(f"Modo incremental (delta CES: {resumen_delta(delta)})")
+        claves_a_clasificar = set(delta["agregados"]) | set(delta["modificados"])
+        mask_nuevas = huellas["CLAVE"].isin(claves_a_clasificar)
+
+        df_prev = leer_tabla(OUT_CLASIF, texto=True)
+        df_prev.columns = df_prev.columns.astype(str).str.strip()
+        df_prev["_CLAVE_DELTA"] = calcular_huellas(df_prev)["CLAVE"].values
+        claves_vigentes = set(huellas.loc[~mask_nuevas, "CLAVE"])
+        df_prev = df_prev[df_prev["_CLAVE_DELTA"].isin(claves_vigentes)]
+        df_prev = df_prev.drop_duplicates(subset=["_CLAVE_DELTA"], keep="first")
+
+        if len(df_prev) != len(claves_vigentes):
+            print("   La clasificación previa no cubre la oferta sin cambios; se reclasifica todo.")
+            incremental = False
+
+    if incremental:
+        df_sub = df_new[mask_nuevas].copy()
+        print(f"   Filas a clasificar: {len(df_sub)} | reutilizadas: {len(df_prev)}")
+        if not df_sub.empty:
+            df_sub = clasificar_filas(df_sub, col_prog_new, col_ies_new, df_f1)
+        df_sub["_CLAVE_DELTA"] = huellas.loc[mask_nuevas, "CLAVE"].values
+
+        # Respetar el orden de filas de CES_RAW
+        orden = pd.Series(range(len(huellas)), index=huellas["CLAVE"].values)
+        df_new = pd.concat([df_prev, df_sub], ignore_index=True)
+        df_new = df_new.iloc[df_new["_CLAVE_DELTA"].map(orden).argsort(kind="mergesort")]
+        df_new = df_new.drop(columns=["_CLAVE_DELTA"]).reset_index(drop=True)
+        # las filas reutilizadas vienen como texto (o con la clave de texto
+        # de versiones anteriores): ID_CLAVE se recalcula para todas
+        df_new = df_new.drop(columns=["CLAVE_IES_PROG"], errors="ignore")
+        df_new["ID_CLAVE"] = ids_clave(df_new[col_ies_new], df_new[col_prog_new], guardar=True)
+    else:
+        df_new = clasificar_filas(df_new, col_prog_new, col_ies_new, df_f1)
+
+    return df_new, huellas
+
 
-    # Guardar
-    os.makedirs(DATA_DIR, exist_ok=True)
-    df_new.to_excel(OUT_CLASIF, index=False)
+def guardar_clasificacion(df_new: pd.DataFrame, huellas: pd.DataFrame) -> None:
+    """Escribe OFERTA_ACAD_CES_CLASIFICADA (columnar) y la foto de huellas."""
+    ruta = guardar_tabla(df_new, OUT_CLASIF)
 
     print("Clasificación completada. NO hay 'SIN CLASIFICAR' ni campos vacíos en CAMPO DETALLADO.")
     print("PROVINCIA (y CANTON si aplica) copiados desde F1_ACT.")
-    print(f"Archivo clasificado guardado en: {OUT_CLASIF}")
+    print(f"Archivo clasificado guardado en: {ruta}")
+
+    # Foto de huellas de la oferta ya clasificada (base del próximo delta),
+    # con el diccionario y F1_ACT que se usaron
+    guardar_huellas(huellas, contexto=contexto_clasificacion())
 
     resumen = df_new["CAMPO DETALLADO"].value_counts().head(10)
     print("Top 10 campos detallados (conteo):")
     print(resumen)
 
 
+def clasificar_nueva_oferta(completo: bool = False):
+    """Lee CES_RAW, la clasifica y guarda el resultado (uso por consola)."""
+    print("Cargando base CES RAW...")
+    if not existe_tabla(RAW_PATH):
+        raise FileNotFoundError(f"No se encontró {RAW_PATH}")
+
+    df_new = leer_tabla(RAW_PATH, texto=True)
+    df_clasif, huellas = clasificar_oferta_df(df_new, completo=completo)
+    guardar_clasificacion(df_clasif, huellas)
+
+
 if __name__ == "__main__":
-    clasificar_nueva_oferta()
+    clasificar_nueva_oferta(completo="--completo" in sys.argv[1:])
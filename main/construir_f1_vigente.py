@@ -9,32 +9,23 @@
 #   PROVINCIA se toma SIEMPRE desde F1_ACT (columna PROVINCIA),
 #   no desde CES, porque ahí la tienes bien construída.
 #
-#   CLAVE_NORM = normalizar(Código IES + PROGRAMA / CARRERA)
+#   ID_CLAVE = id entero de (Código IES, PROGRAMA / CARRERA) canonizados
+#   (ver registro_claves.py)
 
 import os
 import sys
 import pandas as pd
 
+from artefactos import existe_tabla, leer_tabla
+from excel_streaming import escribir_excel_streaming, resumen_escritura
+from registro_claves import ids_clave
+
 DATA_DIR = "data"
 F1_ACT_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CEDEPRO_F_1_MATRICULADOS_ACT.xlsx")
 CES_CLAS_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CES_CLASIFICADA.xlsx")
 OUT_VIGENTE_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CEDEPRO_F_1_VIGENTE.xlsx")
 
 
-def normalize_text(s):
-    """Mayúsculas, sin tildes, sin espacios extra."""
-    if pd.isna(s):
-        return ""
-    s = str(s).strip().upper()
-    for a, b in [
-        ("Á", "A"), ("É", "E"), ("Í", "I"),
-        ("Ó", "O"), ("Ú", "U"), ("Ü", "U"),
-        ("Ñ", "N"),
-    ]:
-        s = s.replace(a, b)
-    return s
-
-
 def find_col(df, candidates, label):
     """Devuelve la primera columna de candidates que exista en df.columns."""
     for c in candidates:
@@ -43,30 +34,17 @@ def find_col(df, candidates, label):
     raise ValueError(f"No se encontró columna para {label}. Probé: {candidates}")
 
 
-def main() -> int:
-    print("\n==============================")
-    print("CONSTRUIR F1_VIGENTE (CES_CLASIFICADA + estáticos F1_ACT)")
-    print("==============================")
-
-    # 1) Cargar bases
-    if not os.path.exists(F1_ACT_PATH):
-        print(f"ERROR: No existe {F1_ACT_PATH}")
-        return 1
-    if not os.path.exists(CES_CLAS_PATH):
-        print(f"ERROR: No existe {CES_CLAS_PATH}")
-        return 1
-
-    print(f"Cargando F1_ACT desde: {F1_ACT_PATH}")
-    df_f1 = pd.read_excel(F1_ACT_PATH)
+def construir_vigente(df_f1: pd.DataFrame, df_ces: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arma F1_VIGENTE a partir de F1_ACT y CES_CLASIFICADA ya cargadas
+    (sin modificar los DataFrames recibidos).
+    """
     print(f"Filas F1_ACT: {len(df_f1)}")
     print("Columnas F1_ACT:", list(df_f1.columns))
-
-    print(f"Cargando CES_CLASIFICADA desde: {CES_CLAS_PATH}")
-    df_ces = pd.read_excel(CES_CLAS_PATH)
     print(f"Filas CES_CLASIFICADA (crudo): {len(df_ces)}")
     print("Columnas CES_CLASIFICADA:", list(df_ces.columns))
 
-    # 2) CLAVE_NORM en F1_ACT
+    # 2) ID_CLAVE en F1_ACT
     col_ies_f1 = find_col(
         df_f1,
         ["CÓDIGO IES", "Codigo IES", "Código IES", "CODIGO IES"],
@@ -78,13 +56,9 @@ def main() -> int:
         "PROGRAMA / CARRERA en F1_ACT",
     )
 
-    df_f1["CLAVE_NORM"] = (
-        df_f1[col_ies_f1].map(normalize_text)
-        + "||"
-        + df_f1[col_prog_f1].map(normalize_text)
-    )
+    df_f1 = df_f1.assign(ID_CLAVE=ids_clave(df_f1[col_ies_f1], df_f1[col_prog_f1], guardar=True))
 
-    # 3) CLAVE_NORM en CES_CLASIFICADA (base vigente)
+    # 3) ID_CLAVE en CES_CLASIFICADA (base vigente)
     col_ies_ces = find_col(
         df_ces,
         ["Código IES", "Codigo IES", "CÓDIGO IES", "CODIGO IES"],
@@ -96,13 +70,9 @@ def main() -> int:
         "PROGRAMA / CARRERA en CES_CLASIFICADA",
     )
 
-    df_ces["CLAVE_NORM"] = (
-        df_ces[col_ies_ces].map(normalize_text)
-        + "||"
-        + df_ces[col_prog_ces].map(normalize_text)
-    )
+    df_ces = df_ces.assign(ID_CLAVE=ids_clave(df_ces[col_ies_ces], df_ces[col_prog_ces], guardar=True))
 
-    print(f"Filas CES_CLASIFICADA (con CLAVE_NORM): {len(df_ces)} (deben ser ~9071)")
+    print(f"Filas CES_CLASIFICADA (con ID_CLAVE): {len(df_ces)} (deben ser ~9071)")
 
     # 4) Definir columnas dinámicas (que NO se copian desde F1_ACT)
     cols_dinamicas = {
@@ -136,7 +106,7 @@ def main() -> int:
     # 5) Columnas estáticas (se agregan desde F1_ACT)
     static_cols = []
     for c in df_f1.columns:
-        if c == "CLAVE_NORM":
+        if c == "ID_CLAVE":
             continue
         if c in cols_dinamicas:
             continue
@@ -145,10 +115,9 @@ def main() -> int:
     print("\nColumnas ESTÁTICAS que se usarán desde F1_ACT (incluye PROVINCIA si existe):")
     print(static_cols)
 
-    # 6) Armar diccionario estático: una fila por CLAVE_NORM (primer valor)
-    df_static = df_f1[["CLAVE_NORM"] + static_cols].copy()
-    df_static = df_static.sort_values("CLAVE_NORM")
-    df_static = df_static.drop_duplicates(subset=["CLAVE_NORM"], keep="first")
+    # 6) Armar diccionario estático: una fila por ID_CLAVE (primera en F1_ACT)
+    df_static = df_f1[["ID_CLAVE"] + static_cols].copy()
+    df_static = df_static.drop_duplicates(subset=["ID_CLAVE"], keep="first")
 
     # Renombrar PROVINCIA de F1_ACT a PROVINCIA_F1 para distinguirla
     if "PROVINCIA" in df_static.columns:
@@ -160,7 +129,7 @@ def main() -> int:
     # 7) Merge: CES_CLASIFICADA (oferta vigente) + estáticos F1_ACT
     df_vigente = df_ces.merge(
         df_static,
-        on="CLAVE_NORM",
+        on="ID_CLAVE",
         how="left",      # CES manda en filas
         suffixes=("", "_F1"),
     )
@@ -184,7 +153,9 @@ def main() -> int:
 
     # 9) Limpiar columnas internas y ordenar columnas
     internal_cols = [
+        "ID_CLAVE",
         "CLAVE_NORM",
+        "CLAVE_IES_PROG",
         "CLAVE_F1",
         "PROGRAMA_REFERENCIA_SIMILITUD",
         "SIMILITUD_REFERENCIA",
@@ -195,21 +166,48 @@ def main() -> int:
             df_vigente = df_vigente.drop(columns=[c])
             print(f"Eliminando columna interna: {c}")
 
-    # 1) columnas originales de CES (excepto CLAVE_NORM)
-    ces_cols = [c for c in df_ces.columns if c != "CLAVE_NORM"]
+    # 1) columnas originales de CES (sin las internas)
+    ces_cols = [c for c in df_ces.columns if c in df_vigente.columns]
     # 2) columnas extra que vinieron desde F1_ACT
     extra_cols = [c for c in df_vigente.columns if c not in ces_cols]
 
     ordered_cols = ces_cols + extra_cols
-    df_vigente = df_vigente[ordered_cols]
+    return df_vigente[ordered_cols]
 
-    # 10) Guardar resultado
+
+def guardar_vigente(df_vigente: pd.DataFrame) -> None:
     print(f"\nGuardando F1_VIGENTE en: {OUT_VIGENTE_PATH}")
-    os.makedirs(DATA_DIR, exist_ok=True)
-    df_vigente.to_excel(OUT_VIGENTE_PATH, index=False)
+    stats = escribir_excel_streaming(df_vigente, OUT_VIGENTE_PATH)
+    print(f"   {resumen_escritura(stats)}")
 
     print("CONSTRUIR F1_VIGENTE COMPLETADO.")
     print(f"Filas finales en F1_VIGENTE: {len(df_vigente)} (deben ser ~9071)")
+
+
+def main() -> int:
+    print("\n==============================")
+    print("CONSTRUIR F1_VIGENTE (CES_CLASIFICADA + estáticos F1_ACT)")
+    print("==============================")
+
+    # 1) Cargar bases
+    if not os.path.exists(F1_ACT_PATH):
+        print(f"ERROR: No existe {F1_ACT_PATH}")
+        return 1
+    if not existe_tabla(CES_CLAS_PATH):
+        print(f"ERROR: No existe {CES_CLAS_PATH}")
+        return 1
+
+    print(f"Cargando F1_ACT desde: {F1_ACT_PATH}")
+    df_f1 = pd.read_excel(F1_ACT_PATH)
+
+    print(f"Cargando CES_CLASIFICADA desde: {CES_CLAS_PATH}")
+    df_ces = leer_tabla(CES_CLAS_PATH, texto=True)
+
+    # 2..9) Claves, estáticos, merge y orden de columnas
+    df_vigente = construir_vigente(df_f1, df_ces)
+
+    # 10) Guardar resultado
+    guardar_vigente(df_vigente)
     return 0
 
 
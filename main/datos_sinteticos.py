@@ -0,0 +1,264 @@
+# datos_sinteticos.py
+# Genera OFERTA VIGENTE y F1 (matriculados + titulados) sintéticos para
+# medir app.py sin los Excel reales (que no están en el repo).
+#
+# Las columnas y las "suciedades" imitan las de los Excel reales:
+#  - provincias con tilde y sin tilde, en minúsculas, pegadas ("ELORO") o
+#    como código ("SE", "SD", "GPS");
+#  - CAMPO_DETALLADO_P con la provincia pegada ("Medicina_GUAYAS",
+#    "Derecho__GUAYAS", "Educación - inicial_SE") o, con
+#    provincia_en_campo=False, en la columna PROVINCIA aparte;
+#  - años como número o como texto ("2019", "2019-2020"), matriculados
+#    vacíos o con separador de miles ("1.234"), dobles espacios.
+#
+# "1.234" queda como texto en el .xlsx: load_base lo convierte con
+# to_int_safe (1234) tanto en la carga completa como en la carga por bloques
+# (CEDEPRO_F1_BLOQUE_FILAS); bench_app.py --bloques verifica que ambas den
+# las mismas respuestas.
+#
+# Escala 1 = ~3.500 programas en oferta y 800 filas de F1 por año; las
+# filas crecen linealmente con la escala y con la cantidad de años.
+#
+#   python datos_sinteticos.py --escala 10 --anios 2010-2024 --destino /tmp/cedepro_10x
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from excel_streaming import escribir_excel_streaming, resumen_escritura
+
+OFERTA_FILENAME = "OFERTA_ACAD_CEDEPRO_F_1_VIGENTE.xlsx"
+F1_FILENAME = "OFERTA_ACAD_CEDEPRO_F_1_MATRICULADOS.xlsx"
+
+FILAS_OFERTA_BASE = 3500
+FILAS_F1_POR_ANIO = 800
+MAX_FILAS_EXCEL = 1_048_575  # sin contar el encabezado
+
+# (nombre oficial, variantes que aparecen en los archivos)
+PROVINCIAS = [
+    ("AZUAY", ["Azuay", "azuay"]),
+    ("BOLÍVAR", ["BOLIVAR", "Bolívar"]),
+    ("CAÑAR", ["CANAR", "Cañar"]),
+    ("CARCHI", ["Carchi"]),
+    ("CHIMBORAZO", ["Chimborazo"]),
+    ("COTOPAXI", ["Cotopaxi"]),
+    ("EL ORO", ["ELORO", "El Oro", "EL  ORO"]),
+    ("ESMERALDAS", ["Esmeraldas"]),
+    ("GALÁPAGOS", ["GALAPAGOS", "GPS", "GA"]),
+    ("GUAYAS", ["Guayas", "guayas", "_GUAYAS"]),
+    ("IMBABURA", ["Imbabura"]),
+    ("LOJA", ["Loja"]),
+    ("LOS RÍOS", ["LOS RIOS", "Los Ríos"]),
+    ("MANABÍ", ["MANABI", "Manabí"]),
+    ("MORONA SANTIAGO", ["Morona Santiago"]),
+    ("NAPO", ["Napo"]),
+    ("ORELLANA", ["Orellana"]),
+    ("PASTAZA", ["Pastaza"]),
+    ("PICHINCHA", ["Pichincha", "pichincha"]),
+    ("SANTA ELENA", ["SE", "Santa Elena"]),
+    ("SANTO DOMINGO DE LOS TSÁCHILAS", ["SD", "ST", "SANTO DOMINGO", "SANTO DOMINGO DE LOS TSACHILAS"]),
+    ("SUCUMBÍOS", ["SUCUMBIOS", "Sucumbíos"]),
+    ("TUNGURAHUA", ["Tungurahua"]),
+    ("ZAMORA CHINCHIPE", ["Zamora Chinchipe"]),
+]
+# Peso relativo de cada provincia (Guayas y Pichincha concentran la oferta)
+PESO_PROVINCIA = {"GUAYAS": 8, "PICHINCHA": 8, "AZUAY": 3, "MANABÍ": 3, "EL ORO": 2, "LOJA": 2, "TUNGURAHUA": 2}
+
+CAMPOS = [
+    "Educación", "Educación inicial", "Artes", "Humanidades", "Idiomas",
+    "Ciencias sociales y del comportamiento", "Periodismo e información",
+    "Educación comercial y administración", "Contabilidad - auditoría",
+    "Derecho", "Ciencias biológicas", "Medio ambiente", "Ciencias físicas",
+    "Matemáticas y estadística", "Tecnologías de la información",
+    "Ingeniería y profesiones afines", "Industria y producción",
+    "Arquitectura y construcción", "Agricultura", "Veterinaria",
+    "Medicina", "Enfermería", "Odontología", "Bienestar", "Servicios personales",
+    "Servicios de transporte", "Servicios de seguridad",
+]
+NIVELES = ["GRADO", "TECNOLÓGICO", "MAESTRÍA", "ESPECIALIZACIÓN", "DOCTORADO"]
+PESO_NIVEL = [55, 20, 18, 5, 2]
+TIPOS_IES = ["UNIVERSIDAD", "ESCUELA POLITÉCNICA", "INSTITUTO SUPERIOR TECNOLÓGICO"]
+FINANCIAMIENTO = ["PÚBLICA", "PARTICULAR AUTOFINANCIADA", "PARTICULAR COFINANCIADA"]
+
+
+def _probabilidades(pesos) -> np.ndarray:
+    p = np.asarray(pesos, dtype=float)
+    return p / p.sum()
+
+
+def _prob_provincias() -> np.ndarray:
+    return _probabilidades([PESO_PROVINCIA.get(nombre, 1) for nombre, _ in PROVINCIAS])
+
+
+def _variante(rng, idx: np.ndarray, proporcion: float) -> np.ndarray:
+    """Nombre de provincia por índice; una proporción usa alguna variante sucia."""
+    oficiales = np.array([p for p, _ in PROVINCIAS], dtype=object)
+    out = oficiales[idx].copy()
+    sucias = np.flatnonzero(rng.random(len(idx)) < proporcion)
+    for i in sucias:
+        out[i] = rng.choice(PROVINCIAS[idx[i]][1])
+    return out
+
+
+def _anios(texto: str) -> list:
+    """"2015-2024" o "2018,2020,2022" -> lista de años."""
+    if "-" in texto:
+        ini, fin = (int(x) for x in texto.split("-", 1))
+        return list(range(ini, fin + 1))
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+def generar_oferta(n: int, rng, proporcion_variantes: float = 0.15) -> pd.DataFrame:
+    """OFERTA VIGENTE: un programa por fila."""
+    n_ies = max(20, n // 40)
+    ies = rng.integers(0, n_ies, n)
+    prov_idx = rng.choice(len(PROVINCIAS), n, p=_prob_provincias())
+    campo = rng.choice(len(CAMPOS), n)
+    nivel = rng.choice(len(NIVELES), n, p=_probabilidades(PESO_NIVEL))
+    campos = np.array(CAMPOS, dtype=object)[campo]
+    niveles = np.array(NIVELES, dtype=object)[nivel]
+    cohorte = rng.integers(1, 120, n)
+
+    return pd.DataFrame({
+        "CÓDIGO IES": 1000 + ies,
+        "Universidad": [f"UNIVERSIDAD SINTÉTICA {i:03d}" for i in ies],
+        "Financiamiento": np.array(FINANCIAMIENTO, dtype=object)[ies % len(FINANCIAMIENTO)],
+        "Tipo IES": np.array(TIPOS_IES, dtype=object)[ies % len(TIPOS_IES)],
+        "PROGRAMA / CARRERA": [f"{c} - cohorte {k}" for c, k in zip(campos, cohorte)],
+        "Título que otorga": [f"Título en {c}" for c in campos],
+        "PROVINCIA": _variante(rng, prov_idx, proporcion_variantes),
+        "CAMPO DETALLADO": campos,
+        "CANTÓN": [f"CANTÓN {i % 7}" for i in prov_idx],
+        "TIPO DE PROGRAMA": niveles,
+    })
+
+
+def generar_f1(
+    filas_por_anio: int,
+    anios: list,
+    rng,
+    provincia_en_campo: bool = True,
+    proporcion_variantes: float = 0.15,
+) -> pd.DataFrame:
+    """F1: matriculados por (año, nivel, campo, provincia) y titulados en las mismas filas."""
+    n = filas_por_anio * len(anios)
+    prov_idx = rng.choice(len(PROVINCIAS), n, p=_prob_provincias())
+    campos = np.array(CAMPOS, dtype=object)[rng.choice(len(CAMPOS), n)]
+    provs = _variante(rng, prov_idx, proporcion_variantes)
+    anio = np.repeat(np.asarray(anios), filas_por_anio)
+
+    # Años: número, texto o rango "2019-2020"; algunos vacíos
+    anio_celda = anio.astype(object)
+    forma = rng.random(n)
+    texto = forma < 0.05
+    anio_celda[texto] = anio[texto].astype(str)
+    rango = (forma >= 0.05) & (forma < 0.08)
+    anio_celda[rango] = [f"{a}-{a + 1}" for a in anio[rango]]
+    anio_celda[forma > 0.995] = None
+
+    mat = rng.gamma(1.5, 120, n).astype(int)
+    mat_celda = mat.astype(object)
+    miles = mat >= 1000
+    mat_celda[miles] = [f"{m // 1000}.{m % 1000:03d}" for m in mat[miles]]
+    mat_celda[rng.random(n) < 0.02] = None
+
+    if provincia_en_campo:
+        sep = np.where(rng.random(n) < 0.03, "__", "_")
+        campo_p = [f"{c}{s}{p.lstrip('_')}" for c, s, p in zip(campos, sep, provs)]
+        prov_col = provs
+    else:
+        campo_p = list(campos)
+        prov_col = provs
+
+    # Titulados: mismo campo/provincia, egreso unos 4 años después
+    tit_anio = anio + rng.integers(3, 6, n)
+    tit_p = [f"{c}_{p.lstrip('_')}" for c, p in zip(campos, provs)]
+    vacios = rng.random(n) < 0.05
+    tit_p = [None if v else t for t, v in zip(tit_p, vacios)]
+
+    df = pd.DataFrame({
+        "AÑO DE MATRICULACIÓN": anio_celda,
+        "TIPO DE PROGRAMA": np.array(NIVELES, dtype=object)[rng.choice(len(NIVELES), n, p=_probabilidades(PESO_NIVEL))],
+        "CAMPO_DETALLADO_P": campo_p,
+        "PROVINCIA": prov_col,
+        "TOTAL_MATRICULADOS": mat_celda,
+        "TITULADOS_P": tit_p,
+        "AÑO_DE_TITULADOS": tit_anio,
+        "TITULADOS_TOTALES": (mat * rng.uniform(0.1, 0.35, n)).astype(int),
+    })
+    # dobles espacios y espacios al borde (clean_str los quita)
+    sucios = rng.random(n) < 0.02
+    df.loc[sucios, "TIPO DE PROGRAMA"] = " " + df.loc[sucios, "TIPO DE PROGRAMA"].astype(str) + " "
+    return df
+
+
+def generar(
+    destino: str,
+    escala: float = 1,
+    anios=None,
+    semilla: int = 7,
+    provincia_en_campo: bool = True,
+    proporcion_variantes: float = 0.15,
+) -> dict:
+    """
+    Escribe OFERTA VIGENTE y F1 sintéticas en destino. Devuelve
+    {"oferta": ruta, "f1": ruta, "filas_oferta", "filas_f1", "anios"}.
+    """
+    anios = anios or list(range(2015, 2025))
+    filas_oferta = int(FILAS_OFERTA_BASE * escala)
+    filas_por_anio = int(FILAS_F1_POR_ANIO * escala)
+    filas_f1 = filas_por_anio * len(anios)
+    if max(filas_oferta, filas_f1) > MAX_FILAS_EXCEL:
+        raise ValueError(
+            f"{filas_f1} filas de F1 no caben en una hoja de Excel ({MAX_FILAS_EXCEL}); "
+            "baja la escala o la cantidad de años."
+        )
+
+    rng = np.random.default_rng(semilla)
+    os.makedirs(destino, exist_ok=True)
+    oferta_path = os.path.join(destino, OFERTA_FILENAME)
+    f1_path = os.path.join(destino, F1_FILENAME)
+
+    stats = escribir_excel_streaming(generar_oferta(filas_oferta, rng, proporcion_variantes), oferta_path)
+    print(f"   {resumen_escritura(stats)}")
+    f1 = generar_f1(filas_por_anio, anios, rng, provincia_en_campo, proporcion_variantes)
+    stats = escribir_excel_streaming(f1, f1_path)
+    print(f"   {resumen_escritura(stats)}")
+
+    return {
+        "oferta": oferta_path,
+        "f1": f1_path,
+        "filas_oferta": filas_oferta,
+        "filas_f1": filas_f1,
+        "anios": [int(a) for a in anios],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera OFERTA VIGENTE y F1 sintéticas.")
+    parser.add_argument("--destino", required=True, help="carpeta de salida")
+    parser.add_argument("--escala", type=float, default=1, help="1 = ~3.500 programas y 800 filas de F1 por año")
+    parser.add_argument("--anios", default="2015-2024", help='"2015-2024" o "2018,2020,2022"')
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--variantes", type=float, default=0.15, help="proporción de provincias escritas con variantes")
+    parser.add_argument("--provincia-aparte", action="store_true", help="provincia solo en PROVINCIA (no pegada al campo)")
+    args = parser.parse_args(argv)
+
+    info = generar(
+        args.destino,
+        escala=args.escala,
+        anios=_anios(args.anios),
+        semilla=args.semilla,
+        provincia_en_campo=not args.provincia_aparte,
+        proporcion_variantes=args.variantes,
+    )
+    print(f"Oferta: {info['filas_oferta']} filas -> {info['oferta']}")
+    print(f"F1: {info['filas_f1']} filas ({len(info['anios'])} años) -> {info['f1']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 # debug_conteos_v2.py
 import os
 import pandas as pd
-import unicodedata
+
+from artefactos import existe_tabla, guardar_tabla, leer_tabla
+from reconciliacion import COLUMNAS_IES, COLUMNAS_PROGRAMA, encontrar_columna, imprimir_resumen, reconciliar
+from registro_claves import ids_clave
 
 DATA_DIR = "data"
 F1_ACT_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CEDEPRO_F_1_MATRICULADOS_ACT.xlsx")
@@ -9,50 +12,14 @@ CES_RAW_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CES_RAW.xlsx")
 OUT_ONLY_CES = os.path.join(DATA_DIR, "PROGRAMAS_SOLO_EN_CES.xlsx")
 
 
-def normalizar_texto(s: str) -> str:
-    if pd.isna(s):
-        return ""
-    s = str(s).strip().lower()
-    s = "".join(
-        c for c in unicodedata.normalize("NFKD", s)
-        if not unicodedata.combining(c)
-    )
-    while "  " in s:
-        s = s.replace("  ", " ")
-    return s
-
-
-def norm_colname(col: str) -> str:
-    if col is None:
-        return ""
-    s = normalizar_texto(col)
-    return s.replace(" ", "").replace("_", "").replace("/", "")
-
-
-def encontrar_columna(df: pd.DataFrame, keywords) -> str:
-    cols_norm = {norm_colname(c): c for c in df.columns}
-    for k in keywords:
-        nk = norm_colname(k)
-        for cnorm, original in cols_norm.items():
-            if nk in cnorm:
-                return original
-    raise Exception(f"No se encontró ninguna columna que coincida con: {keywords}")
-
-
-def main():
-    if not os.path.exists(F1_ACT_PATH):
-        raise FileNotFoundError(f"No se encontró {F1_ACT_PATH}")
-
-    if not os.path.exists(CES_RAW_PATH):
-        raise FileNotFoundError(f"No se encontró {CES_RAW_PATH}")
-
-    print("Cargando F1_ACT...")
-    df_f1 = pd.read_excel(F1_ACT_PATH, dtype=str)
-    df_f1.columns = df_f1.columns.astype(str).str.strip()
-
-    print("Cargando CES_RAW...")
-    df_ces = pd.read_excel(CES_RAW_PATH, dtype=str)
-    df_ces.columns = df_ces.columns.astype(str).str.strip()
+def programas_solo_en_ces(df_f1: pd.DataFrame, df_ces: pd.DataFrame) -> pd.DataFrame:
+    """
+    Imprime los conteos de F1_ACT vs CES_RAW ya cargadas como texto y
+    devuelve las filas completas de CES_RAW cuyo programa no está en F1_ACT
+    (vacío si no hay). No modifica los DataFrames recibidos.
+    """
+    df_f1 = df_f1.rename(columns=lambda c: str(c).strip())
+    df_ces = df_ces.rename(columns=lambda c: str(c).strip())
 
     print("\nColumnas F1_ACT:")
     print(list(df_f1.columns))
@@ -60,74 +27,60 @@ def main():
     print("\nColumnas CES_RAW:")
     print(list(df_ces.columns))
 
-    # Buscar columnas de IES y PROGRAMA en cada base
-    col_ies_f1 = encontrar_columna(
-        df_f1,
-        ["CÓDIGO IES", "Codigo IES", "Código IES"]
-    )
-    col_prog_f1 = encontrar_columna(
-        df_f1,
-        ["PROGRAMA / CARRERA", "PROGRAMA/CARRERA", "PROGRAMA", "CARRERA"]
-    )
-
-    col_ies_ces = encontrar_columna(
-        df_ces,
-        ["CÓDIGO IES", "Codigo IES", "Código IES"]
-    )
-    col_prog_ces = encontrar_columna(
-        df_ces,
-        ["PROGRAMA / CARRERA", "PROGRAMA/CARRERA", "PROGRAMA", "CARRERA"]
-    )
-
-    print("\n--- Columnas detectadas ---")
-    print(f"F1_ACT  -> IES: {col_ies_f1}, PROGRAMA: {col_prog_f1}")
-    print(f"CES_RAW -> IES: {col_ies_ces}, PROGRAMA: {col_prog_ces}")
-
-    # Construir claves normalizadas IES||PROG
-    df_f1["CLAVE_DEBUG"] = (
-        df_f1[col_ies_f1].fillna("").astype(str).str.strip().map(normalizar_texto)
-        + "||"
-        + df_f1[col_prog_f1].fillna("").astype(str).str.strip().map(normalizar_texto)
-    )
-
-    df_ces["CLAVE_DEBUG"] = (
-        df_ces[col_ies_ces].fillna("").astype(str).str.strip().map(normalizar_texto)
-        + "||"
-        + df_ces[col_prog_ces].fillna("").astype(str).str.strip().map(normalizar_texto)
-    )
-
-    claves_f1 = set(df_f1["CLAVE_DEBUG"])
-    claves_ces = set(df_ces["CLAVE_DEBUG"])
+    reporte = reconciliar(df_f1, df_ces, etiquetas=("F1_ACT", "CES_RAW"))
 
     print("\n--- Conteos ---")
-    print(f"Filas F1_ACT: {len(df_f1)}")
-    print(f"Claves únicas IES+PROG en F1_ACT: {len(claves_f1)}")
+    imprimir_resumen(reporte)
+
+    agregados = reporte["AGREGADOS"]
+    eliminados = reporte["ELIMINADOS"]
+    nuevas = agregados[agregados["CLAVE_NUEVA"]].drop_duplicates("ID_CLAVE")
+    solo_f1 = eliminados[eliminados["CLAVE_ELIMINADA"]].drop_duplicates("ID_CLAVE")
+
+    # Filas completas de CES_RAW de los programas "solo en CES"
+    df_solo_ces = df_ces.iloc[0:0]
+    if len(nuevas):
+        ids = ids_clave(
+            df_ces[encontrar_columna(df_ces, COLUMNAS_IES)],
+            df_ces[encontrar_columna(df_ces, COLUMNAS_PROGRAMA)],
+        )
+        df_solo_ces = df_ces.assign(ID_CLAVE=ids)[ids.isin(nuevas["ID_CLAVE"])]
 
-    print(f"\nFilas CES_RAW: {len(df_ces)}")
-    print(f"Claves únicas IES+PROG en CES_RAW: {len(claves_ces)}")
+    # Opcional: mostrar algunas claves de ejemplo
+    print("\nEjemplo de claves SOLO_EN_CES (máx 10):")
+    for clave in sorted(nuevas["CLAVE"])[:10]:
+        print("  ", clave)
 
-    solo_ces = sorted(claves_ces - claves_f1)
-    solo_f1 = sorted(claves_f1 - claves_ces)
+    print("\nEjemplo de claves SOLO_EN_F1_ACT (máx 10):")
+    for clave in sorted(solo_f1["CLAVE"])[:10]:
+        print("  ", clave)
+
+    return df_solo_ces
 
-    print(f"\nClaves que están en CES_RAW pero NO en F1_ACT: {len(solo_ces)}")
-    print(f"Claves que están en F1_ACT pero NO en CES_RAW: {len(solo_f1)}")
 
-    # Guardar detalle de "solo en CES" para revisarlos en Excel
-    if solo_ces:
-        df_solo_ces = df_ces[df_ces["CLAVE_DEBUG"].isin(solo_ces)].copy()
-        df_solo_ces.to_excel(OUT_ONLY_CES, index=False)
-        print(f"\nSe guardaron los programas SOLO_EN_CES en: {OUT_ONLY_CES}")
+def guardar_solo_en_ces(df_solo_ces: pd.DataFrame) -> None:
+    """Guarda el detalle de "solo en CES" para revisarlo (si hay filas)."""
+    if len(df_solo_ces):
+        ruta = guardar_tabla(df_solo_ces, OUT_ONLY_CES)
+        print(f"\nSe guardaron los programas SOLO_EN_CES en: {ruta}")
     else:
         print("\nNo hay programas que estén solo en CES_RAW.")
 
-    # Opcional: mostrar algunas claves de ejemplo
-    print("\nEjemplo de claves SOLO_EN_CES (máx 10):")
-    for clave in solo_ces[:10]:
-        print("  ", clave)
 
-    print("\nEjemplo de claves SOLO_EN_F1_ACT (máx 10):")
-    for clave in solo_f1[:10]:
-        print("  ", clave)
+def main():
+    if not os.path.exists(F1_ACT_PATH):
+        raise FileNotFoundError(f"No se encontró {F1_ACT_PATH}")
+
+    if not existe_tabla(CES_RAW_PATH):
+        raise FileNotFoundError(f"No se encontró {CES_RAW_PATH}")
+
+    print("Cargando F1_ACT...")
+    df_f1 = pd.read_excel(F1_ACT_PATH, dtype=str)
+
+    print("Cargando CES_RAW...")
+    df_ces = leer_tabla(CES_RAW_PATH, texto=True)
+
+    guardar_solo_en_ces(programas_solo_en_ces(df_f1, df_ces))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+# delta_ces.py
+# Detección de cambios en la oferta CES mediante huellas por fila.
+#
+# - CLAVE  = Código IES || PROGRAMA / CARRERA canonizados como en
+#            registro_claves.py (la misma forma que usan los joins)
+#            (si una IES publica el mismo programa varias veces, p.ej. en
+#             distintas provincias, se agrega "#n" para distinguirlas)
+# - HUELLA = sha1(Código IES + PROGRAMA + TÍTULO + PROVINCIA) normalizados
+#
+# La "foto" previa (OFERTA_ACAD_CES_HUELLAS.csv) corresponde a la última
+# oferta CLASIFICADA con éxito; el scraper compara contra ella y deja el
+# delta (agregados / eliminados / modificados) en OFERTA_ACAD_CES_DELTA.json.
+#
+# Junto a la foto se guarda con qué se clasificó (versión del diccionario y
+# huella de F1_ACT) en OFERTA_ACAD_CES_HUELLAS_CONTEXTO.json: si cambia, las
+# filas sin cambios en el CES tampoco se pueden reutilizar.
+
+import os
+import json
+import hashlib
+import unicodedata
+from datetime import datetime
+
+import pandas as pd
+
+from registro_claves import canonizar_ies, canonizar_programa
+
+DATA_DIR = "data"
+HUELLAS_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CES_HUELLAS.csv")
+DELTA_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CES_DELTA.json")
+CONTEXTO_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CES_HUELLAS_CONTEXTO.json")
+
+# Nombres por defecto de las columnas que genera update_oferta_selenium.py
+COLUMNAS_HUELLA = {
+    "codigo_ies": ["Código IES", "CÓDIGO IES", "Codigo IES", "CODIGO IES"],
+    "programa": ["PROGRAMA / CARRERA", "Programa / Carrera", "PROGRAMA/CARRERA"],
+    "titulo": ["Título que otorga", "TÍTULO QUE OTORGA", "Titulo que otorga"],
+    "provincia": ["PROVINCIA", "Provincia"],
+}
+
+
+def _norm(s) -> str:
+    """Minúsculas, sin tildes, sin espacios extra (vacío si NaN)."""
+    if s is None or (not isinstance(s, str) and pd.isna(s)):
+        return ""
+    s = str(s).strip().lower()
+    s = "".join(
+        c for c in unicodedata.normalize("NFKD", s)
+        if not unicodedata.combining(c)
+    )
+    return " ".join(s.split())
+
+
+def _buscar_col(df: pd.DataFrame, candidatos):
+    for c in candidatos:
+        if c in df.columns:
+            return c
+    return None
+
+
+def calcular_huellas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Devuelve un DataFrame alineado con df (mismo índice) con:
+      CLAVE, HUELLA
+    Las columnas que no existan en df se tratan como vacías.
+    """
+    cols = {k: _buscar_col(df, v) for k, v in COLUMNAS_HUELLA.items()}
+    if cols["codigo_ies"] is None or cols["programa"] is None:
+        raise KeyError(
+            "No se encontraron columnas Código IES / PROGRAMA para calcular huellas. "
+            f"Columnas disponibles: {list(df.columns)}"
+        )
+
+    canonizar = {"codigo_ies": canonizar_ies, "programa": canonizar_programa}
+    partes = {}
+    for k, col in cols.items():
+        if col is None:
+            partes[k] = pd.Series([""] * len(df), index=df.index)
+        else:
+            partes[k] = df[col].map(canonizar.get(k, _norm))
+
+    clave_base = partes["codigo_ies"] + "||" + partes["programa"]
+    contenido = (
+        clave_base
+        + "||" + partes["titulo"]
+        + "||" + partes["provincia"]
+    )
+    huella = contenido.map(lambda s: hashlib.sha1(s.encode("utf-8")).hexdigest()[:16])
+
+    out = pd.DataFrame({"CLAVE_BASE": clave_base, "HUELLA": huella}, index=df.index)
+
+    # Duplicados de (IES, programa): ordinal estable ordenando por HUELLA
+    orden = out.sort_values(["CLAVE_BASE", "HUELLA"], kind="mergesort")
+    ordinal = orden.groupby("CLAVE_BASE").cumcount()
+    out["CLAVE"] = out["CLAVE_BASE"]
+    dup = ordinal.reindex(out.index) > 0
+    out.loc[dup, "CLAVE"] = (
+        out.loc[dup, "CLAVE_BASE"] + "#" + ordinal.reindex(out.index)[dup].astype(str)
+    )
+    return out[["CLAVE", "HUELLA"]]
+
+
+def cargar_huellas_previas(path: str = HUELLAS_PATH) -> pd.DataFrame | None:
+    """Lee la foto previa de huellas (None si no existe)."""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype=str).fillna("")
+
+
+def guardar_huellas(
+    huellas: pd.DataFrame,
+    path: str = HUELLAS_PATH,
+    contexto: dict | None = None,
+    path_contexto: str = CONTEXTO_PATH,
+) -> None:
+    """
+    Guarda la foto de huellas y, al lado, el contexto de la clasificación
+    (sin contexto se borra el anterior: no debe quedar emparejado con otra foto).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    huellas[["CLAVE", "HUELLA"]].to_csv(path, index=False)
+    if contexto is None:
+        if os.path.exists(path_contexto):
+            os.remove(path_contexto)
+        return
+    with open(path_contexto, "w", encoding="utf-8") as f:
+        json.dump(contexto, f, ensure_ascii=False, indent=1)
+
+
+def cargar_contexto_huellas(path: str = CONTEXTO_PATH) -> dict | None:
+    """Contexto guardado con la foto previa (None si no hay o está ilegible)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def calcular_delta(huellas_nuevas: pd.DataFrame, huellas_previas: pd.DataFrame | None) -> dict:
+    """
+    Compara huellas nuevas contra la foto previa.
+    Si no hay foto previa, todas las filas cuentan como agregadas.
+    """
+    nuevas = dict(zip(huellas_nuevas["CLAVE"], huellas_nuevas["HUELLA"]))
+    previas = (
+        dict(zip(huellas_previas["CLAVE"], huellas_previas["HUELLA"]))
+        if huellas_previas is not None else {}
+    )
+
+    claves_nuevas = set(nuevas)
+    claves_previas = set(previas)
+
+    agregados = sorted(claves_nuevas - claves_previas)
+    eliminados = sorted(claves_previas - claves_nuevas)
+    modificados = sorted(
+        k for k in claves_nuevas & claves_previas if nuevas[k] != previas[k]
+    )
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "con_foto_previa": huellas_previas is not None,
+        "total_filas": len(nuevas),
+        "agregados": agregados,
+        "eliminados": eliminados,
+        "modificados": modificados,
+    }
+
+
+def delta_vacio(delta: dict | None) -> bool:
+    if not delta or not delta.get("con_foto_previa"):
+        return False
+    return not (delta["agregados"] or delta["eliminados"] or delta["modificados"])
+
+
+def guardar_delta(delta: dict, path: str = DELTA_PATH) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(delta, f, ensure_ascii=False, indent=1)
+
+
+def cargar_delta(path: str = DELTA_PATH) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resumen_delta(delta: dict) -> str:
+    return (
+        f"agregados={len(delta['agregados'])}, "
+        f"eliminados={len(delta['eliminados'])}, "
+        f"modificados={len(delta['modificados'])}"
+    )
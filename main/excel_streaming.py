@@ -0,0 +1,359 @@
+# excel_streaming.py
+# Escritura y lectura de Excel en streaming para los archivos grandes
+# (F1_VIGENTE, F1_ACT, titulados del CES).
+#
+# df.to_excel arma TODO el libro en memoria (una celda openpyxl por valor)
+# antes de guardar. Aquí:
+#  - cada columna se convierte UNA vez a valores Python listos para la
+#    celda (NaN -> vacío, numpy -> int/float, Timestamp -> datetime), con su
+#    formato de número decidido por dtype;
+#  - las filas se escriben una a una en un libro write_only, que va
+#    volcando al disco y no guarda las celdas en memoria.
+#
+# El resultado es el mismo libro que df.to_excel(path, index=False):
+# encabezado en negrita con borde, vacíos para NaN, "inf" para infinitos.
+# Cada escritura informa segundos y pico de memoria adicional del proceso
+# (RSS muestreado desde /proc; None donde no existe), y
+# escribir_excel_paralelo escribe archivos independientes en procesos
+# separados.
+#
+# Lectura: para monitoreo y archivos de entrada grandes no hace falta el
+# DataFrame completo. La hoja se recorre con openpyxl en modo read_only
+# (iter_rows values_only, el mismo lector que usa pd.read_excel: iguales
+# textos compartidos, fechas y libros 1904) recortando a las columnas
+# pedidas. leer_columnas ubica la fila de encabezado buscando esas columnas
+# (p. ej. el archivo de titulados del CES, con el encabezado real en la
+# fila 14) y las entrega fila a fila; agregar_excel suma y cuenta por
+# grupos sobre la marcha, sin guardar las filas.
+
+import os
+import math
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+FORMATO_FECHA = "YYYY-MM-DD HH:MM:SS"  # el de pandas.to_excel
+
+_LADO = Side(style="thin")
+_ESTILO_ENCABEZADO = {
+    "font": Font(bold=True),
+    "border": Border(left=_LADO, right=_LADO, top=_LADO, bottom=_LADO),
+    "alignment": Alignment(horizontal="center", vertical="top"),
+}
+
+
+def _valor_objeto(v):
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v
+    if isinstance(v, pd.Timestamp):
+        return None if pd.isna(v) else v.to_pydatetime()
+    if isinstance(v, float):
+        if math.isnan(v):
+            return None
+        return v if math.isfinite(v) else ("inf" if v > 0 else "-inf")
+    if pd.api.types.is_scalar(v) and pd.isna(v):
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+
+def valores_columna(serie: pd.Series) -> tuple:
+    """
+    Convierte una columna a valores para openpyxl según su dtype.
+    Devuelve (valores, formato_numero o None).
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        valores = [None if pd.isna(v) else v.to_pydatetime() for v in serie]
+        return valores, FORMATO_FECHA
+    if pd.api.types.is_bool_dtype(serie) and not serie.hasnans:
+        return serie.astype(bool).tolist(), None
+    if pd.api.types.is_integer_dtype(serie) and not serie.hasnans:
+        return serie.astype("int64").tolist(), None
+    if pd.api.types.is_float_dtype(serie):
+        return [_valor_objeto(float(v)) for v in serie.to_numpy(dtype="float64", na_value=math.nan)], None
+    return [_valor_objeto(v) for v in serie.astype(object)], None
+
+
+def _rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MuestreoMemoria:
+    """
+    Pico de RSS del proceso sobre el valor inicial, muestreado en un hilo
+    (sin el costo de tracemalloc). pico_mb es None si no hay /proc.
+    """
+
+    def __init__(self, intervalo: float = 0.02):
+        self.intervalo = intervalo
+        self.pico_mb = None
+        self._fin = threading.Event()
+
+    def _muestrear(self, inicial: int) -> None:
+        pico = inicial
+        while not self._fin.wait(self.intervalo):
+            pico = max(pico, _rss_bytes() or pico)
+        pico = max(pico, _rss_bytes() or pico)
+        self.pico_mb = round((pico - inicial) / 1024 ** 2, 1)
+
+    def __enter__(self):
+        inicial = _rss_bytes()
+        self._hilo = None
+        if inicial is not None:
+            self._hilo = threading.Thread(target=self._muestrear, args=(inicial,), daemon=True)
+            self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        return False
+
+
+def escribir_excel_streaming(df: pd.DataFrame, path: str, hoja: str = "Sheet1") -> dict:
+    """
+    Escribe df en path (equivalente a df.to_excel(path, index=False)) en
+    modo streaming. Devuelve {"archivo", "filas", "segundos", "pico_mb"}.
+    """
+    t0 = time.perf_counter()
+    with MuestreoMemoria() as memoria:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(hoja)
+
+        encabezado = []
+        for c in df.columns:
+            celda = WriteOnlyCell(ws, value=str(c))
+            celda.font = _ESTILO_ENCABEZADO["font"]
+            celda.border = _ESTILO_ENCABEZADO["border"]
+            celda.alignment = _ESTILO_ENCABEZADO["alignment"]
+            encabezado.append(celda)
+        ws.append(encabezado)
+
+        columnas = []
+        for c in df.columns:
+            valores, formato = valores_columna(df[c])
+            if formato is not None:
+                valores = [_celda_con_formato(ws, v, formato) for v in valores]
+            columnas.append(valores)
+
+        for fila in zip(*columnas):
+            ws.append(fila)
+
+        tmp = path + ".tmp.xlsx"
+        wb.save(tmp)
+        os.replace(tmp, path)
+
+    return {
+        "archivo": path,
+        "filas": len(df),
+        "segundos": round(time.perf_counter() - t0, 3),
+        "pico_mb": memoria.pico_mb,
+    }
+
+
+def _celda_con_formato(ws, valor, formato: str):
+    if valor is None:
+        return None
+    celda = WriteOnlyCell(ws, value=valor)
+    celda.number_format = formato
+    return celda
+
+
+def escribir_excel_paralelo(trabajos, procesos: int | None = None) -> list:
+    """
+    trabajos: [(df, path), ...] de archivos independientes. Cada uno se
+    escribe en su propio proceso. Devuelve las estadísticas en el mismo orden.
+    """
+    trabajos = list(trabajos)
+    if len(trabajos) <= 1 or procesos == 1:
+        return [escribir_excel_streaming(df, path) for df, path in trabajos]
+
+    with ProcessPoolExecutor(max_workers=procesos or len(trabajos)) as pool:
+        futuros = [pool.submit(escribir_excel_streaming, df, path) for df, path in trabajos]
+        return [f.result() for f in futuros]
+
+
+def resumen_escritura(stats: dict) -> str:
+    pico = "n/d" if stats["pico_mb"] is None else f"+{stats['pico_mb']} MB"
+    return (
+        f"{os.path.basename(stats['archivo'])}: {stats['filas']} filas en "
+        f"{stats['segundos']} s (pico de memoria {pico})"
+    )
+
+
+# ----------------------------------------
+# LECTURA EN STREAMING
+# ----------------------------------------
+
+def valor_texto(v):
+    """Valor de celda como lo devuelve pd.read_excel(dtype=str)."""
+    if isinstance(v, str):
+        return v if v != "" else None
+    if pd.isna(v):
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _nombre_columna(v) -> str:
+    return "" if v is None else str(v).strip()
+
+
+def _abrir_libro(path: str, hoja: str | None = None):
+    """
+    (libro, hoja) de openpyxl en modo read_only, como lo abre pd.read_excel
+    (data_only; sin confiar en el <dimension> que escribió otra herramienta).
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0] if hoja is None else wb[hoja]
+    except KeyError:
+        wb.close()
+        raise KeyError(f"No existe la hoja {hoja!r} en {path}")
+    ws.reset_dimensions()
+    return wb, ws
+
+
+def iterar_filas(path: str, hoja: str | None = None):
+    """Filas de la hoja como tuplas de valores (values_only); las ausentes salen vacías."""
+    wb, ws = _abrir_libro(path, hoja)
+    try:
+        for fila in ws.iter_rows(values_only=True):
+            yield tuple(fila)
+    finally:
+        wb.close()
+
+
+def detectar_encabezado(filas, requeridas=(), max_filas: int = 50) -> tuple:
+    """
+    Busca la fila de encabezado: la primera que contiene todas las
+    requeridas o, sin requeridas, la primera no vacía.
+    Devuelve (índice_de_fila, nombres).
+    """
+    requeridas = {_nombre_columna(c) for c in requeridas}
+    for i, fila in enumerate(filas):
+        if i >= max_filas:
+            break
+        nombres = [_nombre_columna(v) for v in fila]
+        if not any(nombres):
+            continue
+        if requeridas <= set(nombres):
+            return i, nombres
+    faltan = ", ".join(sorted(requeridas)) or "(fila no vacía)"
+    raise ValueError(f"No se encontró la fila de encabezado en las primeras {max_filas} filas: {faltan}")
+
+
+def columnas_excel(path: str, hoja: str | None = None) -> list:
+    """Nombres de la primera fila no vacía (lee solo el inicio del libro)."""
+    filas = iterar_filas(path, hoja)
+    try:
+        return detectar_encabezado(filas)[1]
+    finally:
+        filas.close()
+
+
+def leer_columnas(
+    path: str,
+    columnas,
+    hoja: str | None = None,
+    texto: bool = False,
+    max_filas: int = 50,
+    omitir_vacias: bool = True,
+):
+    """
+    Itera tuplas con SOLO las columnas pedidas (en ese orden), resolviendo
+    la fila de encabezado automáticamente. Omite las filas vacías en esas
+    columnas; con omitir_vacias=False entrega todas hasta la última fila
+    con datos, en blanco incluidas (igual que read_excel). texto=True da
+    los valores como pd.read_excel(dtype=str).
+    """
+    columnas = [_nombre_columna(c) for c in columnas]
+    wb, ws = _abrir_libro(path, hoja)
+    try:
+        inicio = ws.iter_rows(max_row=max_filas, values_only=True)
+        fila_encabezado, nombres = detectar_encabezado(inicio, columnas, max_filas)
+        posiciones = [nombres.index(c) for c in columnas]
+
+        if omitir_vacias:
+            # solo el rango de columnas pedido
+            desde = min(posiciones, default=0)
+            hasta = max(posiciones, default=0)
+            filas = ws.iter_rows(min_row=fila_encabezado + 2, min_col=desde + 1, max_col=hasta + 1, values_only=True)
+            posiciones = [p - desde for p in posiciones]
+        else:
+            # la fila completa: hay que saber si está vacía en toda la hoja
+            filas = ws.iter_rows(min_row=fila_encabezado + 2, values_only=True)
+
+        en_blanco = 0
+        for fila in filas:
+            if not omitir_vacias:
+                # read_excel conserva las filas en blanco intermedias y recorta las finales
+                if all(v is None for v in fila):
+                    en_blanco += 1
+                    continue
+                vacia = (None,) * len(posiciones)
+                for _ in range(en_blanco):
+                    yield vacia
+                en_blanco = 0
+            valores = tuple(fila[p] if p < len(fila) else None for p in posiciones)
+            if texto:
+                valores = tuple(valor_texto(v) for v in valores)
+            if omitir_vacias and all(v is None or v == "" for v in valores):
+                continue
+            yield valores
+    finally:
+        wb.close()
+
+
+def numero_celda(v) -> float:
+    """Valor numérico de una celda para sumar (texto no numérico o vacío -> 0)."""
+    if isinstance(v, bool) or v is None:
+        return 0
+    if isinstance(v, (int, float)):
+        return 0 if isinstance(v, float) and math.isnan(v) else v
+    try:
+        n = float(str(v).strip())
+    except ValueError:
+        return 0
+    return 0 if math.isnan(n) else n
+
+
+def agregar_excel(path: str, claves=(), sumas=(), hoja: str | None = None, numero=numero_celda, max_filas: int = 50) -> dict:
+    """
+    Agrupa sobre la marcha por las columnas claves (valores en texto, como
+    dtype=str) y suma las columnas sumas (convertidas con numero).
+    Devuelve {tupla_claves: [filas, suma_1, ...]}; sin claves, la única
+    clave es ().
+    """
+    claves, sumas = list(claves), list(sumas)
+    grupos = {}
+    n = len(claves)
+    for valores in leer_columnas(path, claves + sumas, hoja=hoja, max_filas=max_filas):
+        k = tuple(valor_texto(v) for v in valores[:n])
+        acumulado = grupos.get(k)
+        if acumulado is None:
+            acumulado = grupos[k] = [0] + [0] * len(sumas)
+        acumulado[0] += 1
+        for i, v in enumerate(valores[n:], start=1):
+            acumulado[i] += numero(v)
+    return grupos
+
+
+def sumar_columnas(path: str, columnas, hoja: str | None = None) -> dict:
+    """{columna: suma} de las columnas pedidas, leyendo en streaming."""
+    columnas = list(columnas)
+    total = agregar_excel(path, sumas=columnas, hoja=hoja).get((), [0] + [0] * len(columnas))
+    return dict(zip(columnas, total[1:]))
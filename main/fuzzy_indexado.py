@@ -0,0 +1,202 @@
+# fuzzy_indexado.py
+# Motor de fuzzy matching con índice de n-gramas de caracteres.
+#
+# Reemplaza las llamadas repetidas a difflib.get_close_matches (que recorren
+# TODO el diccionario con SequenceMatcher, una vez por cada corte 0.9 → 0.5
+# y otra más con corte 0.0):
+#
+#   1) Se construye UNA vez un índice invertido n-grama -> claves.
+#   2) Para un lote de textos se calcula en bloque (numpy, bincount) el
+#      coeficiente de Dice de n-gramas contra todas las claves y se toman
+#      los top_k candidatos por texto.
+#   3) Esos candidatos se puntúan con SequenceMatcher.ratio() (la misma
+#      medida de difflib) y después solo se revisan las claves cuya cota
+#      superior (quick_ratio, también vectorizada) todavía puede ganar.
+#      Así el mejor candidato y su score coinciden EXACTAMENTE con
+#      get_close_matches(..., n=1, cutoff=0.0).
+#
+# Con el score del mejor candidato se reproduce la cascada de cortes:
+# get_close_matches con cortes [0.9, 0.8, ..., 0.5] devuelve el mejor
+# candidato global en el primer corte <= score; el pase "forzado" con
+# corte 0.0 devuelve ese mismo candidato.
+
+from difflib import SequenceMatcher
+
+import numpy as np
+
+CORTES_FUZZY = (0.9, 0.8, 0.7, 0.6, 0.5)
+
+
+def _ngramas(texto: str, n: int) -> set:
+    s = f" {texto} "
+    if len(s) < n:
+        return {s}
+    return {s[i:i + n] for i in range(len(s) - n + 1)}
+
+
+def construir_indice_ngramas(claves, n: int = 3) -> dict:
+    """
+    Índice de las claves del diccionario:
+      - invertido (formato CSR) de n-gramas de caracteres:
+        postings[indptr[g]:indptr[g+1]] = ids de claves con el n-grama g
+      - conteo de caracteres por clave (cota superior quick_ratio de difflib)
+    """
+    claves = list(claves)
+    vocab = {}
+    alfabeto = {}
+    filas_g, filas_k = [], []
+    n_grams = np.zeros(len(claves), dtype=np.int32)
+
+    for k, clave in enumerate(claves):
+        grams = _ngramas(clave, n)
+        n_grams[k] = len(grams)
+        for g in grams:
+            gid = vocab.setdefault(g, len(vocab))
+            filas_g.append(gid)
+            filas_k.append(k)
+        for ch in clave:
+            alfabeto.setdefault(ch, len(alfabeto))
+
+    filas_g = np.asarray(filas_g, dtype=np.int64)
+    filas_k = np.asarray(filas_k, dtype=np.int64)
+    orden = np.argsort(filas_g, kind="stable")
+    postings = filas_k[orden]
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.add.at(indptr, filas_g + 1, 1)
+    indptr = np.cumsum(indptr)
+
+    chars = np.zeros((len(claves), max(1, len(alfabeto))), dtype=np.int16)
+    for k, clave in enumerate(claves):
+        for ch in clave:
+            chars[k, alfabeto[ch]] += 1
+
+    return {
+        "n": n,
+        "claves": claves,
+        "vocab": vocab,
+        "indptr": indptr,
+        "postings": postings,
+        "n_grams": n_grams,
+        "alfabeto": alfabeto,
+        "chars": chars,
+        "largos": np.array([len(c) for c in claves], dtype=np.int64),
+    }
+
+
+def _mejor_exacto(sm: SequenceMatcher, claves, orden_inicial, cota) -> tuple:
+    """
+    Mejor candidato por SequenceMatcher.ratio() (empates como get_close_matches:
+    mayor (score, clave)). Primero evalúa orden_inicial (los más parecidos por
+    n-gramas) y luego solo las claves cuya cota quick_ratio aún puede ganar.
+    """
+    mejor = (-1.0, "")
+    vistos = set()
+    for k in orden_inicial:
+        vistos.add(k)
+        sm.set_seq1(claves[k])
+        r = sm.ratio()
+        if (r, claves[k]) > mejor:
+            mejor = (r, claves[k])
+
+    for k in np.argsort(-cota, kind="stable"):
+        if cota[k] < mejor[0] - 1e-12:
+            break
+        if k in vistos:
+            continue
+        sm.set_seq1(claves[k])
+        r = sm.ratio()
+        if (r, claves[k]) > mejor:
+            mejor = (r, claves[k])
+    return mejor[1], mejor[0]
+
+
+def mejores_coincidencias(indice: dict, textos, top_k: int = 20, max_celdas: int = 20_000_000) -> list:
+    """
+    Para cada texto devuelve (clave_mas_parecida, score) con
+    score = SequenceMatcher(None, clave, texto).ratio(), exactamente el
+    candidato que devolvería difflib.get_close_matches(texto, claves, n=1).
+    Textos vacíos (o diccionario vacío) -> (None, 0.0).
+    """
+    claves = indice["claves"]
+    n_claves = len(claves)
+    textos = list(textos)
+    resultado = [(None, 0.0)] * len(textos)
+    if n_claves == 0:
+        return resultado
+
+    vocab = indice["vocab"]
+    indptr = indice["indptr"]
+    postings = indice["postings"]
+    n_grams_k = indice["n_grams"]
+    alfabeto = indice["alfabeto"]
+    chars_k = indice["chars"]
+    largos_k = indice["largos"]
+    k_eff = min(top_k, n_claves)
+
+    validos = [i for i, t in enumerate(textos) if t]
+    lote = max(1, max_celdas // (n_claves * chars_k.shape[1]))
+
+    for ini in range(0, len(validos), lote):
+        ids = validos[ini:ini + lote]
+        filas, cols = [], []
+        n_grams_q = np.zeros(len(ids), dtype=np.int32)
+        chars_q = np.zeros((len(ids), chars_k.shape[1]), dtype=np.int16)
+        for fila, i in enumerate(ids):
+            grams = _ngramas(textos[i], indice["n"])
+            n_grams_q[fila] = len(grams)
+            for g in grams:
+                gid = vocab.get(g)
+                if gid is None:
+                    continue
+                p = postings[indptr[gid]:indptr[gid + 1]]
+                cols.append(p)
+                filas.append(np.full(len(p), fila, dtype=np.int64))
+            for ch in textos[i]:
+                a = alfabeto.get(ch)
+                if a is not None:
+                    chars_q[fila, a] += 1
+
+        # Dice de n-gramas texto x clave para todo el lote (orden de evaluación)
+        if cols:
+            plano = np.concatenate(filas) * n_claves + np.concatenate(cols)
+            comunes = np.bincount(plano, minlength=len(ids) * n_claves).reshape(len(ids), n_claves)
+        else:
+            comunes = np.zeros((len(ids), n_claves), dtype=np.int64)
+        dice = 2.0 * comunes / (n_grams_q[:, None] + n_grams_k[None, :])
+        top = np.argpartition(-dice, k_eff - 1, axis=1)[:, :k_eff]
+
+        # Cota superior de ratio() (quick_ratio de difflib) para todo el lote
+        inter = np.minimum(chars_q[:, None, :], chars_k[None, :, :]).sum(axis=2)
+        largos_q = np.array([len(textos[i]) for i in ids], dtype=np.int64)
+        cota = 2.0 * inter / (largos_q[:, None] + largos_k[None, :])
+
+        sm = SequenceMatcher()
+        for fila, i in enumerate(ids):
+            sm.set_seq2(textos[i])
+            resultado[i] = _mejor_exacto(sm, claves, top[fila], cota[fila])
+
+    return resultado
+
+
+def nivel_corte(score: float, cortes=CORTES_FUZZY):
+    """Primer corte de la cascada que acepta el score (None si ninguno)."""
+    for c in cortes:
+        if score >= c:
+            return c
+    return None
+
+
+def cotas_quick_ratio(indice: dict, texto: str) -> np.ndarray:
+    """
+    Cota superior de SequenceMatcher.ratio() entre texto y cada clave del
+    índice (el quick_ratio de difflib, simétrico), vectorizada.
+    """
+    alfabeto = indice["alfabeto"]
+    chars_q = np.zeros(indice["chars"].shape[1], dtype=np.int16)
+    for ch in texto:
+        a = alfabeto.get(ch)
+        if a is not None:
+            chars_q[a] += 1
+    inter = np.minimum(indice["chars"], chars_q[None, :]).sum(axis=1)
+    total = len(texto) + indice["largos"]
+    return np.where(total > 0, 2.0 * inter / np.maximum(total, 1), 1.0)
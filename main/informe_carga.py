@@ -0,0 +1,123 @@
+# informe_carga.py
+# Informe por fases de load_base(): tiempo, filas y memoria de cada paso.
+#
+# load_base() solo dejaba en el log las filas finales de cada dataset; con F1
+# creciendo hace falta saber qué pasada de normalización pesa. Cada fase
+# registra:
+#
+#   - segundos de pared
+#   - filas procesadas
+#   - bytes del resultado con memory_usage(deep=True): del frame completo o
+#     solo de las columnas que la pasada agregó
+#   - pico de tracemalloc dentro de la fase, si CEDEPRO_CARGA_TRACEMALLOC=1
+#     (apagado por defecto: tracemalloc hace más lenta la carga)
+#
+# app.py guarda el informe junto con los datos cargados (INFORME_CARGA) y lo
+# expone en /api/admin/carga. bench_app.py lo adjunta a sus mediciones.
+
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+TRACEMALLOC = os.environ.get("CEDEPRO_CARGA_TRACEMALLOC", "0") == "1"
+
+
+def _mb(n) -> float | None:
+    return None if n is None else round(n / 1024 / 1024, 3)
+
+
+class Fase:
+    """Una entrada del informe; la vista llama resultado() con lo que produjo."""
+
+    def __init__(self, dataset: str, nombre: str):
+        self.dataset = dataset
+        self.nombre = nombre
+        self.segundos = None
+        self.filas = None
+        self.memoria_bytes = None
+        self.tracemalloc_pico = None
+        self.error = None
+
+    def resultado(self, df=None, columnas=None, filas=None) -> None:
+        """Filas y memoria profunda del frame (o solo de `columnas`, las que agregó la pasada)."""
+        if df is not None:
+            self.filas = len(df)
+            parte = df[columnas] if columnas else df
+            self.memoria_bytes = int(parte.memory_usage(index=columnas is None, deep=True).sum())
+        if filas is not None:
+            self.filas = int(filas)
+
+    def como_dict(self) -> dict:
+        return {
+            "dataset": self.dataset,
+            "fase": self.nombre,
+            "segundos": None if self.segundos is None else round(self.segundos, 4),
+            "filas": self.filas,
+            "memoria_mb": _mb(self.memoria_bytes),
+            "tracemalloc_pico_mb": _mb(self.tracemalloc_pico),
+            "error": self.error,
+        }
+
+
+class InformeCarga:
+    def __init__(self, tracemalloc_activo: bool = TRACEMALLOC):
+        self.inicio = datetime.now()
+        self.fases = []
+        self.extra = {}
+        self.tracemalloc = tracemalloc_activo
+        self._propio = False
+        self._t0 = time.perf_counter()
+        self.segundos = None
+        if self.tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._propio = True
+
+    @contextmanager
+    def fase(self, dataset: str, nombre: str):
+        f = Fase(dataset, nombre)
+        self.fases.append(f)
+        if self.tracemalloc:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield f
+        except Exception as e:
+            f.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            f.segundos = time.perf_counter() - t0
+            if self.tracemalloc:
+                f.tracemalloc_pico = max(0, tracemalloc.get_traced_memory()[1] - base)
+
+    def cerrar(self, **extra) -> dict:
+        """Termina el informe (y tracemalloc si lo inició) y lo devuelve como dict."""
+        self.segundos = time.perf_counter() - self._t0
+        if self._propio:
+            tracemalloc.stop()
+        self.extra.update(extra)
+        return self.como_dict()
+
+    def como_dict(self) -> dict:
+        fases = [f.como_dict() for f in self.fases]
+        por_dataset = {}
+        for f in fases:
+            d = por_dataset.setdefault(f["dataset"], {"segundos": 0.0, "fases": 0})
+            d["segundos"] = round(d["segundos"] + (f["segundos"] or 0), 4)
+            d["fases"] += 1
+        return {
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "segundos": None if self.segundos is None else round(self.segundos, 4),
+            "tracemalloc": self.tracemalloc,
+            "pid": os.getpid(),
+            "por_dataset": por_dataset,
+            "fases": fases,
+            **self.extra,
+        }
+
+
+def fases_mas_lentas(informe: dict, n: int = 5) -> list:
+    fases = [f for f in informe.get("fases", []) if f["segundos"] is not None]
+    return sorted(fases, key=lambda f: f["segundos"], reverse=True)[:n]
@@ -16,7 +16,9 @@ Se agregan variables a nivel IES:
 import pandas as pd
 import unicodedata
 import os
-import shutil
+
+from excel_streaming import agregar_excel, escribir_excel_streaming, numero_celda, resumen_escritura
+from snapshots import resumen_snapshot, tomar_snapshot
 
 # ----------------------------------------
 # RUTAS
@@ -130,27 +132,40 @@ if not os.path.exists(TITULOS_PATH):
 
 print(f"📂 Leyendo archivo de titulados desde: {TITULOS_PATH}")
 
-# CES suele tener encabezado real en la fila 13 (index 12)
-raw_tit = pd.read_excel(TITULOS_PATH, header=12, dtype=str)
-
-# La primera fila de raw_tit suele tener los verdaderos nombres de columnas
-header = raw_tit.iloc[0].tolist()
-tit = raw_tit[1:].copy()
-tit.columns = header
-
-# Quitar fila de TOTAL GENERAL si aparece
-if "AÑO ACTA GRADO" in tit.columns:
-    tit = tit[tit["AÑO ACTA GRADO"] != "TOTAL GENERAL"]
-
 required_cols = [
     "COD UNIVERSIDAD",
     "NRO. TITULOS REGISTRADOS",
     "AÑO ACTA GRADO",
     "AÑO REGISTRO",
 ]
-for c in required_cols:
-    if c not in tit.columns:
-        raise ValueError(f"No se encontró la columna '{c}' en el archivo de titulados.")
+
+# CES suele tener el encabezado real en la fila 14, bajo un bloque de
+# títulos: se ubica buscando las columnas requeridas. El libro se recorre
+# en streaming y se suman los títulos por (universidad, año acta, año
+# registro) sin cargar las filas; el corte de 10 años y el agregado por IES
+# se hacen después sobre esos grupos.
+def titulos_entero(v):
+    # igual que to_numeric(errors="coerce").fillna(0).astype(int) por fila
+    return int(numero_celda(v))
+
+try:
+    grupos_tit = agregar_excel(
+        TITULOS_PATH,
+        claves=["COD UNIVERSIDAD", "AÑO ACTA GRADO", "AÑO REGISTRO"],
+        sumas=["NRO. TITULOS REGISTRADOS"],
+        numero=titulos_entero,
+    )
+except ValueError as e:
+    raise ValueError(f"No se encontraron las columnas {required_cols} en el archivo de titulados. {e}")
+
+tit = pd.DataFrame(
+    [(*k, v[0], v[1]) for k, v in grupos_tit.items()],
+    columns=["COD UNIVERSIDAD", "AÑO ACTA GRADO", "AÑO REGISTRO", "FILAS", "NRO_TITULOS"],
+)
+print(f"✅ Filas de titulados leídas: {int(tit['FILAS'].sum())} ({len(tit)} grupos universidad/año)")
+
+# Quitar fila de TOTAL GENERAL si aparece
+tit = tit[tit["AÑO ACTA GRADO"] != "TOTAL GENERAL"].copy()
 
 # Clave limpia en titulados (solo código universidad)
 tit["COD_UNI_CLEAN"] = tit["COD UNIVERSIDAD"].map(clean_code)
@@ -174,13 +189,6 @@ if tit["ANIO_REF"].notna().any():
 else:
     print("⚠ No se pudo determinar ANIO_REF; se usan todos los registros sin filtrar por año.")
 
-# NRO. TITULOS REGISTRADOS -> numérico
-tit["NRO_TITULOS"] = (
-    pd.to_numeric(tit["NRO. TITULOS REGISTRADOS"], errors="coerce")
-    .fillna(0)
-    .astype(int)
-)
-
 # ----------------------------------------
 # 3) AGREGAR TITULADOS Y AÑOS A NIVEL IES (COD_UNI_CLEAN)
 # ----------------------------------------
@@ -253,11 +261,13 @@ print(f"📊 Filas con NRO_TITULOS_10Y > 0: {total_con_titulos} de {len(base_mer
 # 5) GUARDAR RESULTADO CON BACKUP
 # ----------------------------------------
 
-backup_path = BASE_ACT_PATH.replace(".xlsx", "_backup_before_titles.xlsx")
-print(f"💾 Haciendo backup de la base original en: {backup_path}")
-shutil.copy2(BASE_ACT_PATH, backup_path)
+# Snapshot por contenido (snapshots.py) en lugar de una copia completa:
+#   python snapshots.py restaurar f1_act   (o el id de la versión)
+version = tomar_snapshot(BASE_ACT_PATH, "f1_act", etiqueta="antes de integrar titulos")
+print(f"💾 Backup de la base original: {resumen_snapshot(version)}")
 
 print("💾 Guardando base ACT actualizada (con NRO_TITULOS_10Y + años a nivel IES)...")
-base_merged.to_excel(BASE_ACT_PATH, index=False)
+stats = escribir_excel_streaming(base_merged, BASE_ACT_PATH)
+print(f"   {resumen_escritura(stats)}")
 
 print("✅ Proceso terminado. La base ACT ahora tiene NRO_TITULOS_10Y y columnas de años a nivel de IES.")
@@ -0,0 +1,136 @@
+# kernel_agregacion.py
+# Sumas agrupadas con numpy para los filtros de la API (provincia/año/nivel/campo).
+#
+# Cada endpoint de matrículas armaba máscaras booleanas sobre df_mat y hacía
+# groupby(...).sum(): el costo fijo de pandas se paga en cada request aunque
+# el resultado tenga 20 filas. Aquí, una vez por carga:
+#
+#   - cada dimensión se factoriza a códigos int32 contiguos (categorías
+#     ordenadas, como las claves de groupby) más un dict valor -> código;
+#   - los valores (TOTAL_MATRICULADOS, TITULADOS_TOTALES) quedan como
+#     buffers float64 contiguos;
+#   - las filas se ordenan por una dimensión (PROV_KEY): filtrar por
+#     provincia es tomar un tramo [inicio, fin) sin recorrer todo.
+#
+# Una consulta compone máscaras (códigos == código) solo dentro del tramo y
+# agrupa con np.bincount; agrupar por la dimensión de orden sin más filtros
+# sale directo con np.add.reduceat. Un valor de filtro que no existe da un
+# resultado vacío (igual que la máscara de pandas).
+#
+# El índice es inmutable: load_base arma uno nuevo y reemplaza la referencia.
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class Seleccion(NamedTuple):
+    inicio: int
+    fin: int
+    mascara: np.ndarray | None   # sobre el tramo [inicio, fin); None = todo el tramo
+    vacia: bool
+
+
+class IndiceAgregacion:
+    """Códigos de dimensiones + buffers de valores de un DataFrame, para sumar por grupos."""
+
+    def __init__(self, df: pd.DataFrame, dimensiones: list, valores: list, orden: str | None = None):
+        self.n = len(df)
+        self.orden = orden
+        if orden is not None:
+            codigos_orden, _ = pd.factorize(df[orden], sort=True)
+            perm = np.argsort(codigos_orden, kind="stable")
+        else:
+            perm = np.arange(self.n)
+
+        self.codigos = {}
+        self.categorias = {}
+        self.posicion = {}
+        self.con_nulos = {}
+        for dim in dimensiones:
+            codigos, categorias = pd.factorize(df[dim].to_numpy()[perm], sort=True)
+            self.codigos[dim] = np.ascontiguousarray(codigos, dtype=np.int32)
+            self.categorias[dim] = np.asarray(categorias, dtype=object)
+            self.posicion[dim] = {v: i for i, v in enumerate(self.categorias[dim])}
+            self.con_nulos[dim] = bool((codigos < 0).any())
+
+        self.valores = {}
+        self.enteros = {}
+        for v in valores:
+            col = pd.to_numeric(df[v], errors="coerce")
+            self.enteros[v] = pd.api.types.is_integer_dtype(col.dtype)
+            self.valores[v] = np.ascontiguousarray(col.to_numpy(dtype=np.float64, na_value=0.0)[perm])
+
+        # tramos de la dimensión de orden: filas [limites[c], limites[c + 1]);
+        # los nulos (código -1) quedan antes del primer tramo
+        if orden is not None:
+            k = len(self.categorias[orden])
+            self.limites = np.searchsorted(self.codigos[orden], np.arange(k + 1)).astype(np.int64)
+        else:
+            self.limites = None
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.codigos.values()) + sum(a.nbytes for a in self.valores.values())
+
+    def codigo(self, dim: str, valor):
+        return self.posicion[dim].get(valor)
+
+    def seleccionar(self, **filtros) -> Seleccion:
+        """Filtros dimensión=valor (None = sin filtro) -> tramo + máscara."""
+        inicio, fin = 0, self.n
+        filtros = {d: v for d, v in filtros.items() if v is not None}
+
+        if self.orden is not None and self.orden in filtros:
+            c = self.codigo(self.orden, filtros.pop(self.orden))
+            if c is None:
+                return Seleccion(0, 0, None, True)
+            inicio, fin = int(self.limites[c]), int(self.limites[c + 1])
+
+        mascara = None
+        for dim, valor in filtros.items():
+            c = self.codigo(dim, valor)
+            if c is None:
+                return Seleccion(0, 0, None, True)
+            m = self.codigos[dim][inicio:fin] == c
+            if mascara is None:
+                mascara = m
+            else:
+                mascara &= m
+        vacia = fin <= inicio or (mascara is not None and not mascara.any())
+        return Seleccion(inicio, fin, mascara, vacia)
+
+    def _tramo(self, arr: np.ndarray, sel: Seleccion) -> np.ndarray:
+        parte = arr[sel.inicio:sel.fin]
+        return parte if sel.mascara is None else parte[sel.mascara]
+
+    def _salida(self, valor: str, sumas: np.ndarray) -> np.ndarray:
+        return np.rint(sumas).astype(np.int64) if self.enteros[valor] else sumas
+
+    def sumar_por(self, dim: str, valor: str, sel: Seleccion):
+        """(claves, sumas) de los grupos presentes en la selección, claves ordenadas."""
+        if sel.vacia:
+            return self.categorias[dim][:0], self._salida(valor, np.zeros(0))
+        k = len(self.categorias[dim])
+
+        if dim == self.orden and sel.mascara is None and sel.inicio == 0 and sel.fin == self.n:
+            # por la dimensión de orden: cada grupo es un tramo contiguo
+            inicios = self.limites[:-1]
+            presentes = np.flatnonzero(self.limites[1:] > inicios)
+            sumas = np.add.reduceat(self.valores[valor], inicios[presentes]) if len(presentes) else np.zeros(0)
+            return self.categorias[dim][presentes], self._salida(valor, sumas)
+
+        codigos = self._tramo(self.codigos[dim], sel)
+        pesos = self._tramo(self.valores[valor], sel)
+        if self.con_nulos[dim]:
+            validos = codigos >= 0
+            codigos, pesos = codigos[validos], pesos[validos]
+        sumas = np.bincount(codigos, weights=pesos, minlength=k)
+        presentes = np.flatnonzero(np.bincount(codigos, minlength=k))
+        return self.categorias[dim][presentes], self._salida(valor, sumas[presentes])
+
+    def total(self, valor: str, sel: Seleccion):
+        if sel.vacia:
+            return 0
+        s = float(self._tramo(self.valores[valor], sel).sum())
+        return int(round(s)) if self.enteros[valor] else s
@@ -0,0 +1,677 @@
+# motor_pipeline.py
+# Motor del pipeline CEDEPRO.
+#
+# Antes cada paso era un subprocess que volvía a leer los Excel que el paso
+# anterior acababa de escribir (F1_ACT se parseaba 3 veces por corrida).
+# Aquí los pasos se importan como funciones y comparten un contexto:
+#
+#   ctx = {"frames": {nombre: DataFrame}, "texto": {...}, "tiempos": [...]}
+#
+#  - Cada entrada (F1_ACT, F1 original, CES_RAW, CES_CLASIFICADA) se lee
+#    como mucho UNA vez; si un paso la produjo, se usa el DataFrame en memoria.
+#  - Solo se escriben los artefactos finales. Los intermedios (RAW,
+#    CLASIFICADA, ...) van en formato columnar (artefactos.py); Excel solo
+#    para lo publicado (VIGENTE, COMPARACION) o con --excel.
+#  - Se mide cada lectura y cada paso (perf_counter) y se imprime un resumen.
+#
+# Memoización: cada paso declara sus entradas, salidas y los módulos con su
+# código. En data/PIPELINE_MANIFIESTO.json se guarda, por paso, el hash de
+# contenido de entradas, código y salidas de su última corrida exitosa; si
+# nada cambió (y las salidas siguen intactas) el paso se omite.
+#
+# Cada salida de un paso que corrió queda además como snapshot por contenido
+# (snapshots.py; CEDEPRO_SNAPSHOTS=0 lo desactiva) para poder restaurarla.
+#
+# Planificación: las dependencias entre pasos se deducen de entradas y
+# salidas, y los pasos listos corren a la vez en un pool de procesos (los
+# DataFrames ya cargados viajan al proceso que los necesita y vuelven los
+# que éste produjo). El reporte final muestra la ruta crítica: con
+# suficientes procesos el tiempo total se acerca a esa cadena y no a la
+# suma de todos los pasos.
+#
+#   python motor_pipeline.py [--plan] [--force] [--completo] [--procesos N] [--excel]
+#
+# Los scripts de siempre (update_oferta_selenium.py, clasificar_oferta_nueva.py,
+# construir_f1_vigente.py, comprar_bases.py) siguen funcionando por consola.
+
+import os
+import sys
+import json
+import time
+import runpy
+import hashlib
+import zipfile
+import argparse
+import traceback
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+from artefactos import VARIABLE_EXCEL, como_texto, existe_tabla, leer_tabla, ruta_existente
+from snapshots import resumen_snapshot, snapshots_activos, tomar_snapshot
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = "data"
+MANIFIESTO_PATH = os.path.join(DATA_DIR, "PIPELINE_MANIFIESTO.json")
+
+ARTEFACTOS = {
+    "f1_act": os.path.join(DATA_DIR, "OFERTA_ACAD_CEDEPRO_F_1_MATRICULADOS_ACT.xlsx"),
+    "f1_original": os.path.join(DATA_DIR, "OFERTA_ACAD_CEDEPRO_F_1_MATRICULADOS.xlsx"),
+    "diccionario_maestro": os.path.join(DATA_DIR, "DICCIONARIO_MAESTRO.xlsx"),
+    "ces_raw": os.path.join(DATA_DIR, "OFERTA_ACAD_CES_RAW.xlsx"),
+    "ces_clasificada": os.path.join(DATA_DIR, "OFERTA_ACAD_CES_CLASIFICADA.xlsx"),
+    "f1_vigente": os.path.join(DATA_DIR, "OFERTA_ACAD_CEDEPRO_F_1_VIGENTE.xlsx"),
+    "comparacion": os.path.join(DATA_DIR, "COMPARACION_PROGRAMAS.xlsx"),
+    "titulos_10y": os.path.join(DATA_DIR, "2025-10-07_Nro_titulos_10y.xlsx"),
+    "solo_en_ces": os.path.join(DATA_DIR, "PROGRAMAS_SOLO_EN_CES.xlsx"),
+}
+
+
+# ─────────────────────────────
+#  Contexto compartido entre pasos
+# ─────────────────────────────
+
+def nuevo_contexto() -> dict:
+    return {"frames": {}, "texto": {}, "tiempos": []}
+
+
+def medir(ctx: dict, etiqueta: str, funcion, *args, **kwargs):
+    """Ejecuta funcion(*args) y registra su duración en ctx["tiempos"]."""
+    t0 = time.perf_counter()
+    try:
+        return funcion(*args, **kwargs)
+    finally:
+        ctx["tiempos"].append((etiqueta, time.perf_counter() - t0))
+
+
+def obtener(ctx: dict, nombre: str, texto: bool = False) -> pd.DataFrame:
+    """
+    DataFrame de una entrada: el que dejó un paso anterior o, si no hay,
+    el archivo leído una sola vez. Con texto=True devuelve la versión dtype=str
+    (también se calcula una sola vez).
+    """
+    frames = ctx["frames"]
+    if nombre not in frames:
+        path = ARTEFACTOS[nombre]
+        if not existe_tabla(path):
+            raise FileNotFoundError(f"No se encontró {path}")
+        print(f"Cargando {nombre} desde: {ruta_existente(path)}")
+        frames[nombre] = medir(ctx, f"leer {nombre}", leer_tabla, path)
+
+    if not texto:
+        return frames[nombre]
+    if nombre not in ctx["texto"]:
+        ctx["texto"][nombre] = como_texto(frames[nombre])
+    return ctx["texto"][nombre]
+
+
+def publicar(ctx: dict, nombre: str, df: pd.DataFrame, texto: bool = False) -> None:
+    """
+    Deja el DataFrame producido por un paso para los siguientes. Una versión
+    texto no reemplaza a la tipada: quien pida la tipada la lee del disco,
+    igual que si el paso no hubiera corrido en este proceso.
+    """
+    if texto:
+        ctx["texto"][nombre] = df
+        ctx["frames"].pop(nombre, None)
+    else:
+        ctx["frames"][nombre] = df
+        ctx["texto"].pop(nombre, None)
+
+
+# ─────────────────────────────
+#  Pasos
+# ─────────────────────────────
+
+def paso_descargar_ces(ctx: dict, opciones: dict) -> int:
+    from update_oferta_selenium import descargar_oferta_ces
+
+    ok, out, err, df = descargar_oferta_ces(headless=opciones.get("headless", False))
+    if out:
+        print(out)
+    if not ok:
+        if err:
+            print(err, file=sys.stderr)
+        return 1
+    # El scraper entrega texto; "" equivale a celda vacía (como al releer el Excel)
+    publicar(ctx, "ces_raw", como_texto(df), texto=True)
+    return 0
+
+
+def paso_clasificar(ctx: dict, opciones: dict) -> int:
+    from clasificar_oferta_nueva import clasificar_oferta_df, guardar_clasificacion
+
+    df_clasif, huellas = clasificar_oferta_df(
+        obtener(ctx, "ces_raw", texto=True),
+        obtener(ctx, "f1_act", texto=True),
+        completo=opciones.get("completo", False),
+    )
+    guardar_clasificacion(df_clasif, huellas)
+    publicar(ctx, "ces_clasificada", como_texto(df_clasif), texto=True)
+    return 0
+
+
+def paso_f1_vigente(ctx: dict, opciones: dict) -> int:
+    from construir_f1_vigente import construir_vigente, guardar_vigente
+
+    # CES_CLASIFICADA como texto: la misma tabla si clasificar corrió en este
+    # proceso (publicada como texto) o si se leyó del disco
+    df_vigente = construir_vigente(
+        obtener(ctx, "f1_act"),
+        obtener(ctx, "ces_clasificada", texto=True),
+    )
+    guardar_vigente(df_vigente)
+    publicar(ctx, "f1_vigente", df_vigente)
+    return 0
+
+
+def paso_comparar_bases(ctx: dict, opciones: dict) -> int:
+    from comprar_bases import comparar_programas, guardar_comparacion
+
+    guardar_comparacion(comparar_programas(
+        obtener(ctx, "f1_original", texto=True),
+        obtener(ctx, "ces_raw", texto=True),
+    ))
+    return 0
+
+
+def paso_integrar_titulos(ctx: dict, opciones: dict) -> int:
+    # Script sin main(): se ejecuta tal cual (reescribe F1_ACT en disco)
+    runpy.run_path(os.path.join(BASE_DIR, "integrar_titulos_10y.py"), run_name="__main__")
+    return 0
+
+
+def paso_debug_conteos(ctx: dict, opciones: dict) -> int:
+    from debug_conteos import conteos
+
+    conteos(obtener(ctx, "f1_act", texto=True), obtener(ctx, "ces_raw", texto=True))
+    return 0
+
+
+def paso_debug_conteos_v2(ctx: dict, opciones: dict) -> int:
+    from debug_conteos_v2 import guardar_solo_en_ces, programas_solo_en_ces
+
+    guardar_solo_en_ces(programas_solo_en_ces(
+        obtener(ctx, "f1_act", texto=True),
+        obtener(ctx, "ces_raw", texto=True),
+    ))
+    return 0
+
+
+# Orden de referencia (el de una corrida en serie). Las dependencias se
+# deducen de entradas/salidas (ver dependencias_pasos).
+# "externo": lee una fuente fuera del repo (el sitio del CES), por eso no
+# se memoiza y corre siempre. "opcional": si falta alguna entrada, se omite.
+PASOS = [
+    {
+        "nombre": "descargar_ces",
+        "funcion": paso_descargar_ces,
+        "externo": True,
+        "entradas": [],
+        "salidas": ["ces_raw"],
+        "codigo": ["update_oferta_selenium.py", "delta_ces.py"],
+    },
+    {
+        # Enriquece F1_ACT con titulados a 10 años: la lee y la reescribe,
+        # así que va antes de todo lo que lee F1_ACT
+        "nombre": "integrar_titulos",
+        "funcion": paso_integrar_titulos,
+        "opcional": True,
+        "entradas": ["f1_act", "titulos_10y"],
+        "salidas": ["f1_act"],
+        "codigo": ["integrar_titulos_10y.py", "excel_streaming.py", "snapshots.py"],
+    },
+    {
+        "nombre": "clasificar",
+        "funcion": paso_clasificar,
+        "entradas": ["ces_raw", "f1_act", "diccionario_maestro"],
+        "salidas": ["ces_clasificada"],
+        "codigo": [
+            "clasificar_oferta_nueva.py",
+            "fuzzy_indexado.py",
+            "cache_clasificacion.py",
+            "snapshots.py",
+            "delta_ces.py",
+            "registro_claves.py",
+        ],
+    },
+    {
+        "nombre": "f1_vigente",
+        "funcion": paso_f1_vigente,
+        "entradas": ["ces_clasificada", "f1_act"],
+        "salidas": ["f1_vigente"],
+        "codigo": ["construir_f1_vigente.py", "registro_claves.py", "excel_streaming.py"],
+    },
+    {
+        "nombre": "comparar_bases",
+        "funcion": paso_comparar_bases,
+        "entradas": ["f1_original", "ces_raw"],
+        "salidas": ["comparacion"],
+        "codigo": ["comprar_bases.py", "reconciliacion.py", "registro_claves.py"],
+    },
+    {
+        "nombre": "debug_conteos",
+        "funcion": paso_debug_conteos,
+        "entradas": ["f1_act", "ces_raw"],
+        "salidas": [],
+        "codigo": ["debug_conteos.py", "reconciliacion.py", "registro_claves.py"],
+    },
+    {
+        "nombre": "debug_conteos_v2",
+        "funcion": paso_debug_conteos_v2,
+        "entradas": ["f1_act", "ces_raw"],
+        "salidas": ["solo_en_ces"],
+        "codigo": ["debug_conteos_v2.py", "reconciliacion.py", "registro_claves.py"],
+    },
+]
+
+PASOS_POR_NOMBRE = {p["nombre"]: p for p in PASOS}
+
+
+def dependencias_pasos(pasos) -> dict:
+    """
+    {nombre: set(nombres de los que depende)}. Un paso depende de uno
+    anterior si lee algo que éste escribe, si escribe algo que éste lee
+    o si ambos escriben lo mismo; así el resultado es el de la corrida en serie.
+    """
+    deps = {p["nombre"]: set() for p in pasos}
+    for j, pj in enumerate(pasos):
+        for pi in pasos[:j]:
+            if (
+                set(pi["salidas"]) & set(pj["entradas"])
+                or set(pi["entradas"]) & set(pj["salidas"])
+                or set(pi["salidas"]) & set(pj["salidas"])
+            ):
+                deps[pj["nombre"]].add(pi["nombre"])
+    return deps
+
+
+# ─────────────────────────────
+#  Manifiesto de hashes (memoización)
+# ─────────────────────────────
+
+def hash_contenido(path: str) -> str | None:
+    """
+    Hash del contenido de un artefacto (None si no existe), en la versión
+    que leería leer_tabla (columnar o .xlsx). En los .xlsx se omite
+    docProps/ (fecha de creación), así reescribir el mismo contenido no
+    cambia el hash.
+    """
+    path = ruta_existente(path)
+    if path is None:
+        return None
+    h = hashlib.sha256()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            for info in sorted(z.infolist(), key=lambda i: i.filename):
+                if info.filename.startswith("docProps/"):
+                    continue
+                h.update(info.filename.encode("utf-8"))
+                h.update(z.read(info))
+    else:
+        with open(path, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloque)
+    return h.hexdigest()[:20]
+
+
+def version_codigo(archivos) -> str:
+    """Hash de los módulos que implementan un paso."""
+    h = hashlib.sha256()
+    for nombre in archivos:
+        h.update(nombre.encode("utf-8"))
+        with open(os.path.join(BASE_DIR, nombre), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:20]
+
+
+def cargar_manifiesto(path: str = MANIFIESTO_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Manifiesto del pipeline ilegible ({e}); se ejecutan todos los pasos.")
+        return {}
+
+
+def guardar_manifiesto(manifiesto: dict, path: str = MANIFIESTO_PATH) -> None:
+    """Escritura atómica (tmp + replace)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def firma_paso(paso: dict) -> dict:
+    return {
+        "entradas": {k: hash_contenido(ARTEFACTOS[k]) for k in paso["entradas"]},
+        "codigo": version_codigo(paso["codigo"]),
+    }
+
+
+def decidir_paso(paso: dict, manifiesto: dict, forzar) -> tuple:
+    """
+    Devuelve (ejecutar, motivo, firma). Se omite solo si entradas y código
+    coinciden con la última corrida exitosa y las salidas no se tocaron.
+    """
+    nombre = paso["nombre"]
+    if paso.get("opcional"):
+        faltan = [k for k in paso["entradas"] if not existe_tabla(ARTEFACTOS[k])]
+        if faltan:
+            return False, "falta " + ", ".join(faltan), None
+    if nombre in forzar:
+        return True, "forzado", None
+    if paso.get("externo"):
+        return True, "fuente externa", None
+
+    firma = firma_paso(paso)
+    previo = manifiesto.get(nombre)
+    if previo is None:
+        return True, "sin corrida previa registrada", firma
+    if previo.get("codigo") != firma["codigo"]:
+        return True, "cambió el código", firma
+    cambiadas = [k for k, h in firma["entradas"].items() if previo.get("entradas", {}).get(k) != h]
+    if cambiadas:
+        return True, "cambió " + ", ".join(cambiadas), firma
+    for k, h in previo.get("salidas", {}).items():
+        if hash_contenido(ARTEFACTOS[k]) != h:
+            return True, f"salida {k} ausente o modificada", firma
+    return False, "entradas y código sin cambios", firma
+
+
+def registrar_paso(manifiesto: dict, paso: dict, firma: dict | None) -> None:
+    """Guarda la firma de una corrida exitosa (entradas, código y salidas)."""
+    firma = firma or firma_paso(paso)
+    salidas = {k: hash_contenido(ARTEFACTOS[k]) for k in paso["salidas"]}
+    # Si el paso reescribe una de sus entradas, lo que verá la próxima
+    # corrida es el contenido ya escrito
+    entradas = {k: salidas.get(k, h) for k, h in firma["entradas"].items()}
+    manifiesto[paso["nombre"]] = {
+        "entradas": entradas,
+        "codigo": firma["codigo"],
+        "salidas": salidas,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+    }
+    guardar_manifiesto(manifiesto)
+
+
+def snapshot_salidas(paso: dict) -> None:
+    """
+    Snapshot por contenido (snapshots.py) de lo que escribió el paso, para
+    poder volver a la versión anterior. Un fallo aquí no detiene el pipeline.
+    """
+    for k in paso["salidas"]:
+        path = ruta_existente(ARTEFACTOS[k])
+        if path is None:
+            continue
+        try:
+            version = tomar_snapshot(path, k, etiqueta=f"salida de {paso['nombre']}")
+            print(f"   snapshot {resumen_snapshot(version)}")
+        except OSError as e:
+            print(f"   No se pudo guardar el snapshot de {k}: {e}")
+
+
+def _pasos_forzados(pasos, opciones: dict) -> set:
+    if opciones.get("forzar"):
+        return {p["nombre"] for p in pasos}
+    # --completo reclasifica todo: no tiene sentido omitir la clasificación
+    return {"clasificar"} if opciones.get("completo") else set()
+
+
+def imprimir_plan(pasos=None, opciones: dict | None = None) -> None:
+    """
+    Vista "dry-run": qué pasos se ejecutarían y por qué, sin ejecutar nada.
+    Si una entrada la regenera un paso anterior que se ejecuta, la decisión
+    final depende de si ese contenido cambia.
+    """
+    pasos = pasos if pasos is not None else PASOS
+    forzar = _pasos_forzados(pasos, opciones or {})
+    manifiesto = cargar_manifiesto()
+    regeneradas = {}
+
+    print("\nPlan del pipeline (no se ejecuta nada):")
+    for paso in pasos:
+        nombre = paso["nombre"]
+        pendientes = [k for k in paso["entradas"] if k in regeneradas]
+        ejecutar, motivo, _ = decidir_paso(paso, manifiesto, forzar)
+        if not ejecutar and pendientes:
+            origen = ", ".join(f"{k} ({regeneradas[k]})" for k in pendientes)
+            print(f"   {nombre:<16} DEPENDE   si cambia {origen}")
+            ejecutar = True
+        else:
+            print(f"   {nombre:<16} {'EJECUTAR' if ejecutar else 'OMITIR':<8}  {motivo}")
+        if ejecutar:
+            regeneradas.update({k: nombre for k in paso["salidas"]})
+
+
+def ruta_critica(pasos, deps: dict, duraciones: dict) -> tuple:
+    """
+    Cadena de dependencias más larga (los pasos omitidos duran 0).
+    Devuelve (lista de nombres, segundos).
+    """
+    acumulado, previo = {}, {}
+    for paso in pasos:  # el orden de PASOS ya es topológico
+        nombre = paso["nombre"]
+        antes = max(deps[nombre], key=lambda d: acumulado[d], default=None)
+        acumulado[nombre] = duraciones.get(nombre, 0.0) + (acumulado[antes] if antes else 0.0)
+        previo[nombre] = antes
+    if not acumulado:
+        return [], 0.0
+    fin = max(acumulado, key=acumulado.get)
+    largo = acumulado[fin]
+    cadena = []
+    while fin is not None:
+        cadena.append(fin)
+        fin = previo[fin]
+    return cadena[::-1], largo
+
+
+def imprimir_tiempos(ctx: dict, pasos=None, deps: dict | None = None) -> None:
+    """Tiempos por paso (inicio relativo y duración), lecturas y ruta crítica."""
+    pasos = pasos if pasos is not None else PASOS
+    deps = deps if deps is not None else dependencias_pasos(pasos)
+    corridas = ctx.get("corridas", {})
+    t0 = ctx.get("inicio", 0.0)
+
+    print("\nTiempos por paso:")
+    for paso in pasos:
+        r = corridas.get(paso["nombre"])
+        if r is None:
+            print(f"   {paso['nombre']:<20} no ejecutado")
+        elif r["estado"] == "omitido":
+            print(f"   {paso['nombre']:<20} omitido")
+        else:
+            print(
+                f"   {paso['nombre']:<20} inicio +{r['inicio'] - t0:7.2f} s  "
+                f"dura {r['fin'] - r['inicio']:7.2f} s  {r['estado']}"
+            )
+    for etiqueta, segundos in ctx["tiempos"]:
+        if etiqueta.startswith("leer "):
+            print(f"   {etiqueta:<20} {segundos:8.2f} s")
+
+    duraciones = {
+        n: r["fin"] - r["inicio"] for n, r in corridas.items() if r["estado"] != "omitido"
+    }
+    cadena, largo = ruta_critica(pasos, deps, duraciones)
+    total = ctx.get("fin", t0) - t0
+    print(f"   Suma de pasos: {sum(duraciones.values()):.2f} s | reloj: {total:.2f} s")
+    print(f"   Ruta crítica ({largo:.2f} s): {' -> '.join(cadena)}")
+
+
+def _correr_paso(nombre: str, frames: dict, textos: dict, opciones: dict) -> dict:
+    """
+    Corre un paso con un contexto armado con los DataFrames recibidos (en un
+    proceso del pool o en este mismo). Devuelve rc, tiempos y los DataFrames
+    que cargó o produjo, para pasarlos a los pasos siguientes.
+    """
+    paso = PASOS_POR_NOMBRE[nombre]
+    ctx = {"frames": dict(frames), "texto": dict(textos), "tiempos": []}
+    inicio = time.time()
+    try:
+        rc = paso["funcion"](ctx, opciones)
+    except Exception as e:
+        print(f"Error en el paso {nombre}: {e}", file=sys.stderr)
+        traceback.print_exc()
+        rc = 1
+    fin = time.time()
+
+    cargados = ctx["frames"].keys() | ctx["texto"].keys()
+    nuevos = [k for k in cargados if (k not in frames and k not in textos) or k in paso["salidas"]]
+    return {
+        "nombre": nombre,
+        "rc": rc,
+        "inicio": inicio,
+        "fin": fin,
+        "tiempos": ctx["tiempos"],
+        "frames": {k: ctx["frames"][k] for k in nuevos if k in ctx["frames"]},
+        "texto": {k: ctx["texto"][k] for k in nuevos if k in ctx["texto"]},
+    }
+
+
+def ejecutar_pasos(ctx: dict | None = None, pasos=None, opciones: dict | None = None) -> int:
+    """
+    Ejecuta los pasos como un grafo de dependencias: cada paso listo (sus
+    dependencias terminaron) se lanza en un pool de procesos, salvo los que
+    no tienen cambios según el manifiesto. Ante el primer fallo no se lanza
+    nada más y se espera a que terminen los que ya corrían.
+    opciones: {"headless": bool, "completo": bool, "forzar": bool,
+               "procesos": int (1 = todo en este proceso, en serie)}
+    Devuelve 0 si todo terminó bien, 1 si algún paso falló.
+    """
+    ctx = ctx if ctx is not None else nuevo_contexto()
+    pasos = pasos if pasos is not None else PASOS
+    opciones = opciones or {}
+    forzar = _pasos_forzados(pasos, opciones)
+    manifiesto = cargar_manifiesto()
+    deps = dependencias_pasos(pasos)
+    procesos = opciones.get("procesos") or min(4, os.cpu_count() or 1)
+
+    ctx["corridas"] = {}
+    ctx["inicio"] = time.time()
+    pendientes = [p["nombre"] for p in pasos]
+    terminados = set()
+    en_curso = {}
+    firmas = {}
+    fallo = None
+    pool = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+
+    def recibir(r: dict) -> None:
+        nonlocal fallo
+        nombre = r["nombre"]
+        paso = PASOS_POR_NOMBRE[nombre]
+        ctx["tiempos"].extend(r["tiempos"])
+        ctx["corridas"][nombre] = {
+            "estado": "ok" if r["rc"] == 0 else "falló",
+            "inicio": r["inicio"],
+            "fin": r["fin"],
+        }
+        if r["rc"] != 0:
+            print(f"El paso {nombre} falló. No se lanzan más pasos.")
+            fallo = fallo or nombre
+            return
+
+        # Lo que el paso reescribió deja de valer en memoria
+        for k in paso["salidas"]:
+            ctx["frames"].pop(k, None)
+            ctx["texto"].pop(k, None)
+        ctx["frames"].update(r["frames"])
+        ctx["texto"].update(r["texto"])
+        registrar_paso(manifiesto, paso, firmas.get(nombre))
+        if snapshots_activos():
+            snapshot_salidas(paso)
+        terminados.add(nombre)
+
+    def lanzar_listos() -> bool:
+        """Lanza los pasos listos; devuelve si lanzó alguno (en serie, ya terminaron)."""
+        listos = []
+        while not fallo:
+            nuevos = [n for n in pendientes if deps[n] <= terminados]
+            if not nuevos:
+                break
+            for nombre in nuevos:
+                pendientes.remove(nombre)
+                ejecutar, motivo, firmas[nombre] = decidir_paso(
+                    PASOS_POR_NOMBRE[nombre], manifiesto, forzar
+                )
+                if ejecutar:
+                    listos.append((nombre, motivo))
+                else:
+                    # un paso omitido puede destrabar a otros en esta misma vuelta
+                    print(f"\n-- {nombre}: omitido ({motivo})")
+                    ctx["corridas"][nombre] = {"estado": "omitido"}
+                    terminados.add(nombre)
+
+        # Entradas que comparten varios pasos de esta tanda: se leen una vez aquí
+        usos = Counter(k for n, _ in listos for k in PASOS_POR_NOMBRE[n]["entradas"])
+        for k, veces in usos.items():
+            if veces > 1 and k not in ctx["frames"] and k not in ctx["texto"] and existe_tabla(ARTEFACTOS[k]):
+                obtener(ctx, k)
+
+        for nombre, motivo in listos:
+            paso = PASOS_POR_NOMBRE[nombre]
+            print(f"\n-- Paso: {nombre} ({motivo})")
+            frames = {k: ctx["frames"][k] for k in paso["entradas"] if k in ctx["frames"]}
+            textos = {k: ctx["texto"][k] for k in paso["entradas"] if k in ctx["texto"]}
+            if pool is None:
+                recibir(_correr_paso(nombre, frames, textos, opciones))
+            else:
+                en_curso[pool.submit(_correr_paso, nombre, frames, textos, opciones)] = nombre
+        return bool(listos)
+
+    try:
+        # en serie cada tanda termina dentro de lanzar_listos y puede destrabar otra
+        while lanzar_listos() and pool is None:
+            pass
+        while en_curso:
+            hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for fut in hechos:
+                nombre = en_curso.pop(fut)
+                try:
+                    recibir(fut.result())
+                except Exception as e:  # el proceso murió o el resultado no se pudo traer
+                    print(f"Error en el paso {nombre}: {e}", file=sys.stderr)
+                    fallo = fallo or nombre
+            lanzar_listos()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    ctx["fin"] = time.time()
+    if fallo:
+        print(f"\nEl pipeline se detuvo por el paso {fallo}.")
+    imprimir_tiempos(ctx, pasos, deps)
+    return 1 if fallo else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pipeline CEDEPRO (grafo de pasos con memoización).")
+    parser.add_argument("--plan", action="store_true", help="muestra qué pasos se ejecutarían, sin ejecutar")
+    parser.add_argument("--force", action="store_true", help="ejecuta todos los pasos aunque no haya cambios")
+    parser.add_argument("--completo", action="store_true", help="reclasifica toda la oferta (ignora el delta)")
+    parser.add_argument("--headless", action="store_true", help="Chrome sin ventana")
+    parser.add_argument("--procesos", type=int, default=0, help="procesos en paralelo (1 = en serie)")
+    parser.add_argument("--excel", action="store_true", help="escribe también en Excel los intermedios (revisión)")
+    args = parser.parse_args()
+
+    if args.excel:
+        os.environ[VARIABLE_EXCEL] = "1"  # lo heredan los procesos del pool
+
+    opciones = {
+        "headless": args.headless,
+        "completo": args.completo,
+        "forzar": args.force,
+        "procesos": args.procesos,
+    }
+    if args.plan:
+        imprimir_plan(opciones=opciones)
+        return 0
+    return ejecutar_pasos(opciones=opciones)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
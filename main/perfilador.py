@@ -0,0 +1,179 @@
+# perfilador.py
+# Perfilador estadístico por muestreo para las rutas de app.py (opt-in).
+#
+# Cuando /api/compare u /api/oferta_programas van lentos en producción no se
+# sabe si el tiempo se va en _filtrar_mat, en el groupby, en norm_search o en
+# el JSON. Este módulo muestrea la pila del hilo que atiende cada request
+# perfilado y acumula las pilas por ruta:
+#
+#   - CEDEPRO_PERFILADOR=0.05       fracción de requests a perfilar (0 = apagado)
+#   - CEDEPRO_PERFILADOR_MS=5       intervalo de muestreo en milisegundos
+#   - header X-Cedepro-Perfil: <CEDEPRO_ADMIN_TOKEN> fuerza el perfilado de
+#     ese request aunque la fracción sea 0
+#
+# Un solo hilo muestreador lee sys._current_frames() cada intervalo y solo
+# mientras hay requests perfilados en curso; apagado, el costo por request es
+# una comparación. La salida es "collapsed stacks" (una línea por pila:
+# marco;marco;marco cuenta), la entrada de flamegraph.pl y speedscope.
+#
+# Con gunicorn cada worker acumula sus propias muestras: el endpoint admin
+# muestra las del worker que responde.
+
+import os
+import sys
+import time
+import random
+import threading
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEADER = "X-Cedepro-Perfil"
+PROFUNDIDAD_MAX = 80
+
+
+def _float_env(nombre: str, defecto: float) -> float:
+    try:
+        return float(os.environ.get(nombre, defecto))
+    except ValueError:
+        return defecto
+
+
+def _nombre_marco(code) -> str:
+    archivo = code.co_filename
+    if archivo.startswith(BASE_DIR):
+        modulo = os.path.splitext(os.path.basename(archivo))[0]
+    else:
+        # pandas/core/groupby/groupby.py -> groupby.groupby ; deja ver qué librería
+        partes = archivo.replace("\\", "/").rsplit("/", 2)
+        modulo = ".".join(os.path.splitext(p)[0] for p in partes[-2:])
+    return f"{modulo}:{code.co_name}"
+
+
+def pila_colapsada(frame) -> str:
+    """Pila desde el primer marco de main/ (la vista) hasta el marco actual."""
+    marcos = []
+    while frame is not None and len(marcos) < PROFUNDIDAD_MAX:
+        marcos.append(frame.f_code)
+        frame = frame.f_back
+    marcos.reverse()
+    # se descarta lo de werkzeug/flask antes de entrar al código propio
+    inicio = next((i for i, c in enumerate(marcos) if c.co_filename.startswith(BASE_DIR)), 0)
+    return ";".join(_nombre_marco(c) for c in marcos[inicio:])
+
+
+class Perfilador:
+    """Muestreador de pilas por ruta. Un hilo, activo solo con requests perfilados."""
+
+    def __init__(self, fraccion: float = 0.0, intervalo_ms: float = 5.0):
+        self.fraccion = max(0.0, min(1.0, fraccion))
+        self.intervalo = max(0.001, intervalo_ms / 1000)
+        self.activos = {}          # id de hilo -> ruta
+        self.pilas = {}            # ruta -> Counter(pila -> muestras)
+        self.requests = Counter()  # ruta -> requests perfilados
+        self.segundos = Counter()  # ruta -> tiempo de pared perfilado
+        self._inicio = {}
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Event()
+        self._hilo = None
+
+    # ── decisión por request ──
+
+    def debe_perfilar(self, forzado: bool = False) -> bool:
+        return forzado or (self.fraccion > 0 and random.random() < self.fraccion)
+
+    def iniciar(self, ruta: str) -> None:
+        tid = threading.get_ident()
+        with self._lock:
+            self.activos[tid] = ruta
+            self._inicio[tid] = time.perf_counter()
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._muestrear, name="perfilador", daemon=True)
+                self._hilo.start()
+        self._hay_trabajo.set()
+
+    def terminar(self) -> None:
+        tid = threading.get_ident()
+        with self._lock:
+            ruta = self.activos.pop(tid, None)
+            t0 = self._inicio.pop(tid, None)
+            if ruta is not None:
+                self.requests[ruta] += 1
+                self.segundos[ruta] += time.perf_counter() - t0
+            if not self.activos:
+                self._hay_trabajo.clear()
+
+    # ── hilo muestreador ──
+
+    def _muestrear(self) -> None:
+        propio = threading.get_ident()
+        while True:
+            self._hay_trabajo.wait()
+            with self._lock:
+                activos = dict(self.activos)
+            if activos:
+                frames = sys._current_frames()
+                muestras = [
+                    (ruta, pila_colapsada(frames[tid]))
+                    for tid, ruta in activos.items()
+                    if tid != propio and tid in frames
+                ]
+                del frames
+                with self._lock:
+                    for ruta, pila in muestras:
+                        self.pilas.setdefault(ruta, Counter())[pila] += 1
+            time.sleep(self.intervalo)
+
+    # ── salida ──
+
+    def colapsado(self, ruta: str | None = None) -> str:
+        """Texto collapsed stacks; con todas las rutas, cada pila va prefijada con la ruta."""
+        lineas = []
+        with self._lock:
+            for r, pilas in sorted(self.pilas.items()):
+                if ruta and r != ruta:
+                    continue
+                for pila, n in pilas.most_common():
+                    lineas.append(f"{pila} {n}" if ruta else f"{r};{pila} {n}")
+        return "\n".join(lineas) + ("\n" if lineas else "")
+
+    def resumen(self, top: int = 15) -> dict:
+        """Por ruta: requests, muestras y las funciones con más tiempo propio e inclusivo."""
+        out = {}
+        with self._lock:
+            rutas = sorted(set(self.pilas) | set(self.requests))
+            for r in rutas:
+                pilas = self.pilas.get(r, Counter())
+                total = sum(pilas.values())
+                propio, inclusivo = Counter(), Counter()
+                for pila, n in pilas.items():
+                    marcos = pila.split(";")
+                    propio[marcos[-1]] += n
+                    for m in set(marcos):
+                        inclusivo[m] += n
+                pct = (lambda n: round(100 * n / total, 1)) if total else (lambda n: 0.0)
+                out[r] = {
+                    "requests": self.requests[r],
+                    "segundos": round(self.segundos[r], 3),
+                    "muestras": total,
+                    "propio": [{"marco": m, "pct": pct(n)} for m, n in propio.most_common(top)],
+                    "inclusivo": [{"marco": m, "pct": pct(n)} for m, n in inclusivo.most_common(top)],
+                }
+        return {
+            "fraccion": self.fraccion,
+            "intervalo_ms": round(self.intervalo * 1000, 3),
+            "pid": os.getpid(),
+            "rutas": out,
+        }
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self.pilas.clear()
+            self.requests.clear()
+            self.segundos.clear()
+
+
+PERFILADOR = Perfilador(
+    fraccion=_float_env("CEDEPRO_PERFILADOR", 0.0),
+    intervalo_ms=_float_env("CEDEPRO_PERFILADOR_MS", 5.0),
+)
@@ -1,55 +1,52 @@
 # pipeline_update.py
-# Orquesta la actualización de la oferta CES para CEDEPRO
+# Orquesta la actualización de la oferta CES para CEDEPRO.
+#
+# Los pasos los corre motor_pipeline.py: los que no dependen entre sí van en
+# paralelo en un pool de procesos (por defecto min(4, CPUs); --procesos 1
+# los corre en serie en este mismo proceso).
+#
+# Si está el archivo de títulos (data/2025-10-07_Nro_titulos_10y.xlsx),
+# integrar_titulos reescribe F1_ACT en cada corrida (la lee y la vuelve a
+# escribir con los titulados a 10 años), antes de los pasos que la leen.
 
 import os
-import subprocess
-import shutil
-from datetime import datetime
+import argparse
 import sys
 
-import pandas as pd  # solo para leer totales de F1 original (monitoreo)
+import pandas as pd
+
+from artefactos import VARIABLE_EXCEL, VARIABLE_LEER_EXCEL
+from excel_streaming import columnas_excel, sumar_columnas
+from motor_pipeline import ejecutar_pasos, imprimir_plan, nuevo_contexto
+from snapshots import resumen_snapshot, tomar_snapshot
 
 DATA_DIR = "data"
 F1_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CEDEPRO_F_1_MATRICULADOS.xlsx")
-BACKUP_DIR = os.path.join(DATA_DIR, "backups")
 
 
 def backup_f1() -> None:
-    """Crea un backup timestamp de la F1 original si existe."""
-    if not os.path.exists(F1_PATH):
+    """
+    Snapshot de la F1 original si existe (snapshots.py): solo ocupa espacio
+    si su contenido cambió desde el último.
+    """
+    version = tomar_snapshot(F1_PATH, "f1_original", etiqueta="inicio del pipeline")
+    if version is None:
         print("No existe F1 original, no se crea backup.")
         return
-
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"F1_backup_{ts}.xlsx"
-    backup_path = os.path.join(BACKUP_DIR, backup_name)
-
-    shutil.copy2(F1_PATH, backup_path)
-    print(f"Backup de F1 creado en: {backup_path}")
-
-
-def run_script(path: str) -> int:
-    """Ejecuta un script Python y devuelve su código de salida."""
-    print(f"\nEjecutando: {path}")
-    result = subprocess.run([sys.executable, path], text=True)
-    if result.returncode != 0:
-        print(f"{path} terminó con código {result.returncode}")
-    else:
-        print(f"{path} finalizó correctamente")
-    return result.returncode
+    print(f"Backup de F1: {resumen_snapshot(version)}")
 
 
-def leer_total_matriculados(path: str, label: str):
+def leer_total_matriculados(path: str, label: str, df: pd.DataFrame | None = None):
     """
-    Lee un Excel y devuelve el total de matriculados si encuentra la columna adecuada.
+    Devuelve el total de matriculados si encuentra la columna adecuada.
+    Usa df si ya está cargado; si no, lee del Excel en streaming solo el
+    encabezado y esa columna.
     Solo para monitoreo (no rompe el pipeline si no coincide).
     """
-    if not os.path.exists(path):
+    if df is None and not os.path.exists(path):
         print(f"{label}: archivo no encontrado en {path}")
         return None
-
-    df = pd.read_excel(path)
+    columnas = df.columns if df is not None else columnas_excel(path)
 
     posibles = [
         "MATRICULADOS",
@@ -60,7 +57,7 @@ def leer_total_matriculados(path: str, label: str):
 
     col_encontrada = None
     for c in posibles:
-        if c in df.columns:
+        if c in columnas:
             col_encontrada = c
             break
 
@@ -68,12 +65,15 @@ def leer_total_matriculados(path: str, label: str):
         print(f"{label}: no se encontró columna de matriculados en {path}")
         return None
 
-    total = df[col_encontrada].sum()
+    if df is not None:
+        total = df[col_encontrada].sum()
+    else:
+        total = sumar_columnas(path, [col_encontrada])[col_encontrada]
     print(f"{label}: total de matriculados = {int(total):,} (columna: {col_encontrada})")
     return total
 
 
-def pipeline() -> int:
+def pipeline(forzar: bool = False, procesos: int = 0) -> int:
     print("\n==========================")
     print("PIPELINE CEDEPRO – INICIO")
     print("==========================")
@@ -81,44 +81,24 @@ def pipeline() -> int:
     # 0) Backup de F1 (por seguridad, aunque ya no la modificamos automáticamente)
     backup_f1()
 
-    # (Opcional) total original solo para monitoreo
+    # (Opcional) total original solo para monitoreo: se lee en streaming
+    # solo la columna de matriculados; comparar_bases carga la F1 si corre
+    ctx = nuevo_contexto()
     leer_total_matriculados(F1_PATH, "F1 ORIGINAL")
 
-    # 1) Descargar oferta CES (genera data/OFERTA_ACAD_CES_RAW.xlsx)
-    rc = run_script("update_oferta_selenium.py")
+    # 1) Descargar oferta CES (genera OFERTA_ACAD_CES_RAW, formato columnar)
+    #    Los pasos siguientes se omiten si sus entradas y su código no
+    #    cambiaron desde la última corrida (manifiesto, salvo forzar=True)
+    # 2) Clasificar CES_RAW con CAMPO DETALLADO (OFERTA_ACAD_CES_CLASIFICADA;
+    #    solo filas agregadas/modificadas si hay delta)
+    # 3) Construir F1_VIGENTE con la oferta oficial CES + estáticos de F1_ACT
+    # 4) Comparar bases F1 vs CES_RAW y conteos de depuración (diagnóstico)
+    #    Los pasos independientes corren en paralelo (ver motor_pipeline.py)
+    rc = ejecutar_pasos(ctx, opciones={"headless": False, "forzar": forzar, "procesos": procesos})
     if rc != 0:
-        print("Error en update_oferta_selenium.py. Se detiene el pipeline.")
+        print("Error en el pipeline. Se detiene.")
         return 1
 
-    # 2) Clasificar CES_RAW con CAMPO DETALLADO
-    #    (genera data/OFERTA_ACAD_CES_CLASIFICADA.xlsx)
-    if os.path.exists("clasificar_oferta_nueva.py"):
-        rc = run_script("clasificar_oferta_nueva.py")
-        if rc != 0:
-            print("Error en clasificar_oferta_nueva.py. Se detiene el pipeline.")
-            return 1
-    else:
-        print("No se encontró clasificar_oferta_nueva.py, se omite este paso.")
-
-    # 3) Construir F1_VIGENTE usando solo oferta oficial CES
-    #    y columnas estáticas de F1_ACT (si existe el script)
-    if os.path.exists("construir_f1_vigente.py"):
-        rc = run_script("construir_f1_vigente.py")
-        if rc != 0:
-            print("Error en construir_f1_vigente.py. Se detiene el pipeline.")
-            return 1
-    else:
-        print("No se encontró construir_f1_vigente.py, se omite este paso.")
-
-    # 4) Comparar bases F1_ACT vs CES_RAW (opcional, solo diagnóstico)
-    if os.path.exists("comparar_bases.py"):
-        rc = run_script("comparar_bases.py")
-        if rc != 0:
-            print("Error en comparar_bases.py. Se detiene el pipeline.")
-            return 1
-    else:
-        print("No se encontró comparar_bases.py, se omite este paso.")
-
     print("\n==========================")
     print("PIPELINE COMPLETADO")
     print("==========================")
@@ -126,4 +106,20 @@ def pipeline() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(pipeline())
+    parser = argparse.ArgumentParser(description="Pipeline de actualización CEDEPRO.")
+    parser.add_argument("--force", action="store_true", help="ejecuta todos los pasos aunque no haya cambios")
+    parser.add_argument("--plan", action="store_true", help="muestra qué pasos se ejecutarían, sin ejecutar")
+    parser.add_argument("--procesos", type=int, default=0, help="procesos en paralelo (1 = en serie)")
+    parser.add_argument("--excel", action="store_true", help="escribe también en Excel los intermedios (revisión)")
+    parser.add_argument("--leer-excel", action="store_true", help="lee los intermedios desde su Excel si es más nuevo (corregido a mano)")
+    args = parser.parse_args()
+
+    if args.excel:
+        os.environ[VARIABLE_EXCEL] = "1"
+    if args.leer_excel:
+        os.environ[VARIABLE_LEER_EXCEL] = "1"
+
+    if args.plan:
+        imprimir_plan(opciones={"forzar": args.force})
+        sys.exit(0)
+    sys.exit(pipeline(forzar=args.force, procesos=args.procesos))
@@ -0,0 +1,464 @@
+# prueba_carga.py
+# Prueba de carga local de gunicorn main.app:app con varios usuarios a la vez.
+#
+# Una medición request por request (bench_app.py) no muestra lo que pasa
+# con varios dashboards abiertos: cada página dispara un Promise.all de
+# /api/compare (uno por año) más los badges. Aquí:
+#
+#   - se levanta gunicorn (desde la raíz del repo, como en render.yaml) con
+#     cada configuración workers x threads pedida, sobre datos sintéticos
+#     (datos_sinteticos.py) o los que indiquen las variables CEDEPRO_*;
+#   - N usuarios virtuales repiten escenarios de matriculas.js (carga de
+#     página, clic en provincia, cambio de año o de nivel). Cada paso es una
+#     URL o un grupo que va en paralelo, como un Promise.all (hasta 6
+#     conexiones por usuario, como un navegador);
+#   - se reporta req/s, escenarios/s, p50/p95/p99 por request y por
+#     escenario, tasa de errores, memoria (RSS) de cada worker muestreada
+#     desde /proc y cuántas respuestas fueron HIT / MISS / COALESCED.
+#
+# La mezcla de escenarios puede venir de un JSON grabado (--mezcla), con la
+# misma forma que MEZCLA_MATRICULAS. {anio_i} repite la URL para cada año.
+#
+#   python prueba_carga.py --config 1x4 2x4 4x2 --usuarios 20 --duracion 30
+#   python prueba_carga.py --url http://127.0.0.1:5000 --usuarios 10
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_app import _commit, percentiles, preparar_datos
+from datos_sinteticos import F1_FILENAME, OFERTA_FILENAME, _anios
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
+
+CONEXIONES_POR_USUARIO = 6
+
+# Escenarios de static/matriculas.js. Cada paso: una URL (en serie) o una
+# lista de URLs que van juntas (Promise.all). Los valores salen de
+# provincias_list / matriculas_years / matriculas_levels del servidor.
+MEZCLA_MATRICULAS = {
+    "escenarios": {
+        # initFiltros + buildCampoOptionsHistorico_AZ + loadResumen (histórico, sin campo)
+        "carga_pagina": [
+            "/api/provincias_list",
+            "/api/matriculas_years",
+            "/api/matriculas_levels",
+            ["/api/compare?anio={anio_i}"],
+            "/api/total_oferta_provincia",
+            "/api/total_carreras_provincia",
+        ],
+        # handleProvinceClick en histórico con un campo elegido
+        "clic_provincia": [
+            ["/api/compare?provincia={provincia}&anio={anio_i}"],
+            "/api/total_oferta_provincia?provincia={provincia}",
+            "/api/total_carreras_provincia?provincia={provincia}",
+            ["/api/compare?provincia={provincia}&anio={anio_i}"],
+        ],
+        # anioSelect change a un año puntual
+        "cambio_anio": [
+            "/api/total_oferta_provincia?provincia={provincia}",
+            "/api/total_carreras_provincia?provincia={provincia}",
+            "/api/compare?provincia={provincia}&anio={anio}&nivel={nivel}",
+        ],
+        # nivelSelect change en histórico
+        "cambio_nivel": [
+            ["/api/compare?provincia={provincia}&anio={anio_i}&nivel={nivel}"],
+            "/api/total_oferta_provincia?provincia={provincia}",
+            "/api/total_carreras_provincia?provincia={provincia}",
+            ["/api/compare?provincia={provincia}&anio={anio_i}&nivel={nivel}"],
+        ],
+    },
+    "pesos": {"carga_pagina": 3, "clic_provincia": 4, "cambio_anio": 2, "cambio_nivel": 1},
+}
+
+
+# ─────────────────────────────
+#  Servidor
+# ─────────────────────────────
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(base: str, ruta: str, timeout: float = 5.0):
+    p = urlsplit(base)
+    conn = http.client.HTTPConnection(p.hostname, p.port, timeout=timeout)
+    try:
+        conn.request("GET", ruta)
+        r = conn.getresponse()
+        return r.status, r.read()
+    finally:
+        conn.close()
+
+
+def iniciar_gunicorn(workers: int, threads: int, env_extra: dict, timeout: float = 600, preload: bool = False):
+    """Levanta gunicorn main.app:app y espera a que responda. Devuelve (proceso, url)."""
+    puerto = _puerto_libre()
+    cmd = [
+        sys.executable, "-m", "gunicorn", "main.app:app",
+        "--bind", f"127.0.0.1:{puerto}",
+        "--workers", str(workers),
+        "--threads", str(threads),
+        "--timeout", "300",
+        "--log-level", "warning",
+    ]
+    if preload:
+        cmd.append("--preload")
+    proc = subprocess.Popen(cmd, cwd=ROOT_DIR, env={**os.environ, **env_extra})
+    url = f"http://127.0.0.1:{puerto}"
+
+    # Cada worker corre load_base al importar app: se espera a que todos respondan
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó al iniciar (código {proc.returncode})")
+        try:
+            if _get(url, "/api/matriculas_years")[0] == 200 and len(pids_workers(proc.pid)) >= workers:
+                return proc, url
+        except OSError:
+            pass
+        time.sleep(0.5)
+    detener(proc)
+    raise TimeoutError(f"gunicorn no respondió en {timeout} s")
+
+
+def detener(proc) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def pids_workers(pid_master: int) -> list:
+    """Hijos directos del master (los workers), leídos de /proc. [] si no hay /proc."""
+    hijos = []
+    try:
+        for nombre in os.listdir("/proc"):
+            if not nombre.isdigit():
+                continue
+            try:
+                with open(f"/proc/{nombre}/stat") as f:
+                    campos = f.read().rsplit(")", 1)[1].split()
+                if int(campos[1]) == pid_master:
+                    hijos.append(int(nombre))
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        return []
+    return hijos
+
+
+def rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MonitorMemoria:
+    """Pico de RSS por worker de gunicorn, muestreado en un hilo."""
+
+    def __init__(self, pid_master: int | None, intervalo: float = 0.5):
+        self.pid_master = pid_master
+        self.intervalo = intervalo
+        self.picos = {}
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def _muestrear(self) -> None:
+        while not self._parar.is_set():
+            for pid in pids_workers(self.pid_master):
+                r = rss_mb(pid)
+                if r is not None:
+                    self.picos[pid] = max(self.picos.get(pid, 0.0), r)
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self):
+        if self.pid_master is not None:
+            self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+            self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def resumen(self) -> dict:
+        if not self.picos:
+            return {"workers": 0, "rss_max_worker_mb": None, "rss_total_mb": None}
+        return {
+            "workers": len(self.picos),
+            "rss_max_worker_mb": round(max(self.picos.values()), 1),
+            "rss_total_mb": round(sum(self.picos.values()), 1),
+        }
+
+
+# ─────────────────────────────
+#  Usuarios virtuales
+# ─────────────────────────────
+
+def valores_servidor(url: str) -> dict:
+    """Provincias, años y niveles que ofrece el servidor (para llenar las URLs)."""
+    valores = {}
+    for clave, ruta in (
+        ("provincias", "/api/provincias_list"),
+        ("anios", "/api/matriculas_years"),
+        ("niveles", "/api/matriculas_levels"),
+    ):
+        estado, cuerpo = _get(url, ruta, timeout=60)
+        valores[clave] = json.loads(cuerpo) if estado == 200 else []
+    return valores
+
+
+def expandir(paso, filtros: dict, anios: list) -> list:
+    """URLs de un paso con los filtros del usuario; {anio_i} se repite por año."""
+    plantillas = paso if isinstance(paso, list) else [paso]
+    urls = []
+    for p in plantillas:
+        for anio_i in (anios if "{anio_i}" in p else [None]):
+            u = p.format(anio_i=anio_i, **{k: quote(str(v)) for k, v in filtros.items()})
+            # parámetros vacíos fuera, como hace matriculas.js
+            ruta, _, qs = u.partition("?")
+            partes = [x for x in qs.split("&") if x and not x.endswith("=")]
+            urls.append(ruta + ("?" + "&".join(partes) if partes else ""))
+    return urls
+
+
+class Resultados:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []      # (ruta, ms, ok)
+        self.escenarios = {}    # nombre -> [ms]
+        self.errores = {}       # descripción -> cantidad
+        self.cache = {}         # header X-Cache (HIT / MISS / COALESCED) -> cantidad
+
+    def request(self, ruta: str, ms: float, ok: bool, error: str | None = None, cache: str | None = None) -> None:
+        with self.lock:
+            self.requests.append((ruta, ms, ok))
+            if cache:
+                self.cache[cache] = self.cache.get(cache, 0) + 1
+            if error:
+                self.errores[error] = self.errores.get(error, 0) + 1
+
+    def escenario(self, nombre: str, ms: float) -> None:
+        with self.lock:
+            self.escenarios.setdefault(nombre, []).append(ms)
+
+
+class Usuario:
+    """Un navegador: hasta 6 conexiones keep-alive y escenarios al azar."""
+
+    def __init__(self, url: str, mezcla: dict, valores: dict, resultados: Resultados, semilla: int):
+        p = urlsplit(url)
+        self.host, self.puerto = p.hostname, p.port
+        self.mezcla = mezcla
+        self.valores = valores
+        self.res = resultados
+        self.rng = random.Random(semilla)
+        self.conexiones = [None] * CONEXIONES_POR_USUARIO
+        self.pool = ThreadPoolExecutor(max_workers=CONEXIONES_POR_USUARIO)
+        self.libres = list(range(CONEXIONES_POR_USUARIO))
+        self.lock = threading.Lock()
+
+    def _pedir(self, ruta: str) -> None:
+        with self.lock:
+            i = self.libres.pop()
+        t0 = time.perf_counter()
+        ok, error, cache = False, None, None
+        try:
+            if self.conexiones[i] is None:
+                self.conexiones[i] = http.client.HTTPConnection(self.host, self.puerto, timeout=120)
+            conn = self.conexiones[i]
+            conn.request("GET", ruta)
+            r = conn.getresponse()
+            r.read()
+            cache = r.getheader("X-Cache")
+            ok = r.status < 400
+            if not ok:
+                error = f"HTTP {r.status}"
+        except (OSError, http.client.HTTPException) as e:
+            error = type(e).__name__
+            if self.conexiones[i] is not None:
+                self.conexiones[i].close()
+            self.conexiones[i] = None
+        finally:
+            with self.lock:
+                self.libres.append(i)
+        self.res.request(ruta.split("?", 1)[0], (time.perf_counter() - t0) * 1000, ok, error, cache)
+
+    def _filtros(self) -> dict:
+        v = self.valores
+        return {
+            "provincia": self.rng.choice(v["provincias"]) if v["provincias"] else "",
+            "anio": self.rng.choice(v["anios"]) if v["anios"] else "",
+            "nivel": self.rng.choice([""] + v["niveles"]),
+        }
+
+    def correr(self, hasta: float) -> None:
+        nombres = list(self.mezcla["escenarios"])
+        pesos = [self.mezcla.get("pesos", {}).get(n, 1) for n in nombres]
+        try:
+            while time.monotonic() < hasta:
+                nombre = self.rng.choices(nombres, pesos)[0]
+                filtros = self._filtros()
+                t0 = time.perf_counter()
+                for paso in self.mezcla["escenarios"][nombre]:
+                    urls = expandir(paso, filtros, self.valores["anios"])
+                    if len(urls) == 1:
+                        self._pedir(urls[0])
+                    else:
+                        list(self.pool.map(self._pedir, urls))
+                self.res.escenario(nombre, (time.perf_counter() - t0) * 1000)
+        finally:
+            self.pool.shutdown()
+            for c in self.conexiones:
+                if c is not None:
+                    c.close()
+
+
+def ejecutar_carga(url: str, usuarios: int, duracion: float, mezcla: dict, pid_master: int | None = None) -> dict:
+    valores = valores_servidor(url)
+    res = Resultados()
+    with MonitorMemoria(pid_master) as memoria:
+        t0 = time.monotonic()
+        hasta = t0 + duracion
+        hilos = [
+            threading.Thread(target=Usuario(url, mezcla, valores, res, semilla=i).correr, args=(hasta,))
+            for i in range(usuarios)
+        ]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        segundos = time.monotonic() - t0
+
+    n = len(res.requests)
+    fallidas = sum(1 for _, _, ok in res.requests if not ok)
+    por_ruta = {}
+    for ruta, ms, _ in res.requests:
+        por_ruta.setdefault(ruta, []).append(ms)
+    return {
+        "usuarios": usuarios,
+        "segundos": round(segundos, 2),
+        "requests": n,
+        "req_s": round(n / segundos, 1) if segundos else None,
+        "escenarios_s": round(sum(len(v) for v in res.escenarios.values()) / segundos, 2) if segundos else None,
+        "tasa_error": round(fallidas / n, 4) if n else None,
+        "errores": res.errores,
+        "x_cache": res.cache,
+        "latencia": percentiles([ms for _, ms, _ in res.requests]),
+        "por_ruta": {r: percentiles(v) for r, v in sorted(por_ruta.items())},
+        "por_escenario": {e: percentiles(v) for e, v in sorted(res.escenarios.items())},
+        "memoria": memoria.resumen(),
+    }
+
+
+# ─────────────────────────────
+#  Reporte
+# ─────────────────────────────
+
+def imprimir(r: dict) -> None:
+    lat, mem = r["latencia"], r["memoria"]
+    print(
+        f"  {r['requests']} requests en {r['segundos']} s | {r['req_s']} req/s | "
+        f"{r['escenarios_s']} escenarios/s | errores {r['tasa_error']:.2%}"
+    )
+    if lat.get("n"):
+        print(f"  latencia request: p50 {lat['p50_ms']:.1f} | p95 {lat['p95_ms']:.1f} | p99 {lat['p99_ms']:.1f} ms")
+    for nombre, e in r["por_escenario"].items():
+        print(f"     {nombre:<16} n={e['n']:<5} p50 {e['p50_ms']:9.1f} | p95 {e['p95_ms']:9.1f} | p99 {e['p99_ms']:9.1f} ms")
+    if mem["workers"]:
+        print(f"  memoria: {mem['workers']} workers, máx {mem['rss_max_worker_mb']} MB/worker, total {mem['rss_total_mb']} MB")
+    if r.get("x_cache"):
+        print("  X-Cache: " + " | ".join(f"{k} {v}" for k, v in sorted(r["x_cache"].items())))
+    for error, n in r["errores"].items():
+        print(f"  ⚠ {error}: {n}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de gunicorn main.app:app con escenarios de matriculas.js.")
+    parser.add_argument("--config", nargs="+", default=["1x4", "2x4"], help="workers x threads, p. ej. 2x4 4x1")
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[10], help="usuarios virtuales simultáneos")
+    parser.add_argument("--duracion", type=float, default=30, help="segundos por medición")
+    parser.add_argument("--mezcla", help="JSON con escenarios y pesos (por defecto, los de matriculas.js)")
+    parser.add_argument("--url", help="servidor ya levantado (no se inicia gunicorn)")
+    parser.add_argument("--preload", action="store_true", help="gunicorn --preload (carga una vez en el master)")
+    parser.add_argument("--escala", type=float, default=1, help="datos sintéticos (si no hay CEDEPRO_F1_PATH)")
+    parser.add_argument("--anios", default="2015-2024")
+    parser.add_argument("--salida", help="ruta JSON para guardar resultados")
+    args = parser.parse_args(argv)
+
+    mezcla = MEZCLA_MATRICULAS
+    if args.mezcla:
+        with open(args.mezcla, encoding="utf-8") as f:
+            mezcla = json.load(f)
+
+    resultados = []
+    comun = {"commit": _commit(), "fecha": datetime.now().isoformat(timespec="seconds")}
+
+    if args.url:
+        for u in args.usuarios:
+            print(f"\n== {args.url} con {u} usuarios ==")
+            r = {**comun, "servidor": args.url, **ejecutar_carga(args.url, u, args.duracion, mezcla)}
+            imprimir(r)
+            resultados.append(r)
+    else:
+        env = {}
+        if not os.environ.get("CEDEPRO_F1_PATH"):
+            datos = preparar_datos(args.escala, _anios(args.anios), 7, False)
+            env = {
+                "CEDEPRO_OFERTA_VIGENTE_PATH": os.path.join(datos["destino"], OFERTA_FILENAME),
+                "CEDEPRO_F1_PATH": os.path.join(datos["destino"], F1_FILENAME),
+            }
+        for config in args.config:
+            workers, threads = (int(x) for x in config.lower().split("x"))
+            print(f"\n== gunicorn {workers} workers x {threads} threads ==")
+            t0 = time.perf_counter()
+            proc, url = iniciar_gunicorn(workers, threads, env, preload=args.preload)
+            arranque = time.perf_counter() - t0
+            print(f"  listo en {arranque:.1f} s")
+            try:
+                for u in args.usuarios:
+                    print(f"  -- {u} usuarios --")
+                    r = {
+                        **comun,
+                        "workers": workers,
+                        "threads": threads,
+                        "preload": args.preload,
+                        "arranque_s": round(arranque, 2),
+                        **ejecutar_carga(url, u, args.duracion, mezcla, pid_master=proc.pid),
+                    }
+                    imprimir(r)
+                    resultados.append(r)
+            finally:
+                detener(proc)
+
+    if args.salida:
+        os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+        print(f"\nResultados guardados en: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# reconciliacion.py
+# Comparación de dos versiones de una base de oferta (F1_ACT vs CES_RAW,
+# VIGENTE de este mes vs la del mes anterior, ...).
+#
+# Antes comprar_bases.py, debug_conteos.py y debug_conteos_v2.py armaban
+# cada uno sus sets de Python con nombres de programa y solo decían qué
+# nombre aparecía o desaparecía. Aquí:
+#
+#   - cada fila se identifica por ID_CLAVE (Código IES + programa, ver
+#     registro_claves.py) y su número de ocurrencia dentro de la clave
+#     (N_FILA), así las claves repetidas se emparejan en orden;
+#   - las columnas de ambas versiones se alinean por nombre normalizado
+#     ("CÓDIGO IES" == "Código IES") y se comparan como texto (1001.0 ==
+#     "1001", vacío == NaN); las de la clave no se comparan;
+#   - cada fila recibe una huella uint64 de su contenido
+#     (pd.util.hash_pandas_object); solo las filas con huella distinta se
+#     revisan campo a campo.
+#
+# Resultado: {"RESUMEN", "AGREGADOS", "ELIMINADOS", "MODIFICADOS"}, con
+# MODIFICADOS en formato largo (una fila por campo cambiado: ANTES/DESPUES).
+# Se guarda en formato columnar (artefactos.py) y, si se pide, un resumen
+# en Excel.
+#
+#   python reconciliacion.py ANTES.xlsx DESPUES.xlsx [--salida data/RECONCILIACION] [--excel]
+
+import os
+import sys
+import time
+import argparse
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from artefactos import excel_solicitado, guardar_tabla, leer_tabla
+from excel_streaming import valor_texto
+from registro_claves import cargar_registro, claves_legibles, ids_clave
+
+DATA_DIR = "data"
+SALIDA_PATH = os.path.join(DATA_DIR, "RECONCILIACION.xlsx")
+
+COLUMNAS_IES = ["CÓDIGO IES", "Codigo IES", "Código IES"]
+COLUMNAS_PROGRAMA = ["PROGRAMA / CARRERA", "PROGRAMA/CARRERA", "PROGRAMA", "CARRERA"]
+
+# Columnas auxiliares que algunos pasos dejan en sus tablas
+COLUMNAS_INTERNAS = {"idclave", "clavenorm", "claveiesprog", "clavef1", "claveces", "clavedebug"}
+
+
+# ─────────────────────────────
+#  Columnas
+# ─────────────────────────────
+
+def normalizar_texto(s: str) -> str:
+    if pd.isna(s):
+        return ""
+    s = str(s).strip().lower()
+    s = "".join(
+        c for c in unicodedata.normalize("NFKD", s)
+        if not unicodedata.combining(c)
+    )
+    while "  " in s:
+        s = s.replace("  ", " ")
+    return s
+
+
+def norm_colname(col: str) -> str:
+    if col is None:
+        return ""
+    s = normalizar_texto(col)
+    return s.replace(" ", "").replace("_", "").replace("/", "")
+
+
+def encontrar_columna(df: pd.DataFrame, keywords) -> str:
+    """
+    Busca una columna en df cuyas palabras clave (keywords)
+    aparezcan en el nombre normalizado.
+    """
+    cols_norm = {norm_colname(c): c for c in df.columns}
+    for k in keywords:
+        nk = norm_colname(k)
+        for cnorm, original in cols_norm.items():
+            if nk in cnorm:
+                return original
+    raise KeyError(f"No se encontró ninguna columna que coincida con: {keywords}")
+
+
+def columnas_comunes(df_a: pd.DataFrame, df_b: pd.DataFrame) -> list:
+    """[(col_a, col_b)] con el mismo nombre normalizado, en el orden de df_a."""
+    en_b = {}
+    for c in df_b.columns:
+        en_b.setdefault(norm_colname(c), c)
+    pares = []
+    for c in df_a.columns:
+        n = norm_colname(c)
+        if n in en_b and n not in COLUMNAS_INTERNAS:
+            pares.append((c, en_b[n]))
+    return pares
+
+
+# ─────────────────────────────
+#  Preparación de cada versión
+# ─────────────────────────────
+
+def _como_texto(serie: pd.Series) -> np.ndarray:
+    """Columna como texto ("" si vacío); cada valor distinto se convierte una vez."""
+    if isinstance(serie.dtype, pd.StringDtype):
+        # ya es texto: solo cambian los vacíos
+        return serie.fillna("").to_numpy(dtype=object)
+    distintos = pd.Series(pd.unique(serie)).dropna().tolist()
+    textos = {v: valor_texto(v) or "" for v in distintos}
+    out = serie.map(textos)
+    return out.fillna("").to_numpy(dtype=object)
+
+
+def preparar(df: pd.DataFrame, columnas: list, col_ies: str, col_prog: str) -> pd.DataFrame:
+    """
+    Tabla indexada por (ID_CLAVE, N_FILA) con las columnas a comparar como
+    texto y la huella de contenido de cada fila (HUELLA, uint64).
+    """
+    ids = ids_clave(df[col_ies], df[col_prog]).to_numpy()
+    n_fila = pd.Series(ids).groupby(ids, sort=False).cumcount().to_numpy()
+
+    datos = pd.DataFrame({c: _como_texto(df[c]) for c in columnas})
+    huella = pd.util.hash_pandas_object(datos, index=False).to_numpy()
+
+    datos.index = pd.MultiIndex.from_arrays([ids, n_fila], names=["ID_CLAVE", "N_FILA"])
+    datos["HUELLA"] = huella
+    return datos
+
+
+# ─────────────────────────────
+#  Reconciliación
+# ─────────────────────────────
+
+def reconciliar(
+    df_antes: pd.DataFrame,
+    df_despues: pd.DataFrame,
+    etiquetas: tuple = ("ANTES", "DESPUES"),
+    columnas: list | None = None,
+) -> dict:
+    """
+    Compara dos versiones de una base. columnas: nombres (de df_antes) a
+    comparar; por defecto todas las comunes. Devuelve
+    {"RESUMEN", "AGREGADOS", "ELIMINADOS", "MODIFICADOS"} como DataFrames.
+    """
+    t0 = time.perf_counter()
+    df_antes = df_antes.rename(columns=lambda c: str(c).strip())
+    df_despues = df_despues.rename(columns=lambda c: str(c).strip())
+
+    ies_a, prog_a = encontrar_columna(df_antes, COLUMNAS_IES), encontrar_columna(df_antes, COLUMNAS_PROGRAMA)
+    ies_b, prog_b = encontrar_columna(df_despues, COLUMNAS_IES), encontrar_columna(df_despues, COLUMNAS_PROGRAMA)
+
+    # Las columnas de la clave ya coinciden en forma canónica (ID_CLAVE);
+    # no se reportan diferencias de formato en ellas
+    clave = {norm_colname(c) for c in (ies_a, prog_a, ies_b, prog_b)}
+    pares = [(a, b) for a, b in columnas_comunes(df_antes, df_despues) if norm_colname(a) not in clave]
+    if columnas is not None:
+        pedidas = {norm_colname(c) for c in columnas}
+        pares = [(a, b) for a, b in pares if norm_colname(a) in pedidas]
+    nombres = [a for a, _ in pares]
+
+    antes = preparar(df_antes, [a for a, _ in pares], ies_a, prog_a)
+    despues = preparar(df_despues, [b for _, b in pares], ies_b, prog_b)
+    despues.columns = nombres + ["HUELLA"]
+
+    solo_despues = despues.index.difference(antes.index)
+    solo_antes = antes.index.difference(despues.index)
+    comunes = antes.index.intersection(despues.index)
+
+    a_com = antes.loc[comunes]
+    b_com = despues.loc[comunes]
+    distinta = a_com["HUELLA"].to_numpy() != b_com["HUELLA"].to_numpy()
+    a_mod = a_com[distinta]
+    b_mod = b_com[distinta]
+
+    # Campo a campo, solo en las filas con huella distinta
+    cambios = []
+    for c in nombres:
+        va = a_mod[c].to_numpy()
+        vb = b_mod[c].to_numpy()
+        dif = va != vb
+        if dif.any():
+            cambios.append(pd.DataFrame({
+                "ID_CLAVE": a_mod.index.get_level_values(0)[dif],
+                "N_FILA": a_mod.index.get_level_values(1)[dif],
+                "CAMPO": c,
+                etiquetas[0]: va[dif],
+                etiquetas[1]: vb[dif],
+            }))
+    if cambios:
+        modificados = pd.concat(cambios, ignore_index=True).sort_values(
+            ["ID_CLAVE", "N_FILA"], kind="stable", ignore_index=True
+        )
+    else:
+        modificados = pd.DataFrame(columns=["ID_CLAVE", "N_FILA", "CAMPO", *etiquetas])
+
+    def _filas(tabla, indice):
+        out = tabla.loc[indice].drop(columns="HUELLA").reset_index()
+        return out.sort_values(["ID_CLAVE", "N_FILA"], kind="stable", ignore_index=True)
+
+    claves_a = antes.index.get_level_values(0)
+    claves_b = despues.index.get_level_values(0)
+
+    # CLAVE_NUEVA / CLAVE_ELIMINADA: la clave no existe en la otra versión
+    # (si no, es una ocurrencia extra de una clave repetida)
+    agregados = _filas(despues, solo_despues)
+    agregados.insert(2, "CLAVE_NUEVA", ~agregados["ID_CLAVE"].isin(claves_a))
+    eliminados = _filas(antes, solo_antes)
+    eliminados.insert(2, "CLAVE_ELIMINADA", ~eliminados["ID_CLAVE"].isin(claves_b))
+
+    # Clave legible (Código IES || programa canónicos) para revisar a mano
+    registro = cargar_registro()
+    for tabla in (agregados, eliminados, modificados):
+        tabla.insert(1, "CLAVE", claves_legibles(tabla["ID_CLAVE"], registro))
+
+    resumen = pd.DataFrame({
+        "METRICA": [
+            f"Filas {etiquetas[0]}",
+            f"Filas {etiquetas[1]}",
+            f"Claves únicas {etiquetas[0]}",
+            f"Claves únicas {etiquetas[1]}",
+            f"Filas con clave repetida {etiquetas[0]}",
+            f"Filas con clave repetida {etiquetas[1]}",
+            f"Claves solo en {etiquetas[0]}",
+            f"Claves solo en {etiquetas[1]}",
+            "Columnas comparadas",
+            "Filas agregadas",
+            "Filas eliminadas",
+            "Filas iguales",
+            "Filas modificadas",
+            "Campos modificados",
+            "Milisegundos",
+        ],
+        "VALOR": [
+            len(antes),
+            len(despues),
+            claves_a.nunique(),
+            claves_b.nunique(),
+            int(claves_a.duplicated().sum()),
+            int(claves_b.duplicated().sum()),
+            eliminados.loc[eliminados["CLAVE_ELIMINADA"], "ID_CLAVE"].nunique(),
+            agregados.loc[agregados["CLAVE_NUEVA"], "ID_CLAVE"].nunique(),
+            len(nombres),
+            len(agregados),
+            len(eliminados),
+            int((~distinta).sum()),
+            int(distinta.sum()),
+            len(modificados),
+            round((time.perf_counter() - t0) * 1000),
+        ],
+    })
+
+    return {
+        "RESUMEN": resumen,
+        "AGREGADOS": agregados,
+        "ELIMINADOS": eliminados,
+        "MODIFICADOS": modificados,
+    }
+
+
+def imprimir_resumen(reporte: dict) -> None:
+    for metrica, valor in zip(reporte["RESUMEN"]["METRICA"], reporte["RESUMEN"]["VALOR"]):
+        print(f"   {metrica:<40} {valor}")
+
+
+def guardar_reconciliacion(reporte: dict, path: str = SALIDA_PATH, excel: bool | None = None) -> list:
+    """
+    Guarda cada tabla del reporte en formato columnar
+    (RECONCILIACION_AGREGADOS, ...) y, si se pide, el resumen en un Excel
+    con una hoja por tabla. Devuelve las rutas escritas.
+    """
+    base, _ = os.path.splitext(path)
+    rutas = [guardar_tabla(df, f"{base}_{nombre}.xlsx", excel=False) for nombre, df in reporte.items()]
+
+    if excel if excel is not None else excel_solicitado():
+        os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+        with pd.ExcelWriter(base + ".xlsx") as writer:
+            for nombre, df in reporte.items():
+                df.to_excel(writer, sheet_name=nombre, index=False)
+        rutas.append(base + ".xlsx")
+    return rutas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos versiones de una base de oferta.")
+    parser.add_argument("antes", help="Versión anterior (.xlsx o tabla columnar)")
+    parser.add_argument("despues", help="Versión nueva")
+    parser.add_argument("--salida", default=SALIDA_PATH, help="Ruta base del reporte")
+    parser.add_argument("--excel", action="store_true", help="Escribir también el resumen en Excel")
+    args = parser.parse_args(argv)
+
+    print(f"Cargando {args.antes}...")
+    df_antes = leer_tabla(args.antes)
+    print(f"Cargando {args.despues}...")
+    df_despues = leer_tabla(args.despues)
+
+    reporte = reconciliar(df_antes, df_despues)
+    imprimir_resumen(reporte)
+    for ruta in guardar_reconciliacion(reporte, args.salida, excel=args.excel or None):
+        print("Archivo generado:", ruta)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# registro_claves.py
+# Claves enteras (int64) para (Código IES, PROGRAMA / CARRERA), compartidas
+# por todos los scripts del pipeline.
+#
+# Antes cada script armaba su propia clave de texto (CLAVE_NORM,
+# CLAVE_IES_PROG, CLAVE_F1/CLAVE_CES, CLAVE_DEBUG) con normalizaciones
+# distintas: 1001.0 vs 1001 (F1 leída sin dtype=str), tildes, mayúsculas,
+# dobles espacios... y aparecían "nuevos" que no lo eran. Aquí:
+#
+#   - canonizar_ies / canonizar_programa definen UNA forma canónica;
+#   - cada clave canónica "ies||programa" recibe un id int64 estable
+#     (primeros 8 bytes de blake2b), el mismo en cualquier proceso y corrida
+#     sin tener que coordinarse (los pasos corren en paralelo);
+#   - data/REGISTRO_CLAVES (formato columnar, ver artefactos.py) guarda
+#     id -> clave canónica entre corridas, para mostrar claves legibles y
+#     detectar colisiones. Solo lo escriben los pasos que producen tablas
+#     (ids_clave(..., guardar=True)) y solo si aparecen ids nuevos; las
+#     comparaciones (reconciliacion.py) no lo tocan. Cada proceso lo lee una
+#     vez y lo mantiene en memoria.
+#
+# Los merges, isin y diferencias de conjuntos se hacen sobre ID_CLAVE.
+
+import os
+import re
+import hashlib
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from artefactos import existe_tabla, guardar_tabla, leer_tabla
+from bloqueo import Bloqueo
+
+DATA_DIR = "data"
+REGISTRO_PATH = os.path.join(DATA_DIR, "REGISTRO_CLAVES.xlsx")
+
+_RE_CODIGO = re.compile(r"\d+(\.0+)?")
+
+
+def canonizar_programa(v) -> str:
+    """Minúsculas, sin tildes, espacios simples (vacío si NaN)."""
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return ""
+    s = str(v).strip().lower()
+    if not s.isascii():
+        s = "".join(
+            c for c in unicodedata.normalize("NFKD", s)
+            if not unicodedata.combining(c)
+        )
+    return " ".join(s.split())
+
+
+def canonizar_ies(v) -> str:
+    """
+    Código IES canónico: número sin ceros a la izquierda ni ".0"
+    (1001, 1001.0, "1001", "01001" -> "1001"); si no es numérico, el texto
+    normalizado como en canonizar_programa.
+    """
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return ""
+    if isinstance(v, (bool, np.bool_)):
+        return str(v).lower()
+    if isinstance(v, (int, np.integer)):
+        return str(int(v))
+    if isinstance(v, (float, np.floating)) and float(v).is_integer():
+        return str(int(v))
+    s = str(v).strip()
+    if _RE_CODIGO.fullmatch(s):
+        return str(int(s.split(".")[0]))
+    return canonizar_programa(s)
+
+
+def clave_canonica(ies, programa) -> str:
+    return f"{canonizar_ies(ies)}||{canonizar_programa(programa)}"
+
+
+def id_de_clave(clave: str) -> int:
+    """Id int64 estable de una clave canónica."""
+    digest = hashlib.blake2b(clave.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+# Registro en memoria del proceso: {ruta absoluta: {id: clave}} leído una vez
+# (más lo que este proceso agregó), y las claves de todos los lotes de
+# ids_clave, también los que no se guardan, para claves_legibles
+_REGISTROS = {}
+_CALCULADAS = {}
+
+
+def _leer_registro(path: str) -> dict:
+    if not existe_tabla(path):
+        return {}
+    df = leer_tabla(path)
+    return dict(zip(df["ID_CLAVE"].astype("int64"), df["CLAVE"].astype(str)))
+
+
+def cargar_registro(path: str = REGISTRO_PATH) -> dict:
+    """
+    {id: clave canónica} de las corridas anteriores (vacío si no hay). Se lee
+    del disco una sola vez por proceso; no modificar el dict devuelto.
+    """
+    clave = os.path.abspath(path)
+    if clave not in _REGISTROS:
+        _REGISTROS[clave] = _leer_registro(path)
+    return _REGISTROS[clave]
+
+
+def registrar(nuevas: dict, path: str = REGISTRO_PATH) -> dict:
+    """
+    Agrega {id: clave} al registro persistido y lo devuelve completo.
+    Falla si un id ya existe con otra clave (colisión de hash).
+    """
+    def faltantes(registro: dict) -> dict:
+        faltan = {}
+        for i, clave in nuevas.items():
+            previa = registro.get(i)
+            if previa is None:
+                faltan[i] = clave
+            elif previa != clave:
+                raise ValueError(f"Colisión de ID_CLAVE {i}: {previa!r} vs {clave!r}")
+        return faltan
+
+    # Sin ids nuevos (según la copia en memoria) no se lee ni se escribe nada
+    if not faltantes(cargar_registro(path)):
+        return cargar_registro(path)
+
+    # Los pasos del pipeline registran en paralelo (pool de procesos): releer,
+    # unir y escribir bajo el bloqueo, o cada paso pisaría el lote de otro
+    with Bloqueo(path + ".lock", espera=120):
+        registro = _leer_registro(path)
+        faltan = faltantes(registro)
+        if faltan:
+            registro.update(faltan)
+            guardar_tabla(
+                pd.DataFrame({
+                    "ID_CLAVE": np.fromiter(registro.keys(), dtype="int64", count=len(registro)),
+                    "CLAVE": list(registro.values()),
+                }),
+                path,
+                excel=False,
+            )
+    _REGISTROS[os.path.abspath(path)] = registro
+    return registro
+
+
+def _distintos(serie: pd.Series) -> list:
+    # tolist() evita iterar celda a celda los arreglos de texto de pandas
+    return pd.Series(pd.unique(serie)).tolist()
+
+
+def ids_clave(cod_ies: pd.Series, programa: pd.Series, guardar: bool = False) -> pd.Series:
+    """
+    ID_CLAVE (int64) por fila para (Código IES, programa). Cada valor
+    distinto se canoniza una sola vez. Con guardar=True (pasos que producen
+    tablas) las claves nuevas quedan en el registro; las lecturas y
+    comparaciones usan el valor por defecto y no lo escriben.
+    """
+    ies_can = cod_ies.map({v: canonizar_ies(v) for v in _distintos(cod_ies)})
+    prog_can = programa.map({v: canonizar_programa(v) for v in _distintos(programa)})
+    claves = ies_can.astype(str) + "||" + prog_can.astype(str)
+
+    distintas = _distintos(claves)
+    ids = {c: id_de_clave(c) for c in distintas}
+    if len(set(ids.values())) != len(ids):
+        raise ValueError("Colisión de ID_CLAVE entre claves distintas del mismo lote.")
+    _CALCULADAS.update((i, c) for c, i in ids.items())
+    if guardar:
+        registrar({i: c for c, i in ids.items()})
+
+    return claves.map(ids).astype("int64")
+
+
+def claves_legibles(ids, registro: dict | None = None) -> list:
+    """
+    Clave canónica de cada id (para reportes): del registro o de un lote ya
+    calculado en este proceso; el id si no se conoce.
+    """
+    registro = cargar_registro() if registro is None else registro
+    return [registro.get(int(i)) or _CALCULADAS.get(int(i), str(i)) for i in ids]
@@ -0,0 +1,229 @@
+# servidor_ces_local.py
+# Servidor local que imita la página de oferta vigente del CES
+# (appcmi.ces.gob.ec/oferta_vigente/inicio.php) para probar y medir el
+# scraper de update_oferta_selenium.py sin depender del sitio real.
+#
+# Reproduce lo que el scraper usa de la página real:
+#  - Filtro "Tipo de programa / carrera" + botón CONSULTAR (envía el form)
+#  - Tabla con THEAD (Código IES, Universidad, ..., PROVINCIA)
+#  - Selector "Mostrar [10|25|50|100] registros" y paginación estilo
+#    DataTables (li.paginate_button.previous / .next, clase "disabled")
+#
+# Las filas salen de fixtures/ces_oferta_grabada.csv (muestra grabada del
+# CES) y se replican hasta llegar al número de filas pedido.
+#
+# Uso:
+#   python servidor_ces_local.py --filas 9000 --puerto 8765
+
+import os
+import csv
+import sys
+import json
+import html
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_PATH = os.path.join(BASE_DIR, "fixtures", "ces_oferta_grabada.csv")
+
+RUTA_OFERTA = "/oferta_vigente/inicio.php"
+
+COLUMNAS_TABLA = [
+    "Código IES",
+    "Universidad",
+    "Financiamiento",
+    "Tipo IES",
+    "PROGRAMA / CARRERA",
+    "Título que otorga",
+    "PROVINCIA",
+]
+COL_TIPO = "TIPO DE PROGRAMA"
+TIPO_OBJETIVO = "TERCER NIVEL O DE GRADO"  # la opción que elige el scraper
+
+
+def cargar_fixture(path: str = FIXTURE_PATH) -> list[dict]:
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def generar_filas(n_filas: int, fixture: list[dict] | None = None) -> list[dict]:
+    """
+    Replica la muestra grabada hasta tener n_filas de TIPO_OBJETIVO
+    (más las de otros tipos en la misma proporción que la muestra).
+    Cada réplica agrega un sufijo de cohorte al programa para que la
+    clave (Código IES, programa) siga siendo única.
+    """
+    fixture = fixture if fixture is not None else cargar_fixture()
+    if not any(r[COL_TIPO] == TIPO_OBJETIVO for r in fixture):
+        raise ValueError(f"La muestra no tiene filas de tipo {TIPO_OBJETIVO!r}")
+
+    filas = []
+    n_objetivo = 0
+    replica = 0
+    while n_objetivo < n_filas:
+        for r in fixture:
+            if r[COL_TIPO] == TIPO_OBJETIVO:
+                if n_objetivo >= n_filas:
+                    continue
+                n_objetivo += 1
+            fila = dict(r)
+            if replica:
+                fila["PROGRAMA / CARRERA"] = f"{r['PROGRAMA / CARRERA']} - COHORTE {replica}"
+            filas.append(fila)
+        replica += 1
+    return filas
+
+
+_PAGINA = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>Oferta vigente - CES (local)</title></head>
+<body>
+<form method="get" action="{ruta}">
+  <label for="tipo">Tipo de programa / carrera</label>
+  <select id="tipo" name="tipo">
+    <option value="">-- TODOS --</option>
+    {opciones}
+  </select>
+  <button type="submit">CONSULTAR</button>
+</form>
+{tabla}
+</body>
+</html>
+"""
+
+_TABLA = """<div class="dataTables_length" id="oferta_length">
+  <label>Mostrar <select name="oferta_length" id="page_size">
+    <option value="10">10</option><option value="25">25</option>
+    <option value="50">50</option><option value="100">100</option>
+  </select> registros</label>
+</div>
+<table id="oferta" class="table dataTable">
+  <thead><tr>{thead}</tr></thead>
+  <tbody></tbody>
+</table>
+<div class="dataTables_info" id="oferta_info"></div>
+<div class="dataTables_paginate"><ul class="pagination" id="paginacion"></ul></div>
+<script>
+var FILAS = {datos};
+var pagina = 0, tam = 10;
+function esc(s) {{
+  return String(s).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+}}
+function render() {{
+  var total = FILAS.length, paginas = Math.max(1, Math.ceil(total / tam));
+  if (pagina >= paginas) pagina = paginas - 1;
+  var ini = pagina * tam, fin = Math.min(total, ini + tam), h = [];
+  for (var i = ini; i < fin; i++) {{
+    var f = FILAS[i], c = [];
+    for (var j = 0; j < f.length; j++) c.push("<td>" + esc(f[j]) + "</td>");
+    h.push("<tr>" + c.join("") + "</tr>");
+  }}
+  document.querySelector("#oferta tbody").innerHTML = h.join("");
+  document.getElementById("oferta_info").textContent =
+    "Mostrando registros del " + (total ? ini + 1 : 0) + " al " + fin + " de un total de " + total;
+  var prev = pagina === 0 ? " disabled" : "", next = pagina >= paginas - 1 ? " disabled" : "";
+  document.getElementById("paginacion").innerHTML =
+    '<li class="paginate_button page-item previous' + prev + '" id="oferta_previous"><a href="#" class="page-link">Anterior</a></li>' +
+    '<li class="paginate_button page-item active"><a href="#" class="page-link">' + (pagina + 1) + '</a></li>' +
+    '<li class="paginate_button page-item next' + next + '" id="oferta_next"><a href="#" class="page-link">Siguiente</a></li>';
+}}
+document.getElementById("paginacion").addEventListener("click", function (ev) {{
+  ev.preventDefault();
+  var li = ev.target.closest("li");
+  if (!li || li.className.indexOf("disabled") >= 0) return;
+  if (li.className.indexOf("next") >= 0) pagina++;
+  else if (li.className.indexOf("previous") >= 0) pagina--;
+  render();
+}});
+document.getElementById("page_size").addEventListener("change", function () {{
+  tam = parseInt(this.value, 10); pagina = 0; render();
+}});
+render();
+</script>
+"""
+
+
+def _crear_handler(filas: list[dict], latencia_ms: int):
+    tipos = sorted({f[COL_TIPO] for f in filas})
+
+    class CESHandler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):  # silencioso (el benchmark mide, no loguea)
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != RUTA_OFERTA:
+                self.send_error(404)
+                return
+
+            if latencia_ms:
+                time.sleep(latencia_ms / 1000.0)
+
+            qs = parse_qs(url.query)
+            consultado = "tipo" in qs
+            tipo = (qs.get("tipo") or [""])[0]
+
+            opciones = "\n    ".join(
+                f'<option value="{html.escape(t)}"{" selected" if t == tipo else ""}>{html.escape(t)}</option>'
+                for t in tipos
+            )
+
+            tabla = ""
+            if consultado:
+                sel = [f for f in filas if not tipo or f[COL_TIPO] == tipo]
+                datos = json.dumps(
+                    [[f.get(c, "") for c in COLUMNAS_TABLA] for f in sel],
+                    ensure_ascii=False,
+                ).replace("</", "<\\/")
+                tabla = _TABLA.format(
+                    thead="".join(f"<th>{html.escape(c)}</th>" for c in COLUMNAS_TABLA),
+                    datos=datos,
+                )
+
+            body = _PAGINA.format(ruta=RUTA_OFERTA, opciones=opciones, tabla=tabla).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return CESHandler
+
+
+def iniciar_servidor(n_filas: int, host: str = "127.0.0.1", puerto: int = 0, latencia_ms: int = 0):
+    """
+    Levanta el servidor en un hilo de fondo.
+    Devuelve (server, url_oferta); detener con server.shutdown().
+    """
+    filas = generar_filas(n_filas)
+    server = ThreadingHTTPServer((host, puerto), _crear_handler(filas, latencia_ms))
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    url = f"http://{host}:{server.server_address[1]}{RUTA_OFERTA}"
+    return server, url
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Servidor local que imita la oferta vigente del CES.")
+    parser.add_argument("--filas", type=int, default=9000, help="filas de tercer nivel a servir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=int, default=0, help="latencia simulada por respuesta")
+    args = parser.parse_args()
+
+    server, url = iniciar_servidor(args.filas, args.host, args.puerto, args.latencia_ms)
+    print(f"Servidor CES local en: {url} ({args.filas} filas de tercer nivel)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
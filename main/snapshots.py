@@ -0,0 +1,325 @@
+# snapshots.py
+# Versiones de los archivos del pipeline guardadas por contenido.
+#
+# Antes backup_f1() copiaba la F1 completa a data/backups/ en cada corrida
+# e integrar_titulos_10y.py dejaba otro _backup_before_titles.xlsx: copias
+# enteras, casi siempre iguales a la anterior, que crecían sin límite. Aquí:
+#
+#   - cada archivo se guarda UNA vez por contenido en
+#     data/snapshots/objetos/<ab>/<hash>, comprimido con gzip si así ocupa
+#     menos (los .xlsx ya vienen comprimidos). El hash ignora docProps/ de
+#     los .xlsx (fecha de creación), como hash_contenido en motor_pipeline.py;
+#   - data/snapshots/MANIFIESTO.json lista las versiones de cada dataset
+#     (id, hash, archivo de origen, fecha, etiqueta). Si el contenido no
+#     cambió desde la última versión no se agrega otra;
+#   - retención: por dataset se conservan las últimas CEDEPRO_SNAPSHOTS_ULTIMAS
+#     versiones (20) y todas las de los últimos CEDEPRO_SNAPSHOTS_DIAS días
+#     (90); los objetos que ya nadie referencia se borran.
+#
+#   python snapshots.py listar [DATASET]
+#   python snapshots.py tomar ARCHIVO [--dataset NOMBRE] [--etiqueta TEXTO]
+#   python snapshots.py restaurar ID_O_HASH [--destino RUTA]
+#   python snapshots.py podar
+
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import argparse
+from datetime import datetime, timedelta
+
+from bloqueo import Bloqueo
+
+DATA_DIR = "data"
+SNAPSHOTS_DIR = os.path.join(DATA_DIR, "snapshots")
+OBJETOS_DIR = os.path.join(SNAPSHOTS_DIR, "objetos")
+MANIFIESTO_PATH = os.path.join(SNAPSHOTS_DIR, "MANIFIESTO.json")
+BLOQUEO_PATH = os.path.join(SNAPSHOTS_DIR, "MANIFIESTO.lock")
+
+VARIABLE_SNAPSHOTS = "CEDEPRO_SNAPSHOTS"
+RETENCION = {
+    "ultimas": int(os.environ.get("CEDEPRO_SNAPSHOTS_ULTIMAS", "20")),
+    "dias": int(os.environ.get("CEDEPRO_SNAPSHOTS_DIAS", "90")),
+}
+
+# Si gzip no baja de esta fracción del tamaño original, se guarda tal cual
+UMBRAL_COMPRESION = 0.9
+_BLOQUE = 1024 * 1024
+
+
+def snapshots_activos() -> bool:
+    """CEDEPRO_SNAPSHOTS=0 desactiva los snapshots automáticos del pipeline."""
+    return os.environ.get(VARIABLE_SNAPSHOTS, "1") != "0"
+
+
+# ─────────────────────────────
+#  Hash y objetos
+# ─────────────────────────────
+
+def huella_archivo(path: str) -> str:
+    """sha256 del contenido (en los .xlsx, sin docProps/)."""
+    h = hashlib.sha256()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            for info in sorted(z.infolist(), key=lambda i: i.filename):
+                if info.filename.startswith("docProps/"):
+                    continue
+                h.update(info.filename.encode("utf-8"))
+                with z.open(info) as f:
+                    for bloque in iter(lambda: f.read(_BLOQUE), b""):
+                        h.update(bloque)
+    else:
+        with open(path, "rb") as f:
+            for bloque in iter(lambda: f.read(_BLOQUE), b""):
+                h.update(bloque)
+    return h.hexdigest()
+
+
+def _ruta_objeto(huella: str) -> str:
+    return os.path.join(OBJETOS_DIR, huella[:2], huella)
+
+
+def guardar_objeto(path: str, huella: str) -> dict:
+    """
+    Copia path al almacén (si ese contenido no estaba ya).
+    Devuelve {"bytes", "almacenado", "compresion", "objeto_nuevo"}.
+    """
+    destino = _ruta_objeto(huella)
+    tamano = os.path.getsize(path)
+    if os.path.exists(destino):
+        return {
+            "bytes": tamano,
+            "almacenado": os.path.getsize(destino),
+            "compresion": _compresion_objeto(destino),
+            "objeto_nuevo": False,
+        }
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tmp = destino + f".{os.getpid()}.tmp"
+    with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, _BLOQUE)
+    if os.path.getsize(tmp) > tamano * UMBRAL_COMPRESION:
+        shutil.copyfile(path, tmp)
+    os.replace(tmp, destino)
+    return {
+        "bytes": tamano,
+        "almacenado": os.path.getsize(destino),
+        "compresion": _compresion_objeto(destino),
+        "objeto_nuevo": True,
+    }
+
+
+def _compresion_objeto(path: str) -> str:
+    with open(path, "rb") as f:
+        return "gzip" if f.read(2) == b"\x1f\x8b" else "ninguna"
+
+
+# ─────────────────────────────
+#  Manifiesto
+# ─────────────────────────────
+
+def cargar_manifiesto(path: str = MANIFIESTO_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"versiones": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_manifiesto(manifiesto: dict, path: str = MANIFIESTO_PATH) -> None:
+    """Escritura atómica (tmp + replace)."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def nombre_dataset(path: str) -> str:
+    """Dataset por defecto: nombre del archivo sin extensión."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# ─────────────────────────────
+#  Operaciones
+# ─────────────────────────────
+
+def tomar_snapshot(path: str, dataset: str | None = None, etiqueta: str = "") -> dict | None:
+    """
+    Guarda la versión actual de path. Si es igual a la última del dataset
+    no agrega nada y devuelve esa versión. None si el archivo no existe.
+    """
+    if not os.path.exists(path):
+        return None
+    dataset = dataset or nombre_dataset(path)
+    t0 = time.perf_counter()
+    huella = huella_archivo(path)
+
+    # el objeto se nombra por su hash y se escribe atómicamente: comprimir
+    # fuera del bloqueo no pisa a nadie (el manifiesto se lee con replace atómico)
+    previas = [v for v in cargar_manifiesto()["versiones"] if v["dataset"] == dataset]
+    if previas and previas[-1]["hash"] == huella:
+        return dict(previas[-1], nueva=False)
+    objeto = guardar_objeto(path, huella)
+
+    with Bloqueo(BLOQUEO_PATH):
+        manifiesto = cargar_manifiesto()
+        previas = [v for v in manifiesto["versiones"] if v["dataset"] == dataset]
+        if previas and previas[-1]["hash"] == huella:
+            return dict(previas[-1], nueva=False)
+        if not os.path.exists(_ruta_objeto(huella)):
+            # una poda en paralelo lo borró por no estar aún en el manifiesto
+            objeto = guardar_objeto(path, huella)
+        version = {
+            "id": f"{dataset}@{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}",
+            "dataset": dataset,
+            "hash": huella,
+            "archivo": path,
+            "extension": os.path.splitext(path)[1],
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "etiqueta": etiqueta,
+            **objeto,
+        }
+        manifiesto["versiones"].append(version)
+        _podar(manifiesto)
+        _guardar_manifiesto(manifiesto)
+
+    version["segundos"] = round(time.perf_counter() - t0, 3)
+    return dict(version, nueva=True)
+
+
+def _podar(manifiesto: dict, retencion: dict | None = None) -> list:
+    """Aplica la retención en el manifiesto y borra los objetos sin uso. Devuelve las versiones quitadas."""
+    retencion = retencion or RETENCION
+    limite = datetime.now() - timedelta(days=retencion["dias"])
+    conservar, quitadas = [], []
+    por_dataset = {}
+    for v in manifiesto["versiones"]:
+        por_dataset.setdefault(v["dataset"], []).append(v)
+    for versiones in por_dataset.values():
+        ultimas = {id(v) for v in versiones[-retencion["ultimas"]:]} if retencion["ultimas"] > 0 else set()
+        for v in versiones:
+            if id(v) in ultimas or datetime.fromisoformat(v["fecha"]) >= limite:
+                conservar.append(v)
+            else:
+                quitadas.append(v)
+
+    if quitadas:
+        orden = {id(v): i for i, v in enumerate(manifiesto["versiones"])}
+        manifiesto["versiones"] = sorted(conservar, key=lambda v: orden[id(v)])
+        en_uso = {v["hash"] for v in manifiesto["versiones"]}
+        for huella in {v["hash"] for v in quitadas} - en_uso:
+            try:
+                os.remove(_ruta_objeto(huella))
+            except FileNotFoundError:
+                pass
+    return quitadas
+
+
+def podar(retencion: dict | None = None) -> list:
+    with Bloqueo(BLOQUEO_PATH):
+        manifiesto = cargar_manifiesto()
+        quitadas = _podar(manifiesto, retencion)
+        _guardar_manifiesto(manifiesto)
+    return quitadas
+
+
+def listar(dataset: str | None = None) -> list:
+    """Versiones (de un dataset o de todos), de la más antigua a la más nueva."""
+    versiones = cargar_manifiesto()["versiones"]
+    return [v for v in versiones if dataset is None or v["dataset"] == dataset]
+
+
+def buscar_version(ref: str) -> dict:
+    """Versión por id, por prefijo de hash o por dataset (su última versión)."""
+    versiones = cargar_manifiesto()["versiones"]
+    for v in reversed(versiones):
+        if v["id"] == ref:
+            return v
+    por_dataset = [v for v in versiones if v["dataset"] == ref]
+    if por_dataset:
+        return por_dataset[-1]
+    por_hash = {v["hash"]: v for v in versiones if v["hash"].startswith(ref)}
+    if len(por_hash) == 1:
+        return next(iter(por_hash.values()))
+    if len(por_hash) > 1:
+        raise KeyError(f"El prefijo {ref!r} coincide con varios snapshots.")
+    raise KeyError(f"No hay snapshot {ref!r}.")
+
+
+def restaurar(ref: str, destino: str | None = None) -> str:
+    """
+    Escribe la versión ref en destino (por defecto, su archivo de origen)
+    con escritura atómica. Devuelve la ruta escrita.
+    """
+    version = buscar_version(ref)
+    destino = destino or version["archivo"]
+    objeto = _ruta_objeto(version["hash"])
+    if not os.path.exists(objeto):
+        raise FileNotFoundError(f"Falta el objeto {version['hash']} del snapshot {version['id']}")
+
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    tmp = destino + ".restaurar.tmp"
+    abrir = gzip.open if _compresion_objeto(objeto) == "gzip" else open
+    with abrir(objeto, "rb") as src, open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, _BLOQUE)
+    os.replace(tmp, destino)
+    return destino
+
+
+def resumen_snapshot(version: dict) -> str:
+    if not version.get("nueva"):
+        return f"{version['dataset']}: sin cambios desde {version['id']}"
+    mb = version["almacenado"] / 1e6
+    return (
+        f"{version['dataset']}: snapshot {version['id']} ({version['hash'][:12]}, "
+        f"{mb:.2f} MB almacenados, {version['compresion']}, {version['segundos']} s)"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Snapshots por contenido de los archivos del pipeline.")
+    sub = parser.add_subparsers(dest="accion", required=True)
+
+    p = sub.add_parser("listar", help="versiones guardadas")
+    p.add_argument("dataset", nargs="?")
+
+    p = sub.add_parser("tomar", help="guarda la versión actual de un archivo")
+    p.add_argument("archivo")
+    p.add_argument("--dataset")
+    p.add_argument("--etiqueta", default="")
+
+    p = sub.add_parser("restaurar", help="recupera una versión (id, prefijo de hash o dataset)")
+    p.add_argument("ref")
+    p.add_argument("--destino")
+
+    sub.add_parser("podar", help="aplica la retención y borra objetos sin uso")
+    args = parser.parse_args(argv)
+
+    if args.accion == "listar":
+        versiones = listar(args.dataset)
+        for v in versiones:
+            print(
+                f"{v['id']:<55} {v['hash'][:12]}  {v['bytes'] / 1e6:8.2f} MB -> "
+                f"{v['almacenado'] / 1e6:8.2f} MB  {v['etiqueta']}"
+            )
+        objetos = {v["hash"]: v["almacenado"] for v in versiones}
+        print(f"{len(versiones)} versiones, {len(objetos)} objetos, {sum(objetos.values()) / 1e6:.2f} MB")
+    elif args.accion == "tomar":
+        version = tomar_snapshot(args.archivo, args.dataset, args.etiqueta)
+        if version is None:
+            print(f"No se encontró {args.archivo}")
+            return 1
+        print(resumen_snapshot(version))
+    elif args.accion == "restaurar":
+        print("Restaurado en:", restaurar(args.ref, args.destino))
+    else:
+        quitadas = podar()
+        print(f"Versiones quitadas: {len(quitadas)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
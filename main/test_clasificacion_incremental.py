@@ -0,0 +1,64 @@
+# test_clasificacion_incremental.py
+# Clasificación incremental (clasificar_oferta_nueva.py + delta_ces.py):
+# con un delta CES vacío, un cambio en DICCIONARIO_MAESTRO debe reclasificar
+# las filas en vez de copiarlas de la clasificación previa.
+#
+#   python -m pytest -q test_clasificacion_incremental.py
+
+import os
+
+import pandas as pd
+import pytest
+
+import clasificar_oferta_nueva as clasif
+from delta_ces import calcular_delta, calcular_huellas, guardar_delta
+
+
+def _escribir_maestro(campos: dict) -> None:
+    pd.DataFrame({
+        "PROGRAMA_NORMALIZADO": list(campos),
+        "CAMPO_DETALLADO": list(campos.values()),
+    }).to_excel(clasif.OUT_DICC_MAESTRO, index=False)
+
+
+@pytest.fixture
+def ces_raw(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    pd.DataFrame({
+        "Código IES": ["1001", "1002", "1003"],
+        "PROGRAMA / CARRERA": ["MEDICINA", "DERECHO", "ENFERMERÍA"],
+        "CAMPO DETALLADO": ["Medicina", "Derecho", "Enfermería"],
+        "PROVINCIA": ["PICHINCHA", "GUAYAS", "AZUAY"],
+    }).to_excel(clasif.F1_PATH, index=False)
+    return pd.DataFrame({
+        "Código IES": ["1001", "1002", "1003"],
+        "PROGRAMA / CARRERA": ["MEDICINA", "DERECHO", "ENFERMERÍA"],
+        "Título que otorga": ["MÉDICO", "ABOGADO", "LICENCIADO EN ENFERMERÍA"],
+        "PROVINCIA": ["PICHINCHA", "GUAYAS", "AZUAY"],
+    })
+
+
+def _clasificar(df_raw: pd.DataFrame) -> pd.DataFrame:
+    df, huellas = clasif.clasificar_oferta_df(df_raw.copy())
+    clasif.guardar_clasificacion(df, huellas)
+    # el scraper no vio cambios: delta vacío contra la foto recién guardada
+    guardar_delta(calcular_delta(huellas, calcular_huellas(df_raw)))
+    return df.set_index("PROGRAMA / CARRERA")["CAMPO DETALLADO"]
+
+
+def test_cambio_de_diccionario_reclasifica_con_delta_vacio(ces_raw):
+    _escribir_maestro({"medicina": "Medicina", "derecho": "Derecho", "enfermeria": "Enfermería"})
+    assert _clasificar(ces_raw)["DERECHO"] == "Derecho"
+
+    _escribir_maestro({"medicina": "Medicina", "derecho": "Ciencias jurídicas", "enfermeria": "Enfermería"})
+    assert _clasificar(ces_raw)["DERECHO"] == "Ciencias jurídicas"
+
+
+def test_sin_cambios_reutiliza_la_clasificacion_previa(ces_raw, capsys):
+    _escribir_maestro({"medicina": "Medicina", "derecho": "Derecho", "enfermeria": "Enfermería"})
+    _clasificar(ces_raw)
+    capsys.readouterr()
+
+    assert _clasificar(ces_raw)["DERECHO"] == "Derecho"
+    assert "Modo incremental" in capsys.readouterr().out
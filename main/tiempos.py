@@ -0,0 +1,159 @@
+# tiempos.py
+# Fases de tiempo por request (Server-Timing) y log de consultas lentas.
+#
+# Cada request /api/* acumula en flask.g el tiempo EXCLUSIVO de cada fase:
+#
+#   params     normalización de los filtros del query string
+#   filter     _filtrar_mat / _filtrar_tit
+#   aggregate  groupby de oferta_por_campo, matriculas_* y titulados_por_cohorte
+#   merge      cruce de compare_oferta_vs_matriculas
+#   serialize  codificación JSON (proveedor JSON de Flask)
+#   cache      búsqueda en caché de respuestas (cuando la ruta la usa)
+#
+# Las fases se anidan (compare llama a oferta_por_campo, que agrega): al
+# entrar a una fase hija se pausa la madre, así la suma no cuenta dos veces.
+# Lo que queda fuera de toda fase (código de la vista, to_dict) va a "otros".
+#
+# La respuesta lleva Server-Timing (visible en DevTools > Network > Timing) y
+# los requests que pasan CEDEPRO_LENTO_MS van al logger "cedepro.lento" como
+# una línea JSON con filtros normalizados, filas tocadas y fases. Con
+# CEDEPRO_LENTO_LOG=ruta.jsonl también se agregan a ese archivo.
+#
+# Fuera de un request (carga, scripts, bench) los decoradores no miden nada.
+
+import os
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager
+
+import pandas as pd
+from flask import g, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+FASES = ("params", "filter", "aggregate", "merge", "serialize", "cache")
+
+SERVER_TIMING = os.environ.get("CEDEPRO_SERVER_TIMING", "1") != "0"
+LENTO_MS = float(os.environ.get("CEDEPRO_LENTO_MS", "500") or 500)
+LENTO_LOG = os.environ.get("CEDEPRO_LENTO_LOG", "")
+
+log_lento = logging.getLogger("cedepro.lento")
+if LENTO_LOG:
+    _handler = logging.FileHandler(LENTO_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log_lento.addHandler(_handler)
+
+
+def _midiendo() -> bool:
+    return has_request_context() and "_fases" in g
+
+
+def _entrar(nombre: str) -> None:
+    ahora = time.perf_counter()
+    pila = g._pila
+    if pila:
+        madre = pila[-1]
+        g._fases[madre[0]] = g._fases.get(madre[0], 0.0) + (ahora - madre[1])
+    pila.append([nombre, ahora])
+
+
+def _salir() -> None:
+    ahora = time.perf_counter()
+    nombre, t0 = g._pila.pop()
+    g._fases[nombre] = g._fases.get(nombre, 0.0) + (ahora - t0)
+    if g._pila:
+        g._pila[-1][1] = ahora
+
+
+@contextmanager
+def fase(nombre: str):
+    """Cuenta el bloque en la fase `nombre` del request en curso (no-op fuera de request)."""
+    if not _midiendo():
+        yield
+        return
+    _entrar(nombre)
+    try:
+        yield
+    finally:
+        _salir()
+
+
+def con_fase(nombre: str):
+    """Decorador: la función cuenta en `nombre` y, si devuelve un DataFrame, sus filas."""
+    def deco(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _midiendo():
+                return funcion(*args, **kwargs)
+            _entrar(nombre)
+            try:
+                out = funcion(*args, **kwargs)
+            finally:
+                _salir()
+            if isinstance(out, pd.DataFrame):
+                filas = g._filas
+                filas[funcion.__name__] = filas.get(funcion.__name__, 0) + len(out)
+            return out
+        return envoltura
+    return deco
+
+
+def contar_filas(etiqueta: str, n: int) -> None:
+    if _midiendo():
+        g._filas[etiqueta] = g._filas.get(etiqueta, 0) + int(n)
+
+
+def iniciar_request() -> None:
+    g._fases = {}
+    g._pila = []
+    g._filas = {}
+    g._filtros = {}
+    g._t0 = time.perf_counter()
+
+
+def registrar_filtros(filtros: dict) -> None:
+    if _midiendo():
+        g._filtros = filtros
+
+
+def cerrar_request(response, ruta: str, origen: str | None = None):
+    """
+    Agrega Server-Timing y, si el request fue lento, lo registra. Devuelve la
+    respuesta. `origen` marca requests internos (p. ej. "calentador") en el log.
+    """
+    if not _midiendo():
+        return response
+    total = time.perf_counter() - g._t0
+    fases = {k: v for k, v in g._fases.items() if v > 0}
+    fases["otros"] = max(0.0, total - sum(fases.values()))
+
+    if SERVER_TIMING:
+        partes = [f"{k};dur={v * 1000:.2f}" for k, v in fases.items()]
+        partes.append(f"total;dur={total * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(partes)
+
+    total_ms = total * 1000
+    if total_ms >= LENTO_MS:
+        registro = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ruta": ruta,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "filtros": g._filtros,
+            "filas": g._filas,
+            "fases_ms": {k: round(v * 1000, 2) for k, v in fases.items()},
+            "pid": os.getpid(),
+        }
+        if origen:
+            registro["origen"] = origen
+        log_lento.warning(json.dumps(registro, ensure_ascii=False))
+    return response
+
+
+class ProveedorJSONMedido(DefaultJSONProvider):
+    """Proveedor JSON de Flask que cuenta la codificación en la fase serialize."""
+
+    def dumps(self, obj, **kwargs):
+        with fase("serialize"):
+            return super().dumps(obj, **kwargs)
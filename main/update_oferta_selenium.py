@@ -5,6 +5,8 @@
 # AHORA:
 # - Detecta las columnas usando el THEAD de la tabla.
 # - Incluye PROVINCIA (si existe en la tabla) en el Excel resultante.
+# - Calcula huellas por fila y deja el delta contra la última oferta
+#   clasificada en data/OFERTA_ACAD_CES_DELTA.json (ver delta_ces.py).
 
 import os
 import sys
@@ -20,6 +22,15 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from artefactos import guardar_tabla
+from delta_ces import (
+    calcular_huellas,
+    cargar_huellas_previas,
+    calcular_delta,
+    guardar_delta,
+    resumen_delta,
+)
+
 DATA_DIR = "data"
 CES_RAW_PATH = os.path.join(DATA_DIR, "OFERTA_ACAD_CES_RAW.xlsx")
 
@@ -247,10 +258,11 @@ def _detectar_indices_columnas(driver, add_log):
     }
 
 
-def _scrapear_tabla_oferta(headless: bool, timeout: int):
+def _scrapear_tabla_oferta(headless: bool, timeout: int, url: str = CES_URL):
     """
-    Navega a la tabla del CES, aplica filtro 'Tercer nivel', ajusta tamaño de
-    página a 100 registros y devuelve:
+    Navega a la tabla del CES (o a url, p.ej. servidor_ces_local.py),
+    aplica filtro 'Tercer nivel', ajusta tamaño de página a 100 registros
+    y devuelve:
       - df (DataFrame con la información)
       - log (lista de mensajes)
     """
@@ -263,8 +275,8 @@ def _scrapear_tabla_oferta(headless: bool, timeout: int):
     wait = WebDriverWait(driver, timeout)
 
     try:
-        add_log(f"Abrir URL CES: {CES_URL}")
-        driver.get(CES_URL)
+        add_log(f"Abrir URL CES: {url}")
+        driver.get(url)
         time.sleep(3)
 
         _seleccionar_tercer_nivel_y_consultar(driver, wait, add_log)
@@ -366,12 +378,14 @@ def _scrapear_tabla_oferta(headless: bool, timeout: int):
         driver.quit()
 
 
-def actualizar_oferta_ces(headless: bool = True, timeout: int = 60):
+def descargar_oferta_ces(headless: bool = True, timeout: int = 60):
     """
-    Función principal que se importa desde app.py o se ejecuta en consola.
+    Descarga la oferta, guarda CES_RAW y el delta contra la última oferta
+    clasificada. Usada por motor_pipeline.py para pasar el DataFrame al
+    siguiente paso sin volver a leer el Excel.
 
     Devuelve:
-      ok (bool), stdout (str), stderr (str)
+      ok (bool), stdout (str), stderr (str), df (DataFrame o None)
     """
     stdout_lines = []
     stderr_lines = []
@@ -387,19 +401,37 @@ def actualizar_oferta_ces(headless: bool = True, timeout: int = 60):
         if df.empty:
             msg = "La tabla del CES se descargó vacía. No se genera archivo."
             stderr_lines.append(msg)
-            return False, "\n".join(stdout_lines), "\n".join(stderr_lines)
+            return False, "\n".join(stdout_lines), "\n".join(stderr_lines), None
 
-        os.makedirs(DATA_DIR, exist_ok=True)
-        df.to_excel(CES_RAW_PATH, index=False)
-        log(f"Archivo guardado en: {CES_RAW_PATH}")
+        ruta = guardar_tabla(df, CES_RAW_PATH)
+        log(f"Archivo guardado en: {ruta}")
+
+        # Delta contra la última oferta clasificada (huellas por fila)
+        delta = calcular_delta(calcular_huellas(df), cargar_huellas_previas())
+        guardar_delta(delta)
+        if delta["con_foto_previa"]:
+            log(f"Delta contra la última oferta clasificada: {resumen_delta(delta)}")
+        else:
+            log("No hay foto previa de huellas; todas las filas cuentan como nuevas.")
         log("Actualizacion de oferta CES completada correctamente.")
 
-        return True, "\n".join(stdout_lines), "\n".join(stderr_lines)
+        return True, "\n".join(stdout_lines), "\n".join(stderr_lines), df
 
     except Exception as e:
         stderr_lines.append(str(e))
         stderr_lines.append(traceback.format_exc())
-        return False, "\n".join(stdout_lines), "\n".join(stderr_lines)
+        return False, "\n".join(stdout_lines), "\n".join(stderr_lines), None
+
+
+def actualizar_oferta_ces(headless: bool = True, timeout: int = 60):
+    """
+    Función principal que se importa desde app.py o se ejecuta en consola.
+
+    Devuelve:
+      ok (bool), stdout (str), stderr (str)
+    """
+    ok, out, err, _ = descargar_oferta_ces(headless=headless, timeout=timeout)
+    return ok, out, err
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+# vuelo_unico.py
+# Coalescencia "single-flight" de requests idénticos concurrentes.
+#
+# Tras una recarga, varios navegadores (o el Promise.all de una misma página)
+# piden el mismo /api/compare al mismo tiempo y cada hilo del worker lo
+# calcula desde cero. Con VueloUnico.hacer(clave, funcion) el primer hilo
+# con esa clave calcula y los demás esperan su resultado (o su excepción).
+# La clave la arma app.py: ruta + parámetros normalizados + versión de datos.
+#
+# Es por proceso (hilos de un worker con --threads); entre workers la caché
+# en disco (cache_respuestas.py) evita recalcular después del primero.
+# El resultado se comparte tal cual: debe ser inmutable (bytes, tuplas).
+
+import threading
+import time
+from contextlib import nullcontext
+
+
+class _Vuelo:
+    __slots__ = ("listo", "resultado", "error", "esperando", "duracion")
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.esperando = 0
+        self.duracion = 0.0
+
+
+class VueloUnico:
+    def __init__(self, espera_max: float = 120.0):
+        self.espera_max = espera_max
+        self._vuelos = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "llamadas": 0,
+            "calculos": 0,
+            "compartidas": 0,       # cálculos ahorrados
+            "errores_compartidos": 0,
+            "esperas_vencidas": 0,
+            "max_esperando": 0,
+            "segundos_ahorrados": 0.0,  # suma de la duración del cálculo compartido
+        }
+
+    def hacer(self, clave, funcion, medir_espera=None):
+        """
+        (resultado, compartido). Si ya hay un cálculo de `clave` en curso,
+        espera ese. medir_espera: fábrica de un context manager que envuelve
+        solo la espera de los que no calculan (p. ej. una fase de Server-Timing);
+        el cálculo del líder queda fuera.
+        """
+        with self._lock:
+            self.stats["llamadas"] += 1
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+            else:
+                vuelo.esperando += 1
+                self.stats["max_esperando"] = max(self.stats["max_esperando"], vuelo.esperando)
+
+        if not lider:
+            with medir_espera() if medir_espera is not None else nullcontext():
+                listo = vuelo.listo.wait(self.espera_max)
+            if listo:
+                with self._lock:
+                    self.stats["compartidas"] += 1
+                    self.stats["segundos_ahorrados"] += vuelo.duracion
+                    if vuelo.error is not None:
+                        self.stats["errores_compartidos"] += 1
+                if vuelo.error is not None:
+                    raise vuelo.error
+                return vuelo.resultado, True
+            # el líder tarda demasiado: se calcula aparte, sin registrar vuelo
+            with self._lock:
+                self.stats["esperas_vencidas"] += 1
+                self.stats["calculos"] += 1
+            return funcion(), False
+
+        t0 = time.perf_counter()
+        try:
+            vuelo.resultado = funcion()
+            return vuelo.resultado, False
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            vuelo.duracion = time.perf_counter() - t0
+            with self._lock:
+                self.stats["calculos"] += 1
+                del self._vuelos[clave]
+            vuelo.listo.set()
+
+    def en_curso(self) -> int:
+        with self._lock:
+            return len(self._vuelos)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["en_curso"] = len(self._vuelos)
+        stats["segundos_ahorrados"] = round(stats["segundos_ahorrados"], 3)
+        return stats